@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the selection kernels of `cargoat.arrayops.n_per_row()`,
+showing the crossover between ranking random keys (`argpartition`, used
+below `COLUMN_THRESHOLD`) and the vectorized Floyd sampler (used from it).
+
+Run from the repository root:
+
+    python benchmarks/selection.py [--cells CELLS] [--repeat REPEAT]
+
+Each line gives the shortest time of the two kernels for arrays of about
+`cells` cells, with and without an allowed mask (half the cells allowed,
+and always the first `n`), and which of them is faster.
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cargoat import arrayops  # noqa: E402
+
+DOORS = [10, 30, 100, 300, 1000, 3000]
+
+def kernels(masked):
+    '''The partition and Floyd kernels, with or without an allowed mask.'''
+    if masked:
+        return (arrayops._allowed_n_per_row_partition,
+                arrayops._allowed_n_per_row_floyd)
+    return (arrayops._basic_n_per_row_partition,
+            arrayops._basic_n_per_row_floyd)
+
+def main(cells=2 * 10 ** 6, repeat=3, seed=0):
+    rng = np.random.default_rng(seed)
+    print(f'COLUMN_THRESHOLD = {arrayops.COLUMN_THRESHOLD}, {cells} cells\n')
+    print(f'{"doors":>6} {"n":>5} {"mask":>5} {"partition":>10} {"floyd":>10}  faster')
+    for doors in DOORS:
+        rows = max(1, cells // doors)
+        for n in sorted({1, 2, 8, doors // 4, doors // 2} - {0}):
+            for masked in (False, True):
+                allowed = None
+                if masked:
+                    allowed = arrayops.random_floats((rows, doors), rng=rng) < 0.5
+                    allowed[:, :n] = True
+                times = [arrayops._time_kernel(func, (rows, doors), n, allowed,
+                                               repeat=repeat, rng=rng)
+                         for func in kernels(masked)]
+                faster = 'floyd' if times[1] < times[0] else 'partition'
+                print(f'{doors:>6} {n:>5} {str(masked):>5} '
+                      f'{times[0] * 1000:>8.1f}ms {times[1] * 1000:>8.1f}ms  {faster}')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--cells', type=int, default=2 * 10 ** 6,
+                        help='number of cells of the arrays timed')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of times each kernel is timed')
+    args = parser.parse_args()
+    main(cells=args.cells, repeat=args.repeat)
@@ -11,13 +11,17 @@ __all__ = [
     'ChanceTo',
     'CheckSpoiled',
     'Close',
+    'FusedMontyHallSim',
     'IfElse',
     'InitDoorsEmpty',
     'InitDoorsFixed',
     'InitDoorsRandom',
     'MarkSpoiled',
     'MarkUnspoiled',
+    'MemmapMontyHallSim',
     'MontyHallSim',
+    'OccupancyMontyHallSim',
+    'PackedMontyHallSim',
     'Pass',
     'Pick',
     'PlaceCar',
@@ -26,17 +30,34 @@ __all__ = [
     'RemoveDoors',
     'Reveal',
     'ShowResults',
+    'SparseMontyHallSim',
     'Stay',
     'Switch',
     'TryExcept',
     'Unpick',
+    'combine_results',
     'combine_sims',
-    'play'
+    'compare',
+    'iter_play',
+    'play',
+    'play_counts',
+    'play_many',
+    'play_until',
+    'solve',
+    'sweep'
     ]
 
 # imports
-from cargoat.core import play
-from cargoat.sim import MontyHallSim, combine_sims
+from cargoat.core import iter_play, play, play_until
+from cargoat.counts import play_counts
+from cargoat.exact import solve
+from cargoat.sim import MontyHallSim, combine_results, combine_sims
+from cargoat.variants import compare, play_many, sweep
+from cargoat.backends import (FusedMontyHallSim,
+                              MemmapMontyHallSim,
+                              OccupancyMontyHallSim,
+                              PackedMontyHallSim,
+                              SparseMontyHallSim)
 from cargoat.actions import (
     AddDoors,
     ChanceTo,
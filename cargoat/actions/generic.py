@@ -7,10 +7,9 @@ placing/removing cars.
 
 from collections.abc import Iterable
 
-import numpy as np
-
 from cargoat.actions.base import MontyHallAction
-from cargoat.arrayops import (n_per_row,
+from cargoat.arrayops import (AliasTable,
+                              n_per_row,
                               one_per_row,
                               one_per_row_weighted)
 
@@ -119,29 +118,47 @@ class GenericAction(MontyHallAction):
         self.allow_spoiled = allow_spoiled
         self.allow_redundant = allow_redundant
 
+        # fixed weights are sampled from a precomputed alias table
+        self._table = None
+        if weighted and isinstance(doors, Iterable):
+            self._table = AliasTable(doors)
+
     def __call__(self, sim):
         # choice = self.doors
 
-        allowed = ~sim.query_doors_or(picked=self.exclude_picked,
-                                      revealed=self.exclude_revealed,
-                                      cars=self.exclude_cars,
-                                      not_picked=self.exclude_unpicked,
-                                      not_revealed=self.exclude_closed,
-                                      not_cars=self.exclude_carless)
+        if sim._apply_generic_action(self):
+            return sim
+
+        # the allowed doors and the selections reuse the arrays of the
+        # simulation's workspace
+        shape = sim.shape
+        allowed = sim._allowed_doors(picked=self.exclude_picked,
+                                     revealed=self.exclude_revealed,
+                                     cars=self.exclude_cars,
+                                     not_picked=self.exclude_unpicked,
+                                     not_revealed=self.exclude_closed,
+                                     not_cars=self.exclude_carless,
+                                     out=sim.workspace.get('allowed', shape, bool))
+        out = sim.workspace.get('selection', shape, sim.dtype)
 
         if self.doors == 1:
-            new_array = one_per_row(sim.shape, allowed=allowed)
+            new_array = one_per_row(shape, allowed=allowed, dtype=sim.dtype,
+                                    rng=sim.rng, out=out)
             n = 1
         elif isinstance(self.doors , int):
-            new_array = n_per_row(sim.shape, n=self.doors, allowed=allowed)
+            new_array = n_per_row(shape, n=self.doors, allowed=allowed,
+                                  dtype=sim.dtype, rng=sim.rng, out=out)
             n = self.doors
         elif isinstance(self.doors, Iterable) and not self.weighted:
-            new_array = np.zeros(sim.shape, dtype=int)
+            new_array = out
+            new_array[...] = 0
             new_array[:, self.doors] = 1
             n = len(self.doors)
         elif isinstance(self.doors, Iterable) and self.weighted:
-            new_array = one_per_row_weighted(sim.shape, weights=self.doors,
-                                             allowed=allowed)
+            new_array = one_per_row_weighted(shape, weights=self.doors,
+                                             allowed=allowed, dtype=sim.dtype,
+                                             rng=sim.rng, table=self._table,
+                                             out=out)
             n = 1
         else:
             raise ValueError('Cannot interpret `doors` as an integer, '
@@ -9,7 +9,9 @@ Created on Thu Nov 17 12:17:34 2022
 import numpy as np
 
 from cargoat.actions.base import MontyHallAction
+from cargoat.actions.generic import GenericAction
 from cargoat.arrayops import one_per_row, n_per_row
+from cargoat.errors import UnsupportedActionError
 
 class InitDoorsEmpty(MontyHallAction):
     def __init__(self, doors):
@@ -19,8 +21,9 @@ class InitDoorsEmpty(MontyHallAction):
 
         Parameters
         ----------
-        doors : int
-            Number of doors in simulation.
+        doors : int or array of int
+            Number of doors in simulation, or in each trial (see
+            `cargoat.sim.MontyHallSim.init_doors()`).
 
         Returns
         -------
@@ -57,11 +60,14 @@ class InitDoorsFixed(MontyHallAction):
     def __call__(self, sim):
         shape = (sim.n, len(self.placement))
         cols = [i for i in range(len(self.placement)) if self.placement[i] == 1]
-        sim.cars = np.zeros(shape, dtype=int)
-        sim.cars[:, cols] = 1
-        sim.picked = np.zeros(shape, dtype=int)
-        sim.revealed = np.zeros(shape, dtype=int)
+        cars = np.zeros(shape, dtype=sim.dtype)
+        cars[:, cols] = 1
+        picked = np.zeros(shape, dtype=sim.dtype)
+        revealed = np.zeros(shape, dtype=sim.dtype)
+        sim.cars, sim.picked, sim.revealed = cars, picked, revealed
+        sim._set_allocated(cars=cars, picked=picked, revealed=revealed)
         sim.spoiled = np.zeros(sim.n, dtype=bool)
+        sim.valid = None
         return sim
 
 class InitDoorsRandom(MontyHallAction):
@@ -71,11 +77,19 @@ class InitDoorsRandom(MontyHallAction):
         and goats - the placement itself is random.  This
         is closest to the original Monty Hall game.
 
+        The numbers of cars and goats can also be arrays with one value
+        per trial (e.g. for `cargoat.variants.sweep()`).  The trials are
+        then padded to the largest number of doors, with the doors of each
+        trial marked in the `valid` mask of the simulation (see
+        `cargoat.sim.MontyHallSim.init_doors()`).  Storage backends without
+        a mask only support trials with the same number of doors, and
+        raise an `UnsupportedActionError` otherwise.
+
         Parameters
         ----------
-        cars : int, optional
+        cars : int or array of int, optional
             Number of cars per trial. The default is 1.
-        goats : int, optional
+        goats : int or array of int, optional
             Number of goats per trial. The default is 2.
 
         Returns
@@ -85,16 +99,49 @@ class InitDoorsRandom(MontyHallAction):
         '''
         self.cars = cars
         self.goats = goats
+        self._place_cars = GenericAction('cars', doors=cars)
+
+    @property
+    def per_row(self):
+        '''Whether the numbers of cars or goats vary per trial.'''
+        return np.ndim(self.cars) > 0 or np.ndim(self.goats) > 0
+
+    def _init_per_row(self, sim):
+        '''Initialize trials with different numbers of cars and goats.'''
+        cars = np.broadcast_to(self.cars, (sim.n,)).astype(int)
+        doors = cars + np.broadcast_to(self.goats, (sim.n,)).astype(int)
+        shape = (sim.n, int(doors.max()) if sim.n else 0)
+        sim.init_doors(shape[1])
+
+        valid = np.arange(shape[1]) < doors[:, np.newaxis]
+        if not sim._ragged and not valid.all():
+            raise UnsupportedActionError(f'{type(sim).__name__} does not support '
+                                         'trials with different numbers of doors.')
+        cars = n_per_row(shape, n=cars, allowed=valid, dtype=sim.dtype,
+                         rng=sim.rng)
+        sim.cars = cars
+        sim._set_allocated(cars=cars)
+        if sim._ragged:
+            sim.valid = valid
+        return sim
 
     def __call__(self, sim):
+        if self.per_row:
+            return self._init_per_row(sim)
+
         shape = (sim.n, self.cars + self.goats)
-        sim.picked = np.zeros(shape, dtype=int)
-        sim.revealed = np.zeros(shape, dtype=int)
-        sim.spoiled = np.zeros(sim.n, dtype=bool)
+        sim.init_doors(shape[1])
+
+        # storage backends may be able to place the cars natively
+        if sim._apply_generic_action(self._place_cars):
+            return sim
 
         if self.cars == 1:
-            sim.cars = one_per_row(shape, dtype=int)
+            cars = one_per_row(shape, dtype=sim.dtype, rng=sim.rng)
         else:
-            sim.cars = n_per_row(shape, n=self.cars, dtype=int)
+            cars = n_per_row(shape, n=self.cars, dtype=sim.dtype, rng=sim.rng)
+        sim.cars = cars
+        # allocated here, so the actions can update it in place
+        sim._set_allocated(cars=cars)
 
         return sim
@@ -6,10 +6,9 @@ Classes for logical combination of other actions.
 
 from cargoat.actions.convenience import Pass
 from cargoat.actions.base import MontyHallAction
+from cargoat.arrayops import random_floats
 from cargoat.sim import combine_sims
 
-import numpy as np
-
 class ChanceTo(MontyHallAction):
     def __init__(self, p, action):
         '''
@@ -19,8 +18,11 @@ class ChanceTo(MontyHallAction):
 
         Parameters
         ----------
-        p : float
-            Probability of applying the action.
+        p : float or array of float
+            Probability of applying the action, or an array with the
+            probability for each trial (only valid for the whole
+            simulation, i.e. not within `IfElse` or other `ChanceTo`
+            actions, which apply their actions to subsets of the trials).
         action : cargoat.actions.base.MontyHallAction
             Monty Hall game action.
 
@@ -33,7 +35,7 @@ class ChanceTo(MontyHallAction):
         self.action = action
 
     def __call__(self, sim):
-        draws = np.random.rand(len(sim.idx))
+        draws = random_floats((len(sim.idx),), rng=sim.rng)
         action = IfElse(draws < self.p, self.action, Pass(), condition_call=False)
         action(sim)
         return sim
@@ -88,11 +90,7 @@ class IfElse(MontyHallAction):
 
         index = (~bools).astype(int)
         new = combine_sims([sim_true, sim_false], index=index)
-
-        sim.picked = new.picked
-        sim.revealed = new.revealed
-        sim.cars = new.cars
-        sim.spoiled = new.spoiled
+        sim._assign_from(new)
 
         return sim
 
@@ -129,9 +127,6 @@ class TryExcept(MontyHallAction):
             self.a(sim)
         except:
             self.b(temp)
-            sim.picked=temp.picked
-            sim.cars=temp.cars
-            sim.revealed=temp.revealed
-            sim.spoiled=temp.spoiled
+            sim._assign_from(temp)
         finally:
             return sim
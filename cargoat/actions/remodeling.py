@@ -27,8 +27,7 @@ class AddDoors(MontyHallAction):
         self.positions = positions
 
     def __call__(self, sim):
-        foo = lambda a: np.insert(arr=a, obj=self.positions, values=0, axis=1)
-        sim.apply_func(foo)
+        sim.insert_doors(self.positions)
         return sim
 
 class RemoveDoors(MontyHallAction):
@@ -53,8 +52,7 @@ class RemoveDoors(MontyHallAction):
         if set(tolist) == set(range(sim.shape[1])):
             sim.make_empty()
         else:
-            foo = lambda a: np.delete(arr=a, obj=self.positions, axis=1)
-            sim.apply_func(foo)
+            sim.delete_doors(self.positions)
         return sim
 
 class RearrangeDoors(MontyHallAction):
@@ -84,6 +82,5 @@ class RearrangeDoors(MontyHallAction):
             raise ValueError("Positions must be a permutation of "
                               f"the column indices, i.e. {col_range}.")
 
-        foo = lambda a: a.copy()[:, self.positions]
-        sim.apply_func(foo)
+        sim.rearrange_doors(self.positions)
         return sim
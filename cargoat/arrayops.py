@@ -7,113 +7,395 @@ General operaions on numpy arrays used for cargoat.
 """
 
 from collections.abc import Iterable
+import json
+import os
+import sys
+import time
 
 import numpy as np
 
+# number of columns from which selections use Floyd's algorithm; this and
+# `COUNT_RATIO` can be fitted to the machine with `calibrate()`
 COLUMN_THRESHOLD = 1000
 
+# with an allowed mask, below the `COLUMN_THRESHOLD`, selections are drawn
+# by rank among the allowed cells when there are more than `COUNT_RATIO`
+# columns per selection (otherwise ranking random weights is faster)
+COUNT_RATIO = 4
+
+# cells per block of rows for the allowed cell positions of `n_per_row()`
+# above the `COLUMN_THRESHOLD` (8 bytes per cell)
+FLOYD_BLOCK_CELLS = 2 ** 22
+
+# file holding the thresholds fitted by `calibrate()`, loaded at import
+# unless the `CARGOAT_NO_CALIBRATION` environment variable is set; the
+# `CARGOAT_CALIBRATION_FILE` environment variable overrides it
+CALIBRATION_FILE = os.environ.get(
+    'CARGOAT_CALIBRATION_FILE',
+    os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser(os.path.join('~', '.cache'))),
+                 'cargoat', 'dispatch.json'))
+
+_DEFAULT_THRESHOLDS = {'COLUMN_THRESHOLD': COLUMN_THRESHOLD, 'COUNT_RATIO': COUNT_RATIO}
+
+# index of the most significant byte of a `np.uint32`
+_TOP_BYTE = 3 if sys.byteorder == 'little' else 0
+
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+def random_floats(shape, rng=None):
+    '''Uniform random floats in [0, 1) of the given shape, drawn from `rng`
+    (a `np.random.Generator`), or from the global `np.random` state when
+    `rng` is None.'''
+    if rng is None:
+        return np.random.rand(*shape)
+    return rng.random(shape)
+
+def random_keys(shape, rng=None):
+    '''Uniform random 32-bit integers (`np.uint32`) of the given shape,
+    drawn from `rng` (a `np.random.Generator`), or from the global
+    `np.random` state when `rng` is None.  Used to rank cells with half
+    the memory of `random_floats()`.'''
+    if rng is None:
+        return np.random.randint(0, 2 ** 32, size=shape, dtype=np.uint32)
+    return rng.integers(0, 2 ** 32, size=shape, dtype=np.uint32)
+
+def random_integers(high, size, rng=None):
+    '''Uniform random integers in [0, high), drawn from `rng` (a
+    `np.random.Generator`), or from the global `np.random` state when
+    `rng` is None.'''
+    if rng is None:
+        return np.random.randint(low=0, high=high, size=size)
+    return rng.integers(low=0, high=high, size=size)
+
+def _check_out(shape2D, out):
+    if out.shape != tuple(shape2D) or not out.flags.c_contiguous:
+        raise ValueError(f'`out` must be a C-contiguous array of shape {tuple(shape2D)}, '
+                         f'not {out.shape}.')
+
+def _zeros(shape2D, dtype=int, out=None):
+    '''Zeroed output array of the selection functions: `out` when given,
+    otherwise a new array.'''
+    if out is None:
+        return np.zeros(shape2D, dtype=dtype)
+    _check_out(shape2D, out)
+    out[...] = 0
+    return out
+
+def _cast(selected, dtype=int, out=None):
+    '''Boolean array of selections as the output of the selection
+    functions: written into `out` when given, otherwise cast to `dtype`.'''
+    if out is None:
+        return selected.astype(dtype, copy=False)
+    _check_out(selected.shape, out)
+    np.copyto(out, selected, casting='unsafe')
+    return out
+
+class Workspace:
+    '''Arrays reused between calls, e.g. as the `out` arrays of the
+    selection functions, so that repeated selections of the same shape do
+    not allocate new arrays.'''
+
+    def __init__(self):
+        self.buffers = {}
+
+    def get(self, name, shape, dtype):
+        '''
+        Get the array stored as `name`, allocating it on first use, or when
+        the requested shape or dtype changes.  Its contents are whatever
+        was last written to it.
+
+        Parameters
+        ----------
+        name : str
+            Name of the array.
+        shape : tuple
+            Shape of the array.
+        dtype : data-type
+            Data type of the array.
+
+        Returns
+        -------
+        array : numpy array
+
+        '''
+        shape, dtype = tuple(shape), np.dtype(dtype)
+        array = self.buffers.get(name)
+        if array is None or array.shape != shape or array.dtype != dtype:
+            array = self.buffers[name] = np.empty(shape, dtype=dtype)
+        return array
+
+    def clear(self):
+        '''Release the stored arrays.'''
+        self.buffers.clear()
+
+    @property
+    def nbytes(self):
+        '''Bytes used by the stored arrays.'''
+        return sum(array.nbytes for array in self.buffers.values())
+
 # n=1, allowed=False, doors<COLUMN_THRESHOLD
 # n=1, allowed=False, doors>=COLUMN_THRESHOLD
-def _basic_one_per_row_randint(shape2D, dtype=int, **kwargs):
+def _basic_one_per_row_randint(shape2D, dtype=int, rng=None, out=None, **kwargs):
     x, y = shape2D
-    output = np.zeros(shape2D, dtype=dtype)
-    choices = np.random.randint(low=0, high=y, size=x)
+    output = _zeros(shape2D, dtype=dtype, out=out)
+    choices = random_integers(high=y, size=x, rng=rng)
     output[np.arange(x), choices] = 1
     return output
 
+def _allowed_keys(shape2D, allowed=None, rng=None):
+    '''Random keys (see `random_keys()`) for ranking the cells, with the
+    top bit set for the allowed cells, so that they rank above the others.'''
+    keys = random_keys(shape2D, rng=rng)
+    if allowed is not None:
+        keys >>= 1
+        # set the top bit through the most significant byte of each key
+        top = keys.view(np.uint8).reshape(keys.shape + (4,))[..., _TOP_BYTE]
+        top |= allowed.view(np.uint8) << 7
+    return keys
+
 # n=1, allowed=True, doors<COLUMN_THRESHOLD
-def _allowed_one_per_row_argmax(shape2D, allowed=None, dtype=int, enforce_allowed=True, **kwargs):
+def _allowed_one_per_row_argmax(shape2D, allowed=None, dtype=int, enforce_allowed=True,
+                                rng=None, out=None, **kwargs):
     if allowed is None:
-        allowed = np.ones(shape2D, dtype=int)
+        allowed = np.ones(shape2D, dtype=bool)
 
-    output = np.zeros(shape2D, dtype=int)
-    weights = np.random.rand(*shape2D) * allowed
+    # with few columns (see `_get_selection_func()`), float weights are
+    # faster than integer keys, as checking the keys for ties costs more
+    # than the smaller draws save
+    output = _zeros(shape2D, dtype=dtype, out=out)
+    weights = random_floats(shape2D, rng=rng)
+    weights *= allowed
     chosen = weights.argmax(1)
-    output[np.arange(shape2D[0]), chosen] = 1
 
-    if enforce_allowed:
-        output[~allowed.astype(bool)] = 0
+    # only the chosen cells can be disallowed (rows without allowed cells)
+    rows = np.arange(shape2D[0])
+    output[rows, chosen] = allowed[rows, chosen] != 0 if enforce_allowed else 1
 
     return output
 
-# n>1, allowed=False, doors<COLUMN_THRESHOLD
-def _basic_n_per_row_randint(shape2D, n, dtype=int, **kwargs):
-    rands = np.random.rand(*shape2D).argsort(1)
-    output = (rands < n).astype(int)
+def _top_n_per_row(weights, n):
+    '''Boolean array marking the `n` largest weights of each row (`n` can
+    also be a column array with a number per row).  The weights are
+    compared to a rank threshold, found with `np.partition` (linear in the
+    number of columns) or, for a number per row, one sort of the values.'''
+    x, y = weights.shape
+    if np.ndim(n) > 0:
+        n = np.clip(n, 0, y)
+        ordered = np.sort(weights, axis=1)
+        threshold = np.take_along_axis(ordered, np.minimum(y - n, y - 1), axis=1)
+        return (weights >= threshold) & (n > 0)
+
+    if n <= 0:
+        return np.zeros((x, y), dtype=bool)
+    if n >= y:
+        return np.ones((x, y), dtype=bool)
+    kth = y - n
+    threshold = np.partition(weights, kth, axis=1)[:, kth:kth + 1]
+    return weights >= threshold
+
+def _top_n_keys(shape2D, n, allowed=None, rng=None):
+    '''Boolean array marking `n` random cells of each row, preferring the
+    allowed cells (see `_top_n_per_row()`).  Rows with a tie at the rank
+    threshold are drawn again, so the selections are uniform.'''
+    output = _top_n_per_row(_allowed_keys(shape2D, allowed, rng=rng), n)
+    n_clipped = np.broadcast_to(np.clip(np.ravel(n), 0, shape2D[1]), (shape2D[0],))
+    # ties are rare: count them per row only if there are any
+    if np.count_nonzero(output) > n_clipped.sum():
+        tied = np.count_nonzero(output, axis=1) > n_clipped
+        output[tied] = _top_n_keys((np.count_nonzero(tied), shape2D[1]),
+                                   n[tied] if np.ndim(n) > 0 else n,
+                                   allowed=None if allowed is None else allowed[tied],
+                                   rng=rng)
     return output
 
+# n>1, allowed=False, doors<COLUMN_THRESHOLD
+def _basic_n_per_row_partition(shape2D, n, dtype=int, rng=None, out=None, **kwargs):
+    return _cast(_top_n_keys(shape2D, n, rng=rng), dtype=dtype, out=out)
+
 # n>1, allowed=True, doors<COLUMN_THRESHOLD
-def _allowed_n_per_row_2argsort(shape2D, n, allowed=None, dtype=int, enforce_allowed=True, **kwargs):
+def _allowed_n_per_row_partition(shape2D, n, allowed=None, dtype=int, enforce_allowed=True,
+                                 rng=None, out=None, **kwargs):
     if allowed is None:
-        allowed = np.ones(shape2D, dtype=int)
+        allowed = np.ones(shape2D, dtype=bool)
 
-    output = np.zeros(shape2D, dtype=int)
-    weights = np.random.rand(*shape2D) * allowed
-    indices = (-weights).argsort(1).argsort(1)
-    output[indices < n] = 1
+    allowed = allowed.astype(bool, copy=False)
+    output = _top_n_keys(shape2D, n, allowed=allowed, rng=rng)
 
     if enforce_allowed:
-        output[~allowed.astype(bool)] = 0
-
-    return output
+        output &= allowed
+
+    return _cast(output, dtype=dtype, out=out)
+
+def _rank_to_column(allowed, ranks, counts=None):
+    '''Column of the allowed cell of rank `ranks[i]` (counting from 0)
+    in each row i of the boolean array `allowed`.'''
+    x, y = allowed.shape
+    counts = allowed.sum(axis=1) if counts is None else counts
+    first = np.cumsum(counts) - counts
+    return np.flatnonzero(allowed)[first + ranks] - np.arange(x) * y
+
+def _floyd(flat, cells, first, counts, n, rng=None):
+    '''Set `n` distinct random cells to 1 in each row of the flattened
+    array `flat`, using Floyd's algorithm with one vectorized draw per
+    selection (rather than a loop over the rows).  Row i has `counts[i]`
+    candidate cells, the k-th of which is at flat position
+    `cells[first[i] + k]` (or `first[i] + k` when `cells` is None).
+    `n` can also be an array with the number of selections for each row.'''
+    n = np.broadcast_to(n, counts.shape)
+    for j in range(int(n.max(initial=0))):
+        # rows with fewer selections drop out
+        if np.any(n <= j):
+            active = n > j
+            first, counts, n = first[active], counts[active], n[active]
+        where = (lambda k: first + k) if cells is None else (lambda k: cells[first + k])
+        # draw from [0, top]; if already taken, take `top` (never taken)
+        top = counts - n + j
+        pos = where(random_integers(high=top + 1, size=len(counts), rng=rng))
+        pos = np.where(flat[pos], where(top), pos)
+        flat[pos] = 1
+
+def _floyd_allowed(output, allowed, counts, n, rng=None):
+    '''Select `n` of the allowed cells of each row of `output` (see
+    `_floyd()`), with the allowed cells numbered by their rank in the row.
+    `counts` is the number of allowed cells of each row.'''
+    x, y = output.shape
+    n = np.broadcast_to(n, counts.shape)
+    # blocks of rows bound the memory of the allowed cell positions
+    size = max(1, FLOYD_BLOCK_CELLS // max(y, 1))
+    for start in range(0, x, size):
+        block = slice(start, min(start + size, x))
+        cells = np.flatnonzero(allowed[block])
+        first = np.cumsum(counts[block]) - counts[block]
+        _floyd(output[block].reshape(-1), cells, first, counts[block], n[block], rng=rng)
 
 # n=1, allowed=True, doors>=COLUMN_THRESHOLD
 # n>1, allowed=True, doors>=COLUMN_THRESHOLD
-def _allowed_n_per_row_choice(shape2D, n, allowed=None, dtype=int, enforce_allowed=True, **kwargs):
+def _allowed_n_per_row_floyd(shape2D, n, allowed=None, dtype=int, enforce_allowed=True,
+                             rng=None, out=None, **kwargs):
+    if allowed is None:
+        return _basic_n_per_row_floyd(shape2D, n, dtype=dtype, rng=rng, out=out)
 
-    x, y = shape2D
+    allowed = allowed.astype(bool, copy=False)
+    counts = allowed.sum(axis=1)
+    if np.any(counts < n):
+        raise ValueError('Fewer allowed cells than selections for some rows.')
+
+    output = _zeros(shape2D, dtype=dtype, out=out)
+    _floyd_allowed(output, allowed, counts, n, rng=rng)
+    return output
 
+# n>=1, allowed=True, doors<COLUMN_THRESHOLD, doors>COUNT_RATIO*n
+def _allowed_n_per_row_count(shape2D, n, allowed=None, dtype=int, enforce_allowed=True,
+                             rng=None, out=None, **kwargs):
     if allowed is None:
-        allowed = np.ones((x, y))
-
-    y_index = np.arange(y)
-    weights = allowed.astype(float)
-    weights /= weights.sum(axis=1)[:, np.newaxis]
-    weights[np.isnan(weights)] = 1
-    foo = lambda x: np.random.choice(y_index, size=n, replace=False, p=x)
-    choices = np.apply_along_axis(foo, axis=1, arr=weights)
-    choices = choices.flatten()
-    output = np.zeros(shape2D, dtype=int)
-    output[np.repeat(np.arange(x), n), choices] = 1
+        allowed = np.ones(shape2D, dtype=bool)
 
-    if enforce_allowed:
-        output[~allowed.astype(bool)] = 0
+    allowed = allowed.astype(bool, copy=False)
+    counts = allowed.sum(axis=1)
+    if not enforce_allowed and np.any(counts < n):
+        # rows without room are filled up with disallowed cells
+        return _allowed_n_per_row_partition(shape2D, n, allowed=allowed, dtype=dtype,
+                                            enforce_allowed=False, rng=rng, out=out)
 
+    output = _zeros(shape2D, dtype=dtype, out=out)
+    _floyd_allowed(output, allowed, counts, np.minimum(n, counts), rng=rng)
     return output
 
 # n>1, allowed=False, doors>=COLUMN_THRESHOLD
-def _basic_n_per_row_apply(shape2D, n, dtype=int, **kwargs):
+def _basic_n_per_row_floyd(shape2D, n, dtype=int, rng=None, out=None, **kwargs):
     x, y = shape2D
-    arr = np.zeros(shape2D, dtype=int)
-    arr[:, :] = np.arange(y)
-    choices = np.apply_along_axis(np.random.choice, axis=1, arr=arr, size=n, replace=False).flatten()
-    output = np.zeros(shape2D, dtype=dtype)
-    output[np.repeat(np.arange(x), n), choices] = 1
+    if n > y:
+        raise ValueError('Fewer cells than selections.')
+    output = _zeros(shape2D, dtype=dtype, out=out)
+    _floyd(output.reshape(-1), None, np.arange(x) * y, np.full(x, y), n, rng=rng)
     return output
 
-def _get_selection_func(n=1, with_allowed=False, many_columns=False):
+def _reject_allowed(output, allowed, n, rng=None):
+    '''Select `n` of the allowed cells of each row of the boolean array
+    `output`, drawing columns uniformly and redrawing those which are not
+    allowed or already selected.  Rows need at least `n` allowed cells;
+    this is fast when most cells are allowed.'''
+    x, y = output.shape
+    n = np.broadcast_to(n, (x,))
+    for j in range(int(n.max(initial=0))):
+        rows = np.flatnonzero(n > j)
+        while len(rows):
+            cols = random_integers(high=y, size=len(rows), rng=rng)
+            ok = allowed[rows, cols] & ~output[rows, cols]
+            output[rows[ok], cols[ok]] = True
+            rows = rows[~ok]
+
+def _complement_n_per_row(shape2D, n, allowed=None, counts=None, dtype=int, rng=None,
+                          out=None):
+    '''Select `n` of the allowed cells of each row by choosing the cells
+    to leave out (`counts - n` per row) and inverting, so that the cost
+    scales with the cells left out.  Rows need at least `n` allowed cells.'''
+    x, y = shape2D
+    skipped = np.zeros(shape2D, dtype=bool)
+    if allowed is None:
+        _floyd(skipped.reshape(-1), None, np.arange(x) * y, np.full(x, y), y - n, rng=rng)
+        return _cast(~skipped, dtype=dtype, out=out)
+
+    if 2 * counts.min() > y:
+        # most cells are allowed: fewer than two draws per cell left out
+        _reject_allowed(skipped, allowed, counts - n, rng=rng)
+    else:
+        _floyd_allowed(skipped, allowed, counts, counts - n, rng=rng)
+    return _cast(allowed & ~skipped, dtype=dtype, out=out)
+
+def _get_selection_func(n=1, with_allowed=False, many_columns=False, columns=0):
     not_1 = n != 1
     with_allowed = with_allowed is not None
+    if with_allowed and not many_columns and columns > COUNT_RATIO * n:
+        return _allowed_n_per_row_count
     options = {
         (False, False, False) : _basic_one_per_row_randint,
         (False, True,  False) : _allowed_one_per_row_argmax,
-        (True,  False, False) : _basic_n_per_row_randint,
-        (True,  True,  False) : _allowed_n_per_row_2argsort,
+        (True,  False, False) : _basic_n_per_row_partition,
+        (True,  True,  False) : _allowed_n_per_row_partition,
         (False, False, True ) : _basic_one_per_row_randint,
-        (False, True,  True ) : _allowed_n_per_row_choice,
-        (True , False, True ) : _basic_n_per_row_apply,
-        (True , True,  True ) : _allowed_n_per_row_choice
+        (False, True,  True ) : _allowed_n_per_row_floyd,
+        (True , False, True ) : _basic_n_per_row_floyd,
+        (True , True,  True ) : _allowed_n_per_row_floyd
         }
     return options[(not_1, with_allowed, many_columns)]
 
 
+def _many_columns(shape2D, n, allowed=None, column_threshold=None):
+    '''Whether to use the kernels for many columns (see
+    `_get_selection_func()`).  Rows with fewer allowed cells than
+    selections raise a ValueError from `column_threshold` columns, or from
+    the default `COLUMN_THRESHOLD` when it is None, so that a threshold
+    fitted by `calibrate()` does not change which calls raise.'''
+    columns = shape2D[1]
+    if column_threshold is not None:
+        return columns >= column_threshold
+
+    many_columns = columns >= COLUMN_THRESHOLD
+    strict = columns >= _DEFAULT_THRESHOLDS['COLUMN_THRESHOLD']
+    if many_columns != strict and shape2D[0] > 0:
+        counts = columns if allowed is None else np.asarray(allowed, dtype=bool).sum(axis=1)
+        if np.any(counts < n):
+            if strict:
+                raise ValueError('Fewer allowed cells than selections for some rows.')
+            return False
+    return many_columns
+
 def get_index_success(boolarray2D, i=0):
     '''Get the coordinate index (x,y) of the *ith* `True` in a
     2D boolean array.'''
     return np.asarray(np.where(boolarray2D)).T[i]
 
+def popcount(words):
+    '''Count the set bits in each element of a `np.uint8` array (e.g. the
+    output of `np.packbits`).  Uses `np.bitwise_count` when available
+    (numpy>=2.0), otherwise a lookup table.'''
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words)
+    return _POPCOUNT_TABLE[words]
+
 def n_per_row(shape2D, n, allowed=None, dtype=int, enforce_allowed=True,
-              column_threshold=None):
+              column_threshold=None, rng=None, out=None):
     '''Generate binary array with n "True" values per row.  Similar to
     `one_per_row()`, but generalized to multiple selections.
 
@@ -122,20 +404,65 @@ def n_per_row(shape2D, n, allowed=None, dtype=int, enforce_allowed=True,
     rows with less than `n` selections.
 
     The `column_threshold` is used to determine the method for generating
-    selections.  If `None`, the global `COLUMN_THRESHOLD` is used.  This
+    selections.  If `None`, the global `COLUMN_THRESHOLD` is used (see
+    `calibrate()`), but rows without room raise a ValueError (see below)
+    from the default threshold of 1000 columns whatever its value.  This
     argument was added to try and optimize different selection routines
     depending on the number of columns.  When above the threshold,
-    some approaches which are **not** vectorized will be used.'''
-
-    column_threshold = COLUMN_THRESHOLD if column_threshold is None else column_threshold
-    many_columns = shape2D[1] >= column_threshold
-    func = _get_selection_func(n=n, with_allowed=allowed, many_columns=many_columns)
-    output = func(shape2D=shape2D, n=n, dtype=dtype, allowed=allowed, enforce_allowed=enforce_allowed)
+    selections are drawn with a vectorized version of Floyd's algorithm,
+    whose cost grows with the number of selections rather than with the
+    number of columns; rows with fewer allowed cells than selections then
+    raise a ValueError.
+    Below the threshold, selections with `allowed` are also drawn by their
+    rank among the allowed cells of each row when there are more than
+    `COUNT_RATIO` columns per selection, e.g. for masks with few allowed
+    cells late in a game.
+
+    When all but a few of the allowed cells of every row are selected
+    (fewer than `n` left out, and more than `COUNT_RATIO` columns per cell
+    left out, e.g. revealing all doors but one), the cells left out are
+    selected instead, so that the cost scales with their number.
+
+    `n` can also be an array with the number of selections for each row.
+
+    Random draws come from `rng` (a `np.random.Generator`), or from the
+    global `np.random` state when `rng` is None.
+
+    The selections are written into `out` (a C-contiguous array of shape
+    `shape2D`, e.g. from a `Workspace`) when it is given, rather than into
+    a new array of `dtype`.'''
+
+    if np.ndim(n) > 0:
+        n = np.asarray(n).reshape(-1, 1)
+        return _allowed_n_per_row_partition(shape2D, n=n, allowed=allowed,
+                                            dtype=dtype,
+                                            enforce_allowed=enforce_allowed,
+                                            rng=rng, out=out)
+
+    # selecting all but a few of the allowed cells (e.g. revealing all
+    # doors but one): choose the cells left out instead
+    if n > 1 and shape2D[0] > 0:
+        # the rejection loop masks with `allowed`, so it must be boolean
+        allowed = None if allowed is None else np.asarray(allowed, dtype=bool)
+        counts = None if allowed is None else allowed.sum(axis=1)
+        most = shape2D[1] if allowed is None else counts.max()
+        least = shape2D[1] if allowed is None else counts.min()
+        skip = most - n
+        if n <= least and skip < n and COUNT_RATIO * skip < shape2D[1]:
+            return _complement_n_per_row(shape2D, n, allowed=allowed, counts=counts,
+                                         dtype=dtype, rng=rng, out=out)
+
+    many_columns = _many_columns(shape2D, n, allowed=allowed,
+                                 column_threshold=column_threshold)
+    func = _get_selection_func(n=n, with_allowed=allowed, many_columns=many_columns,
+                               columns=shape2D[1])
+    output = func(shape2D=shape2D, n=n, dtype=dtype, allowed=allowed, enforce_allowed=enforce_allowed,
+                  rng=rng, out=out)
 
     return output
 
 def one_per_row(shape2D, allowed=None, dtype=int, enforce_allowed=True,
-                column_threshold=None):
+                column_threshold=None, rng=None, out=None):
     '''Generate binary array with one "True" value per row.
 
     Use `allowed` to mask some cells as being non-selectable.  `enforce_allowed`
@@ -143,19 +470,91 @@ def one_per_row(shape2D, allowed=None, dtype=int, enforce_allowed=True,
     rows with no selections.
 
     The `column_threshold` is used to determine the method for generating
-    selections.  If `None`, the global `COLUMN_THRESHOLD` is used.  This
+    selections.  If `None`, the global `COLUMN_THRESHOLD` is used (see
+    `calibrate()`), but rows without room raise a ValueError (see below)
+    from the default threshold of 1000 columns whatever its value.  This
     argument was added to try and optimize different selection routines
     depending on the number of columns.  When above the threshold,
-    some approaches which are **not** vectorized will be used.'''
-
-    column_threshold = COLUMN_THRESHOLD if column_threshold is None else column_threshold
-    many_columns = shape2D[1] >= column_threshold
-    func = _get_selection_func(n=1, with_allowed=allowed, many_columns=many_columns)
-    output = func(shape2D=shape2D, n=1, dtype=dtype, allowed=allowed, enforce_allowed=enforce_allowed)
+    selections are drawn with a vectorized version of Floyd's algorithm,
+    whose cost grows with the number of selections rather than with the
+    number of columns; rows with fewer allowed cells than selections then
+    raise a ValueError.
+    Below the threshold, selections with `allowed` are also drawn by their
+    rank among the allowed cells of each row when there are more than
+    `COUNT_RATIO` columns per selection, e.g. for masks with few allowed
+    cells late in a game.
+
+    Random draws come from `rng` (a `np.random.Generator`), or from the
+    global `np.random` state when `rng` is None.
+
+    The selections are written into `out` (a C-contiguous array of shape
+    `shape2D`, e.g. from a `Workspace`) when it is given, rather than into
+    a new array of `dtype`.'''
+
+    many_columns = _many_columns(shape2D, 1, allowed=allowed,
+                                 column_threshold=column_threshold)
+    func = _get_selection_func(n=1, with_allowed=allowed, many_columns=many_columns,
+                               columns=shape2D[1])
+    output = func(shape2D=shape2D, n=1, dtype=dtype, allowed=allowed, enforce_allowed=enforce_allowed,
+                  rng=rng, out=out)
 
     return output
 
-def one_per_row_weighted(shape2D, weights, allowed=None, dtype=int):
+class AliasTable:
+    '''Walker alias table, for drawing indices with probabilities
+    proportional to fixed `weights` in constant time per draw.'''
+
+    def __init__(self, weights):
+        '''
+        Build the alias table of `weights` (Vose's method).  The table
+        splits each of the `k` indices into a probability of keeping the
+        index, and an alias taken otherwise.
+
+        Parameters
+        ----------
+        weights : list-like
+            Non-negative weights of each index.  Weights summing to zero
+            give a table which raises a ValueError when drawing.
+
+        Returns
+        -------
+        None.
+
+        '''
+        weights = np.asarray(weights, dtype=float)
+        self.size = len(weights)
+        self.total = weights.sum()
+        self.prob = np.ones(self.size)
+        self.alias = np.arange(self.size)
+        if self.total <= 0:
+            return
+
+        scaled = weights * self.size / self.total
+        small = list(np.flatnonzero(scaled < 1))
+        large = list(np.flatnonzero(scaled >= 1))
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+
+    def __eq__(self, other):
+        return (isinstance(other, AliasTable) and
+                np.array_equal(self.prob, other.prob) and
+                np.array_equal(self.alias, other.alias))
+
+    def draw(self, size, rng=None):
+        '''Draw `size` indices, from `rng` (a `np.random.Generator`) or
+        from the global `np.random` state when `rng` is None.'''
+        if self.total <= 0:
+            raise ValueError("Weights sum to zero.")
+        index = random_integers(high=self.size, size=size, rng=rng)
+        keep = random_floats((size,), rng=rng) < self.prob[index]
+        return np.where(keep, index, self.alias[index])
+
+def one_per_row_weighted(shape2D, weights, allowed=None, dtype=int, rng=None,
+                         table=None, out=None):
     '''Generate a binary/boolean array with one True per row, where
     the probabilities for each column are weighted.  Similar to
     `one_per_row()`, but allows for custom weighting.
@@ -164,11 +563,41 @@ def one_per_row_weighted(shape2D, weights, allowed=None, dtype=int):
     or the same length as there are "allowed" cells for each row.
 
     Use `allowed` to mask some cells as being non-selectable.  Having no
-    allowed cells for a given row or all 0 weights will throw an error.'''
+    allowed cells for a given row or all 0 weights will throw an error.
+
+    When the weights apply to the same cells of every row (all cells are
+    allowed, or there is one weight per allowed cell), selections are
+    drawn from an `AliasTable` of the weights in constant time per row.
+    Pass `table` to reuse a precomputed table of `weights`.  Otherwise
+    (weights for all cells with some not allowed), the weights are
+    renormalized for each row.
+
+    Random draws come from `rng` (a `np.random.Generator`), or from the
+    global `np.random` state when `rng` is None.  As for `one_per_row()`,
+    the selections are written into `out` when it is given.'''
 
     w = weights
     n, d = shape2D
 
+    # the same weights for every row: draw from an alias table
+    lw = len(w) if isinstance(w, Iterable) else None
+    if lw == d and (allowed is None or np.all(allowed)):
+        table = AliasTable(w) if table is None else table
+        chosen = table.draw(n, rng=rng)
+        output = _zeros(shape2D, dtype=dtype, out=out)
+        output[np.arange(n), chosen] = 1
+        return output
+    elif lw is not None and lw != d and allowed is not None:
+        allowed = allowed.astype(bool, copy=False)
+        counts = allowed.sum(axis=1)
+        if np.all(counts == lw):
+            table = AliasTable(w) if table is None else table
+            ranks = table.draw(n, rng=rng)
+            chosen = _rank_to_column(allowed, ranks, counts)
+            output = _zeros(shape2D, dtype=dtype, out=out)
+            output[np.arange(n), chosen] = 1
+            return output
+
     # init empty weights
     wmat = np.full(shape2D, np.nan)
 
@@ -198,10 +627,166 @@ def one_per_row_weighted(shape2D, weights, allowed=None, dtype=int):
     pmat = wmat / wsum[:, np.newaxis]
 
     cum_p = np.cumsum(pmat, axis=1)
-    draws = np.random.rand(n, 1)
+    draws = random_floats((n, 1), rng=rng)
     lt = (cum_p < draws)
     chosen = lt.sum(axis=1)
 
-    output = np.zeros(shape2D, dtype=int)
+    output = _zeros(shape2D, dtype=dtype, out=out)
     output[np.arange(n), chosen] = 1
     return output
+
+def _time_kernel(func, shape2D, n, allowed, repeat=3, rng=None):
+    '''Shortest time of `repeat` calls of a selection kernel.'''
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(shape2D=shape2D, n=n, allowed=allowed, rng=rng)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def _fit_threshold(values, times):
+    '''Threshold minimizing the total time of the cases, when the second
+    kernel (column 1 of `times`) is used for `values` above it.'''
+    values, times = np.asarray(values, dtype=float), np.asarray(times)
+    candidates = np.concatenate([[-np.inf], np.unique(values)])
+    cost = [np.where(values > t, times[:, 1], times[:, 0]).sum() for t in candidates]
+    return candidates[int(np.argmin(cost))]
+
+def _calibration_cases(doors, selections, densities, cells, rng=None):
+    '''Shapes, numbers of selections, and allowed masks (None for a
+    density of 1) to time the kernels on.'''
+    for y in doors:
+        x = max(1, cells // y)
+        for n in selections:
+            if n >= y:
+                continue
+            for density in densities:
+                if density >= 1:
+                    allowed = None
+                else:
+                    allowed = random_floats((x, y), rng=rng) < density
+                    allowed[:, :n] = True
+                yield (x, y), n, allowed
+
+def calibrate(save=False, path=None, cells=2 ** 18, repeat=3, rng=None):
+    '''
+    Time the selection kernels on this machine, and set the thresholds
+    choosing between them (`COUNT_RATIO` and `COLUMN_THRESHOLD`) to those
+    which were fastest.
+
+    Each kernel is timed on arrays of about `cells` cells, over a grid of
+    numbers of doors, numbers of selections, and densities of the allowed
+    mask.  `COUNT_RATIO` is fitted first, from the count-based kernel
+    against ranking random weights.  `COLUMN_THRESHOLD` is then fitted from
+    the kernels chosen below it against those chosen above it, from 100
+    doors up.  Each threshold minimizes the total time of its cases.
+    Rows with fewer allowed cells than selections are handled as with the
+    default thresholds (see `n_per_row()`).  However, the kernels draw
+    differently from the random stream, so the selections made with a
+    given seed or `rng` depend on the thresholds: seeded results are only
+    reproducible with the same calibration.  Set the
+    `CARGOAT_NO_CALIBRATION` environment variable to always use the
+    default thresholds.
+
+    Parameters
+    ----------
+    save : bool, optional
+        Save the thresholds, so that they are loaded when `cargoat` is
+        imported (see `load_calibration()`). The default is False.
+    path : str, optional
+        File to save the thresholds to. The default is None, in which case
+        `CALIBRATION_FILE` is used.
+    cells : int, optional
+        Number of cells of the arrays timed. The default is `2 ** 18`.
+    repeat : int, optional
+        Number of times each kernel is timed (the shortest time is kept).
+        The default is 3.
+    rng : np.random.Generator, optional
+        Random number generator for the timed selections. The default is
+        None, in which case the global `np.random` state is used.
+
+    Returns
+    -------
+    thresholds : dict
+        Fitted values of `COLUMN_THRESHOLD` and `COUNT_RATIO`.
+
+    '''
+    global COLUMN_THRESHOLD, COUNT_RATIO
+
+    ratios, times = [], []
+    for shape2D, n, allowed in _calibration_cases([8, 16, 32, 64, 128, 256, 512],
+                                                  [1, 2, 4, 8], [1, 0.5, 0.1],
+                                                  cells, rng=rng):
+        if allowed is None:
+            allowed = np.ones(shape2D, dtype=bool)
+        dense = _allowed_one_per_row_argmax if n == 1 else _allowed_n_per_row_partition
+        ratios.append(shape2D[1] / n)
+        times.append([_time_kernel(func, shape2D, n, allowed, repeat=repeat, rng=rng)
+                      for func in (dense, _allowed_n_per_row_count)])
+    COUNT_RATIO = max(float(_fit_threshold(ratios, times)), 0.0)
+
+    doors, times = [], []
+    for shape2D, n, allowed in _calibration_cases([100, 200, 500, 1000, 2000, 5000],
+                                                  [1, 2, 8], [1, 0.5],
+                                                  cells, rng=rng):
+        doors.append(shape2D[1])
+        times.append([_time_kernel(_get_selection_func(n=n, with_allowed=allowed,
+                                                       many_columns=many_columns,
+                                                       columns=shape2D[1]),
+                                   shape2D, n, allowed, repeat=repeat, rng=rng)
+                      for many_columns in (False, True)])
+    # Floyd's algorithm is used from the first number of doors above the
+    # fit, and not below the doors timed
+    fit = _fit_threshold(doors, times)
+    COLUMN_THRESHOLD = min(doors) if np.isinf(fit) else int(fit) + 1
+
+    thresholds = {'COLUMN_THRESHOLD': COLUMN_THRESHOLD, 'COUNT_RATIO': COUNT_RATIO}
+    if save:
+        path = CALIBRATION_FILE if path is None else path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({**thresholds, 'numpy': np.__version__}, f, indent=2)
+    return thresholds
+
+def load_calibration(path=None):
+    '''
+    Set the thresholds choosing between the selection kernels to those
+    saved by `calibrate()`.  This is done when `cargoat` is imported,
+    unless the `CARGOAT_NO_CALIBRATION` environment variable is set (as
+    the thresholds change the results of seeded games, see `calibrate()`).
+    Missing or unreadable files, and files saved with another version of
+    numpy, leave the default thresholds.
+
+    Parameters
+    ----------
+    path : str, optional
+        File to load. The default is None, in which case `CALIBRATION_FILE`
+        is used.
+
+    Returns
+    -------
+    thresholds : dict or None
+        Loaded values of `COLUMN_THRESHOLD` and `COUNT_RATIO`, or None if
+        the defaults were used.
+
+    '''
+    global COLUMN_THRESHOLD, COUNT_RATIO
+
+    COLUMN_THRESHOLD = _DEFAULT_THRESHOLDS['COLUMN_THRESHOLD']
+    COUNT_RATIO = _DEFAULT_THRESHOLDS['COUNT_RATIO']
+    path = CALIBRATION_FILE if path is None else path
+    try:
+        with open(path, encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get('numpy') != np.__version__:
+            return None
+        column_threshold = int(saved['COLUMN_THRESHOLD'])
+        count_ratio = float(saved['COUNT_RATIO'])
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+    COLUMN_THRESHOLD, COUNT_RATIO = column_threshold, count_ratio
+    return {'COLUMN_THRESHOLD': COLUMN_THRESHOLD, 'COUNT_RATIO': COUNT_RATIO}
+
+if not os.environ.get('CARGOAT_NO_CALIBRATION'):
+    load_calibration()
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+
+'''This subpackage defines alternative storage layouts for simulations.
+Each is a subclass of `cargoat.sim.MontyHallSim` exposing the same
+`cars`, `picked`, and `revealed` arrays, so all the actions in
+`cargoat.actions` work unchanged.  Pass one as the `sim_class`
+of `cargoat.core.play()`.'''
+
+__all__ = [
+    'EncodedMontyHallSim',
+    'FusedMontyHallSim',
+    'MemmapMontyHallSim',
+    'OccupancyMontyHallSim',
+    'PackedMontyHallSim',
+    'SparseMontyHallSim'
+    ]
+
+from cargoat.backends.base import EncodedMontyHallSim
+from cargoat.backends.fused import FusedMontyHallSim
+from cargoat.backends.memmap import MemmapMontyHallSim
+from cargoat.backends.occupancy import OccupancyMontyHallSim
+from cargoat.backends.packed import PackedMontyHallSim
+from cargoat.backends.sparse import SparseMontyHallSim
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared parent class for simulations which store the door arrays in an
+encoded (non-dense) form.
+"""
+
+import numpy as np
+
+from cargoat.sim import MontyHallSim
+
+MAIN_ARRAYS = ('cars', 'picked', 'revealed')
+
+def _encoded_property(name):
+    '''Create a property which encodes/decodes one of the main arrays.'''
+
+    def getter(self):
+        return self._decode(self._data[name], self._doors[name])
+
+    def setter(self, value):
+        self._data[name], self._doors[name] = self._encode(value)
+
+    doc = (f'Decoded `{name}` array.  Note that this is a new array on each '
+           'access, so modify it by re-assigning rather than in place.')
+    return property(getter, setter, doc=doc)
+
+class EncodedMontyHallSim(MontyHallSim):
+    '''Parent class for simulations with encoded door arrays.'''
+
+    cars = _encoded_property('cars')
+    picked = _encoded_property('picked')
+    revealed = _encoded_property('revealed')
+
+    # value used to pad encoded rows when stacking simulations
+    _fill_value = 0
+
+    # trials with different numbers of doors are not supported
+    _ragged = False
+
+    def __init__(self, n, dtype=bool):
+        '''
+        Parent class for `cargoat.sim.MontyHallSim` subclasses which store
+        each of the `cars`, `picked`, and `revealed` arrays in some
+        encoded form, with one row of the encoded array per trial.
+
+        The arrays are available as usual through the `cars`, `picked`, and
+        `revealed` attributes, but these are decoded on every access.
+        **Changes made in place to these arrays are lost** - re-assign
+        the attribute instead.
+
+        Subclasses must implement `_encode()` and `_decode()`, and
+        should override the status methods of `cargoat.sim.MontyHallSim`
+        (e.g. `is_win()`) to work on the encoded data.
+
+        Parameters
+        ----------
+        n : int
+            Number of trials to simulate.
+        dtype : data-type, optional
+            Data type of the arrays produced when decoding. The default
+            is `bool`.
+
+        Returns
+        -------
+        None.
+
+        '''
+        self._data = {}
+        self._doors = {}
+        super().__init__(n, dtype=dtype)
+
+    # ---- Encoding
+
+    def _encode(self, a):
+        '''Return the encoded form of the 2D binary array `a`, and its
+        number of doors.  For empty (non-2D) arrays, the number of doors
+        should be None.'''
+        raise NotImplementedError
+
+    def _decode(self, data, doors):
+        '''Inverse of `_encode()`, returning an array of `self.dtype`.'''
+        raise NotImplementedError
+
+    # ---- Properties
+
+    @property
+    def shape(self):
+        '''Return the dimensions of the simulation (trials, doors).  Throws an error if
+        different array shapes are found.'''
+        shape_set = set(self._shape_of(name) for name in MAIN_ARRAYS)
+        if len(shape_set) != 1:
+            raise RuntimeError('Found different shapes for simulation arrays!')
+
+        return shape_set.pop()
+
+    @property
+    def empty(self):
+        '''Determine if the sim is "empty" - this is the status it should
+        have prior to applying any operations.'''
+        return (all(0 in self._shape_of(name) for name in MAIN_ARRAYS) and
+                self.spoiled.size == 0)
+
+    @property
+    def nbytes(self):
+        '''Bytes used to store the encoded cars, picked, and revealed arrays.'''
+        return sum(self._data[name].nbytes for name in MAIN_ARRAYS)
+
+    def _shape_of(self, name):
+        data = self._data[name]
+        doors = self._doors[name]
+        return data.shape if doors is None else (data.shape[0], doors)
+
+    def _from_data(self, data, spoiled):
+        '''Create a new simulation of the same class from encoded data.'''
+        out = type(self)(len(spoiled), dtype=self.dtype)
+        out._data = data
+        out._doors = dict(self._doors)
+        out.spoiled = spoiled
+        out.rng = self.rng
+        return out
+
+    # ---- Class methods
+
+    @classmethod
+    def _combine(cls, sims, index, copy=True):
+        filled = [x for x in sims if not x.empty]
+        template = filled[0]
+        data = {}
+        for name in MAIN_ARRAYS:
+            width = max(x._data[name].shape[1] for x in filled)
+            dtype = np.result_type(*[x._data[name] for x in filled])
+            data[name] = np.full((len(index), width), cls._fill_value, dtype=dtype)
+
+        spoiled = np.zeros(len(index), dtype=bool)
+        for i in np.unique(index):
+            sim = sims[i]
+            for name in MAIN_ARRAYS:
+                block = sim._data[name]
+                data[name][index == i, :block.shape[1]] = block
+            spoiled[index == i] = sim.spoiled
+
+        return template._from_data(data, spoiled)
+
+    # ---- Initialization
+
+    def _blank(self, doors):
+        '''Encoded form of an all-zero array with `doors` doors.'''
+        return self._encode(np.zeros((self.n, doors), dtype=bool))[0]
+
+    def init_doors(self, doors):
+        '''Populate arrays with zeros.'''
+        for name in MAIN_ARRAYS:
+            self._data[name] = self._blank(doors)
+            self._doors[name] = int(doors)
+        self.spoiled = np.zeros(self.n, dtype=bool)
+
+    # ---- Indexing
+
+    def select(self, x=None, y=None, copy=True, use_ix_=True):
+        '''Index the simulation to create a new one.  Selecting only trials
+        (`y=None`) works on the encoded arrays directly, other selections
+        fall back to `cargoat.sim.MontyHallSim.select()`.'''
+        if y is not None or self.empty:
+            return super().select(x=x, y=y, copy=copy, use_ix_=use_ix_)
+
+        x = [x] if isinstance(x, int) else x
+        x = slice(None) if x is None else x
+        copyfun = (lambda x: x.copy()) if copy else (lambda x: x)
+
+        data = {name: copyfun(self._data[name][x]) for name in MAIN_ARRAYS}
+        return self._from_data(data, copyfun(self.spoiled[x]))
+
+    # ---- Generic setter functions
+
+    def _is_allocated(self, target, array):
+        # the decoded arrays are new on each access
+        return True
+
+    def _update_array(self, target, new_array, behavior='overwrite'):
+        # the decoded arrays are new on each access, so an overwrite only
+        # needs to encode the new array
+        if behavior == 'overwrite':
+            return setattr(self, target, new_array)
+        return super()._update_array(target, new_array, behavior=behavior)
+
+    # ---- Other Helpers
+
+    def _assign_from(self, sim):
+        if type(sim) is not type(self):
+            return super()._assign_from(sim)
+        self._data = dict(sim._data)
+        self._doors = dict(sim._doors)
+        self.spoiled = sim.spoiled
+
+    def copy(self):
+        '''
+        Create a copy of the current simulation.
+
+        Returns
+        -------
+        EncodedMontyHallSim
+
+        '''
+        data = {name: self._data[name].copy() for name in MAIN_ARRAYS}
+        return self._from_data(data, self.spoiled.copy())
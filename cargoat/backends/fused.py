@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fused storage, holding all door information in a single array of bitflags.
+"""
+
+import numpy as np
+
+from cargoat.sim import MontyHallSim
+
+# bit used for each door array within the fused state
+FLAGS = {'cars': 1, 'picked': 2, 'revealed': 4}
+
+def _flag_property(name):
+    '''Create a property reading/writing one bit of the fused state.'''
+    flag = np.uint8(FLAGS[name])
+
+    def getter(self):
+        if self.state.ndim != 2:
+            return np.empty(0, dtype=self.dtype)
+        return (self.state & flag).astype(bool).astype(self.dtype, copy=False)
+
+    def setter(self, value):
+        value = np.asarray(value)
+        if value.ndim != 2:
+            if value.size != 0:
+                raise ValueError('Door arrays must be 2D (trials, doors).')
+            self.state = np.empty(0, dtype=np.uint8)
+            return
+        if self.state.shape != value.shape:
+            self.state = np.zeros(value.shape, dtype=np.uint8)
+        self.state &= ~flag
+        self.state |= value.astype(bool, copy=False).view(np.uint8) * flag
+
+    doc = (f'The `{name}` array, extracted from the fused state.  Note that '
+           'this is a new array on each access, so modify it by re-assigning '
+           'rather than in place.')
+    return property(getter, setter, doc=doc)
+
+class FusedMontyHallSim(MontyHallSim):
+    '''Simulation storing all door arrays in one array of bitflags.'''
+
+    cars = _flag_property('cars')
+    picked = _flag_property('picked')
+    revealed = _flag_property('revealed')
+
+    # trials with different numbers of doors are not supported
+    _ragged = False
+
+    def __init__(self, n, dtype=bool):
+        '''
+        A `cargoat.sim.MontyHallSim` which stores the `cars`, `picked`,
+        and `revealed` arrays as bits of a single (trials, doors) `np.uint8`
+        array, `self.state`.  The bit for each array is given by `FLAGS`.
+
+        Any combination of conditions in `query_doors_or()` (and so the
+        exclusions of every pick/reveal) becomes a single mask comparison
+        on the state, and adding, removing, or rearranging doors
+        touches one array instead of three.  The state uses one byte per
+        door, the same as a `bool` `cargoat.sim.MontyHallSim` needs for
+        *each* of its three arrays.
+
+        The arrays are available as usual through the `cars`, `picked`, and
+        `revealed` attributes, but these are extracted from the state on
+        every access.  **Changes made in place to these arrays are lost** -
+        re-assign the attribute instead.
+
+        Parameters
+        ----------
+        n : int
+            Number of trials to simulate.
+        dtype : data-type, optional
+            Data type of the arrays extracted from the state. The default
+            is `bool`.
+
+        Returns
+        -------
+        None.
+
+        '''
+        super().__init__(n, dtype=dtype)
+
+    # ---- Class methods
+
+    @classmethod
+    def _combine(cls, sims, index, copy=True):
+        template = [x for x in sims if not x.empty][0]
+        state = np.zeros((len(index), template.shape[1]), dtype=np.uint8)
+        spoiled = np.zeros(len(index), dtype=bool)
+        for i in np.unique(index):
+            state[index == i] = sims[i].state
+            spoiled[index == i] = sims[i].spoiled
+
+        return template._from_state(state, spoiled)
+
+    # ---- Properties
+
+    @property
+    def shape(self):
+        '''Return the dimensions of the simulation (trials, doors).'''
+        return self.state.shape
+
+    @property
+    def empty(self):
+        '''Determine if the sim is "empty" - this is the status it should
+        have prior to applying any operations.'''
+        return self.state.size == 0 and self.spoiled.size == 0
+
+    @property
+    def nbytes(self):
+        '''Bytes used to store the fused state.'''
+        return self.state.nbytes
+
+    def _from_state(self, state, spoiled):
+        out = type(self)(len(spoiled), dtype=self.dtype)
+        out.state = state
+        out.spoiled = spoiled
+        out.rng = self.rng
+        return out
+
+    # ---- Initialization
+
+    def init_doors(self, doors):
+        '''Populate arrays with zeros.'''
+        self.state = np.zeros((self.n, doors), dtype=np.uint8)
+        self.spoiled = np.zeros(self.n, dtype=bool)
+
+    def make_empty(self):
+        '''Save empty arrays into main arrays.'''
+        self.state = np.empty(0, dtype=np.uint8)
+        self.spoiled = np.empty(0, dtype=bool)
+
+    # ---- Indexing
+
+    def select(self, x=None, y=None, copy=True, use_ix_=True):
+        '''Index the simulation to create a new one, see
+        `cargoat.sim.MontyHallSim.select()`.'''
+        if self.empty:
+            return super().select(x=x, y=y, copy=copy, use_ix_=use_ix_)
+
+        x, y = self._indexers(x, y, use_ix_=use_ix_)
+        copyfun = (lambda x: x.copy()) if copy else (lambda x: x)
+
+        return self._from_state(copyfun(self.state[x, y]),
+                                copyfun(self.spoiled[x]))
+
+    # ---- Status of the sim
+
+    def query_doors_or(self, cars=False, picked=False, revealed=False,
+                       not_cars=False, not_picked=False, not_revealed=False,
+                       out=None):
+        '''See `cargoat.sim.MontyHallSim.query_doors_or()`.  For the fused
+        state, any query is a single mask comparison.'''
+        positive = ((FLAGS['cars'] * cars) |
+                    (FLAGS['picked'] * picked) |
+                    (FLAGS['revealed'] * revealed))
+        negative = ((FLAGS['cars'] * not_cars) |
+                    (FLAGS['picked'] * not_picked) |
+                    (FLAGS['revealed'] * not_revealed))
+        if out is None:
+            out = np.empty(self.shape, dtype=bool)
+        if positive & negative:
+            # e.g. cars or not cars
+            out[...] = True
+            return out
+        mask = np.uint8(positive | negative)
+        return np.not_equal((self.state ^ np.uint8(negative)) & mask, 0, out=out)
+
+    def count_totals(self, target):
+        '''Return a count of the number of positives for each trial in the
+        simulation.  Target is `cars`, `picked`, or `revealed`. '''
+        return ((self.state & np.uint8(FLAGS[target])) != 0).sum(axis=1)
+
+    # ---- Generic setter functions
+
+    def _update_array(self, target, new_array, behavior='overwrite'):
+        if behavior == 'overwrite':
+            return setattr(self, target, new_array)
+        flag = np.uint8(FLAGS[target])
+        bits = new_array.astype(bool, copy=False).view(np.uint8) * flag
+        if behavior == 'add':
+            self.state |= bits
+        elif behavior == 'remove':
+            self.state &= ~bits
+
+    # ---- Remodeling
+
+    def insert_doors(self, positions):
+        self.state = np.insert(arr=self.state, obj=positions, values=0, axis=1)
+
+    def delete_doors(self, positions):
+        self.state = np.delete(arr=self.state, obj=positions, axis=1)
+
+    def rearrange_doors(self, positions):
+        self.state = self.state[:, positions]
+
+    # ---- Other Helpers
+
+    def _assign_from(self, sim):
+        if not isinstance(sim, FusedMontyHallSim):
+            return super()._assign_from(sim)
+        self.state = sim.state
+        self.spoiled = sim.spoiled
+
+    def copy(self):
+        '''
+        Create a copy of the current simulation.
+
+        Returns
+        -------
+        FusedMontyHallSim
+
+        '''
+        return self._from_state(self.state.copy(), self.spoiled.copy())
+
+    # ---- Results
+
+    def is_win(self):
+        '''
+        Return a boolean array indicating which trials are wins.  I.e.,
+        at least one door with a car is picked.  Spoiled games have not
+        bearing on this method
+        '''
+        both = np.uint8(FLAGS['cars'] | FLAGS['picked'])
+        return np.any((self.state & both) == both, axis=1)
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Memory-mapped storage, for simulations with more trials than fit in memory.
+"""
+
+import tempfile
+
+import numpy as np
+
+from cargoat.errors import MontyHallError
+from cargoat.sim import MontyHallSim, _make_results
+
+MAPPED_ARRAYS = ('cars', 'picked', 'revealed', 'spoiled')
+
+# approximate number of door cells (trials x doors) loaded into memory
+# at once, when `block_size` is not set
+BLOCK_CELLS = 2 ** 22
+
+def _is_mapped(a):
+    '''Check if `a` is (a view of) a memory-mapped file.'''
+    return getattr(a, '_mmap', None) is not None
+
+def _mapped_property(name):
+    '''Create a property storing one of the arrays in a mapped file.'''
+
+    def getter(self):
+        return self._maps[name]
+
+    def setter(self, value):
+        self._store(name, value)
+
+    doc = (f'The `{name}` array, as a `np.memmap` (or an in-memory array '
+           'when empty).')
+    return property(getter, setter, doc=doc)
+
+class MemmapMontyHallSim(MontyHallSim):
+    '''Simulation storing arrays in memory-mapped scratch files.'''
+
+    cars = _mapped_property('cars')
+    picked = _mapped_property('picked')
+    revealed = _mapped_property('revealed')
+    spoiled = _mapped_property('spoiled')
+
+    # trials with different numbers of doors are not supported
+    _ragged = False
+
+    def __init__(self, n, dtype=bool, scratch_dir=None, block_size=None):
+        '''
+        A `cargoat.sim.MontyHallSim` which stores the `cars`, `picked`,
+        `revealed`, and `spoiled` arrays as `np.memmap` arrays, backed by
+        temporary files in a scratch directory.  This allows simulations
+        with more trials than fit in memory.
+
+        The arrays are processed in blocks of trials: picking, revealing,
+        and placing cars (`cargoat.actions.generic.GenericAction`),
+        remodeling doors, selecting & combining trials, and getting
+        results only hold one block of each array in memory at a time.
+        Other operations (e.g. the `query_doors_or()` method, or comparing
+        simulations) load whole arrays.  The scratch files are
+        deleted once their arrays are no longer referenced.
+
+        Use `functools.partial` to change the options when passing this
+        class as the `sim_class` of `cargoat.core.play()`, e.g.
+        `sim_class=partial(MemmapMontyHallSim, scratch_dir='/scratch')`.
+
+        Parameters
+        ----------
+        n : int
+            Number of trials to simulate.
+        dtype : data-type, optional
+            Data type of the mapped door arrays. The default is `bool`.
+        scratch_dir : str, optional
+            Directory for the mapped files. The default is None, in
+            which case the default temporary directory is used (see
+            `tempfile.gettempdir()`).
+        block_size : int, optional
+            Number of trials to process at once. The default is None,
+            in which case it is chosen so that each block holds about
+            `BLOCK_CELLS` doors.
+
+        Returns
+        -------
+        None.
+
+        '''
+        self.scratch_dir = scratch_dir
+        self.block_size = block_size
+        self._maps = {}
+        # names of arrays whose files were created by this simulation, which
+        # can be written in place; others are copied before writing
+        self._owned = set()
+        super().__init__(n, dtype=dtype)
+
+    # ---- Class methods
+
+    @classmethod
+    def from_arrays(cls, picked=None, revealed=None, cars=None,
+                    spoiled=None, default=0, copy=True, dtype=None, valid=None):
+        '''
+        Construct a MemmapMontyHallSim from existing numpy arrays,
+        see `cargoat.sim.MontyHallSim.from_arrays()`.  Arrays which are not
+        memory-mapped are written to new scratch files.  Memory-mapped arrays
+        (e.g. a `np.memmap` of an existing file) are used directly when
+        `copy=False`, and are otherwise copied block by block.  Trials with
+        different numbers of doors are not supported, so `valid` must be
+        None or all True.
+        '''
+        out = super().from_arrays(picked=picked, revealed=revealed, cars=cars,
+                                  spoiled=spoiled, default=default, copy=False,
+                                  dtype=dtype, valid=valid)
+        if copy:
+            for name in MAPPED_ARRAYS:
+                out._own(name)
+        return out
+
+    @classmethod
+    def _combine(cls, sims, index, copy=True):
+        template = [x for x in sims if not x.empty][0]
+        out = template._like(len(index))
+        out.init_doors(template.shape[1])
+        for i in np.unique(index):
+            sim = sims[i]
+            if sim.empty:
+                continue
+            rows = np.flatnonzero(index == i)
+            for block in sim._blocks():
+                for name in MAPPED_ARRAYS:
+                    out._maps[name][rows[block]] = sim._maps[name][block]
+
+        return out
+
+    # ---- Storage
+
+    def _like(self, n):
+        '''Create an empty simulation with the same settings.'''
+        out = type(self)(n, dtype=self.dtype, scratch_dir=self.scratch_dir,
+                         block_size=self.block_size)
+        out.rng = self.rng
+        return out
+
+    def _new_map(self, shape, dtype):
+        '''Create a zero-filled array in a new scratch file.'''
+        if 0 in shape:
+            return np.zeros(shape, dtype=dtype)
+        with tempfile.TemporaryFile(prefix='cargoat-', dir=self.scratch_dir) as f:
+            # the mapping stays valid after the file is closed
+            return np.memmap(f, dtype=dtype, mode='w+', shape=shape)
+
+    def _blocks(self, n=None, doors=None):
+        '''Generate slices covering the trials in blocks.'''
+        n = self.n if n is None else n
+        if doors is None:
+            doors = 1 if self.empty else self.shape[1]
+        size = self.block_size or max(1, BLOCK_CELLS // max(doors, 1))
+        for start in range(0, n, size):
+            yield slice(start, min(start + size, n))
+
+    def _store(self, name, value):
+        '''Set one of the arrays, writing it to a scratch file.'''
+        if value is self._maps.get(name):
+            return
+        if _is_mapped(value):
+            self._maps[name] = value
+            self._owned.discard(name)
+            return
+
+        dtype = bool if name == 'spoiled' else self.dtype
+        value = np.asarray(value)
+        if value.size == 0:
+            self._maps[name] = value.astype(dtype)
+            self._owned.discard(name)
+            return
+
+        current = self._maps.get(name)
+        if not (name in self._owned and current.shape == value.shape):
+            current = self._new_map(value.shape, dtype)
+        doors = value.shape[1] if value.ndim == 2 else 1
+        for block in self._blocks(len(value), doors):
+            current[block] = value[block]
+        self._maps[name] = current
+        self._owned.add(name)
+
+    def _own(self, name):
+        '''Make sure the file of an array belongs to this simulation (so
+        it can be written in place), copying it if not.'''
+        current = self._maps[name]
+        if name in self._owned or current.size == 0:
+            return
+        new = self._new_map(current.shape, current.dtype)
+        for block in self._blocks():
+            new[block] = current[block]
+        self._maps[name] = new
+        self._owned.add(name)
+
+    # ---- Initialization
+
+    def init_doors(self, doors):
+        '''Populate arrays with zeros.'''
+        for name in MAPPED_ARRAYS:
+            if name == 'spoiled':
+                self._maps[name] = self._new_map((self.n,), bool)
+            else:
+                self._maps[name] = self._new_map((self.n, doors), self.dtype)
+            self._owned.add(name)
+
+    # ---- Indexing
+
+    def select(self, x=None, y=None, copy=True, use_ix_=True):
+        '''Index the simulation to create a new one, see
+        `cargoat.sim.MontyHallSim.select()`.  The selection is always
+        copied to new scratch files.'''
+        if self.empty or (x is not None and y is not None and not use_ix_):
+            return super().select(x=x, y=y, copy=copy, use_ix_=use_ix_)
+
+        rows = np.arange(self.n)[self._indexers(x=x)[0]]
+        y = self._indexers(y=y)[1]
+        doors = np.zeros(self.shape[1])[y].size
+
+        out = self._like(len(rows))
+        out.init_doors(doors)
+        for block in out._blocks():
+            chunk = rows[block]
+            for name in MAPPED_ARRAYS:
+                source = self._maps[name][chunk]
+                out._maps[name][block] = source if name == 'spoiled' else source[:, y]
+
+        return out
+
+    # ---- Status of the sim
+
+    def count_totals(self, target):
+        '''Return a count of the number of positives for each trial in the
+        simulation.  Target is `cars`, `picked`, or `revealed`. '''
+        arr = getattr(self, target)
+        return np.concatenate([arr[block].sum(axis=1) for block in self._blocks()])
+
+    # ---- Generic setter functions
+
+    def _update_array(self, target, new_array, behavior='overwrite'):
+        self._own(target)
+        old_array = self._maps[target]
+        for block in self._blocks():
+            new = new_array[block]
+            if behavior == 'add':
+                new = np.logical_or(new, old_array[block])
+            elif behavior == 'remove':
+                new = np.logical_and(old_array[block], np.logical_not(new))
+            old_array[block] = new
+
+    def _apply_generic_action(self, action):
+        if self.empty:
+            return False
+
+        target = action.target
+        self._own(target)
+        self._own('spoiled')
+        for block in self._blocks():
+            # spoiled trials are written through to the mapped array
+            part = MontyHallSim.from_arrays(cars=np.asarray(self.cars[block]),
+                                            picked=np.asarray(self.picked[block]),
+                                            revealed=np.asarray(self.revealed[block]),
+                                            spoiled=self.spoiled[block],
+                                            dtype=self.dtype,
+                                            copy=False)
+            part.rng = self.rng
+            try:
+                action(part)
+            except MontyHallError as error:
+                msg = f'{error}\n(trial numbers are relative to trial {block.start})'
+                raise type(error)(msg) from error
+            getattr(self, target)[block] = getattr(part, target)
+
+        return True
+
+    # ---- Other Helpers
+
+    def apply_func(self, func, inplace=False, cars=True, picked=True, revealed=True):
+        '''
+        Apply a function to one or more of the cars, picked, and revealed
+        arrays, see `cargoat.sim.MontyHallSim.apply_func()`.  The function
+        is applied to each block of trials separately, so it must treat
+        the trials (rows) independently.
+        '''
+        apply_to = [x for i, x in enumerate(['cars', 'picked', 'revealed'])
+                    if [cars, picked, revealed][i]]
+        blocks = list(self._blocks())
+        for attr in apply_to:
+            if inplace:
+                self._own(attr)
+                for block in blocks:
+                    func(self._maps[attr][block])
+                continue
+
+            new = None
+            for block in blocks:
+                part = func(np.asarray(self._maps[attr][block]))
+                if new is None:
+                    new = self._new_map((self.n, part.shape[1]), part.dtype)
+                new[block] = part
+            if new is not None:
+                self._maps[attr] = new
+                self._owned.add(attr)
+
+    def _assign_from(self, sim):
+        if type(sim) is not type(self):
+            return super()._assign_from(sim)
+        # take over the files of `sim`, which has to copy them before writing
+        self._maps = dict(sim._maps)
+        self._owned = set(sim._owned)
+        sim._owned = set()
+
+    def copy(self):
+        '''
+        Create a copy of the current simulation.
+
+        Returns
+        -------
+        MemmapMontyHallSim
+
+        '''
+        if self.empty:
+            return self._like(self.n)
+        return self.select()
+
+    # ---- Results
+
+    def is_win(self):
+        '''
+        Return a boolean array indicating which trials are wins.  I.e.,
+        at least one door with a car is picked.  Spoiled games have not
+        bearing on this method
+        '''
+        return np.concatenate([np.any(np.logical_and(self.picked[block],
+                                                     self.cars[block]), axis=1)
+                               for block in self._blocks()])
+
+    def get_results(self, condition=None):
+        '''
+        Return a dictionary containing the game results, see
+        `cargoat.sim.MontyHallSim.get_results()`.  Wins are counted block
+        by block.  `condition` can be a boolean array with one entry
+        per trial; other conditions select the trials first.
+        '''
+        if condition is not None:
+            condition = np.asarray(condition)
+            if condition.dtype != bool or condition.shape != (self.n,):
+                return super().get_results(condition=condition)
+
+        trials = self.n if condition is None else int(condition.sum())
+        wins = np.int64(0)
+        spoiled_games = np.bool_(False)
+        for block in self._blocks():
+            win = np.any(np.logical_and(self.picked[block], self.cars[block]), axis=1)
+            spoiled = self.spoiled[block]
+            if condition is not None:
+                win = win[condition[block]]
+                spoiled = spoiled[condition[block]]
+            wins += np.sum(win)
+            spoiled_games |= np.any(spoiled)
+
+        return _make_results(trials=trials, wins=wins, spoiled_games=spoiled_games)
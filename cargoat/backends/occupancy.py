@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Occupancy-count storage, holding only the number of doors of each kind per
+trial, for games with very many exchangeable doors.
+"""
+
+import numpy as np
+
+from cargoat.arrayops import random_floats
+from cargoat.backends.fused import FLAGS
+from cargoat.errors import (
+    BadCar,
+    BadPick,
+    BadReveal,
+    bad_trials_raise,
+    check_n_per_row
+    )
+from cargoat.sim import MontyHallSim
+
+# categories of doors: bitwise combinations of FLAGS
+CATEGORIES = np.arange(8)
+
+def _has(flag):
+    '''Boolean mask of the categories with `flag` set.'''
+    return (CATEGORIES & flag) != 0
+
+def _count_dtype(doors):
+    '''Smallest unsigned integer type able to hold door counts.'''
+    return np.promote_types(np.min_scalar_type(int(doors)), np.uint8)
+
+def _hypergeometric(counts, k, rng=None):
+    '''
+    Draw `k` doors uniformly without replacement for each trial, given the
+    (categories, trials) array of door `counts`, returning the number drawn
+    from each category in the same layout.  Trials must hold at least `k`
+    doors.  The multivariate draw is made as a sequence of univariate
+    hypergeometric draws, one per category, each vectorized over the trials.
+    '''
+    random = np.random if rng is None else rng
+    out = np.zeros(counts.shape, dtype=np.int64)
+    left = np.full(counts.shape[1], k, dtype=np.int64)
+    remaining = counts.sum(axis=0, dtype=np.int64)
+    for j in range(len(counts) - 1):
+        good = counts[j].astype(np.int64)
+        remaining -= good
+        # when no other doors remain, the rest are drawn from this category
+        drawn = np.where(remaining == 0, left, 0)
+        rows = (left > 0) & (good > 0) & (remaining > 0)
+        if rows.any():
+            drawn[rows] = random.hypergeometric(good[rows], remaining[rows],
+                                                left[rows])
+        out[j] = drawn
+        left -= drawn
+    out[-1] = left
+    return out
+
+def _dense_property(name):
+    '''Create a property for one of the dense door arrays, which are
+    expanded from the occupancy counts on first access.'''
+
+    def getter(self):
+        self._expand()
+        return self._dense[name]
+
+    def setter(self, value):
+        self._expand()
+        self._dense[name] = value
+
+    doc = (f'The `{name}` array.  Accessing it switches a simulation storing '
+           'occupancy counts to dense arrays.')
+    return property(getter, setter, doc=doc)
+
+class OccupancyMontyHallSim(MontyHallSim):
+    '''Simulation storing the number of doors of each kind per trial.'''
+
+    cars = _dense_property('cars')
+    picked = _dense_property('picked')
+    revealed = _dense_property('revealed')
+
+    # trials with different numbers of doors are not supported
+    _ragged = False
+
+    def __init__(self, n, dtype=bool):
+        '''
+        A `cargoat.sim.MontyHallSim` which, rather than door arrays, stores
+        how many doors of each trial fall in each category of (car, picked,
+        revealed) - e.g. "2 closed goats, 1 picked car".  The counts are a
+        (trials, 8) array, `self.occupancy`, where the category of each
+        column is a combination of the bits in
+        `cargoat.backends.fused.FLAGS`.
+
+        This is possible while every action treats the eligible doors of a
+        trial symmetrically, i.e. initializing with
+        `cargoat.actions.initialization.InitDoorsRandom` followed by
+        picking, revealing, and placing cars
+        (`cargoat.actions.generic.GenericAction`) with a *number* of doors.
+        These select doors with multivariate hypergeometric draws on the
+        counts, so the cost per trial does not depend on the number of
+        doors: a million-door game costs the same as a 3-door one.  Logical
+        actions (e.g. `cargoat.actions.logical.ChanceTo`) and rearranging
+        doors keep the counts.
+
+        Any other use of the door arrays - e.g. picking specific doors or
+        with weights, `cargoat.actions.initialization.InitDoorsFixed`,
+        `IfElse` conditions reading the arrays, or adding/removing doors -
+        switches the simulation to dense arrays for good, placing the
+        counted doors of each trial in a random order.  This is correct
+        since the doors are exchangeable, but is as slow as the dense
+        simulation from then on.  Note that the random draws differ from
+        `cargoat.sim.MontyHallSim`, so a seeded game does not reproduce
+        the trials of the dense simulation.
+
+        Parameters
+        ----------
+        n : int
+            Number of trials to simulate.
+        dtype : data-type, optional
+            Data type of the dense arrays. The default is `bool`.
+
+        Returns
+        -------
+        None.
+
+        '''
+        self.occupancy = None
+        self._doors = None
+        self._dense = {}
+        super().__init__(n, dtype=dtype)
+
+    def __eq__(self, sim):
+        if (isinstance(sim, OccupancyMontyHallSim) and
+                self.occupancy is not None and sim.occupancy is not None):
+            return (self.shape == sim.shape and
+                    np.array_equal(self.occupancy, sim.occupancy) and
+                    np.array_equal(self.spoiled, sim.spoiled))
+        return super().__eq__(sim)
+
+    # ---- Class methods
+
+    @classmethod
+    def _combine(cls, sims, index, copy=True):
+        filled = [x for x in sims if not x.empty]
+        if any(x.occupancy is None for x in filled):
+            return super()._combine(sims, index, copy=copy)
+
+        template = filled[0]
+        dtype = np.result_type(*[x.occupancy for x in filled])
+        occupancy = np.zeros((len(index), len(CATEGORIES)), dtype=dtype)
+        spoiled = np.zeros(len(index), dtype=bool)
+        for i in np.unique(index):
+            occupancy[index == i] = sims[i].occupancy
+            spoiled[index == i] = sims[i].spoiled
+
+        return template._from_occupancy(occupancy, spoiled)
+
+    # ---- Properties
+
+    @property
+    def shape(self):
+        '''Return the dimensions of the simulation (trials, doors).'''
+        if self.occupancy is None:
+            return super().shape
+        return (self.n, self._doors)
+
+    @property
+    def empty(self):
+        '''Determine if the sim is "empty" - this is the status it should
+        have prior to applying any operations.'''
+        return self.occupancy is None and super().empty
+
+    @property
+    def nbytes(self):
+        '''Bytes used to store the occupancy counts (or dense arrays).'''
+        if self.occupancy is None:
+            return sum(self._dense[name].nbytes for name in FLAGS)
+        return self.occupancy.nbytes
+
+    def _from_occupancy(self, occupancy, spoiled):
+        out = type(self)(len(spoiled), dtype=self.dtype)
+        out.occupancy = np.asfortranarray(occupancy)
+        out._doors = self._doors
+        out.spoiled = spoiled
+        out.rng = self.rng
+        return out
+
+    # ---- Initialization
+
+    def init_doors(self, doors):
+        '''Populate the counts with closed, unpicked goats.'''
+        self._dense = {}
+        self._doors = int(doors)
+        # stored by category (column-major), as actions work category-wise
+        counts = np.zeros((len(CATEGORIES), self.n), dtype=_count_dtype(doors))
+        counts[0] = doors
+        self.occupancy = counts.T
+        self.spoiled = np.zeros(self.n, dtype=bool)
+
+    def make_empty(self):
+        '''Save empty arrays into main arrays.'''
+        self.occupancy = None
+        self._doors = None
+        super().make_empty()
+
+    def _expand(self):
+        '''Switch to dense arrays, placing the doors of each trial in a
+        random order.'''
+        if self.occupancy is None:
+            return
+        n, doors = self.shape
+        codes = np.repeat(np.tile(CATEGORIES, n), self.occupancy.ravel())
+        codes = codes.reshape(n, doors)
+        order = np.argsort(random_floats((n, doors), rng=self.rng), axis=1)
+        codes = np.take_along_axis(codes, order, axis=1)
+        self.occupancy = None
+        self._dense = {name: ((codes & flag) != 0).astype(self.dtype)
+                       for name, flag in FLAGS.items()}
+        self._set_allocated(**self._dense)
+
+    # ---- Indexing
+
+    def select(self, x=None, y=None, copy=True, use_ix_=True):
+        '''Index the simulation to create a new one.  Selecting only trials
+        (`y=None`) keeps the counts, other selections fall back to
+        `cargoat.sim.MontyHallSim.select()`.'''
+        if y is not None or self.occupancy is None:
+            return super().select(x=x, y=y, copy=copy, use_ix_=use_ix_)
+
+        x = self._indexers(x=x)[0]
+        copyfun = (lambda x: x.copy()) if copy else (lambda x: x)
+        return self._from_occupancy(copyfun(self.occupancy[x]),
+                                    copyfun(self.spoiled[x]))
+
+    # ---- Status of the sim
+
+    def count_totals(self, target):
+        '''Return a count of the number of positives for each trial in the
+        simulation.  Target is `cars`, `picked`, or `revealed`. '''
+        if self.occupancy is None:
+            return super().count_totals(target)
+        return self.occupancy[:, _has(FLAGS[target])].sum(axis=1)
+
+    # ---- Selection
+
+    def _apply_generic_action(self, action):
+        if (self.occupancy is None or action.weighted or
+                not isinstance(action.doors, (int, np.integer))):
+            return False
+
+        etype = {'cars': BadCar,
+                 'revealed': BadReveal,
+                 'picked': BadPick}[action.target]
+        excluded = np.zeros(len(CATEGORIES), dtype=bool)
+        for name, positive, negative in [
+                ('cars', action.exclude_cars, action.exclude_carless),
+                ('picked', action.exclude_picked, action.exclude_unpicked),
+                ('revealed', action.exclude_revealed, action.exclude_closed)]:
+            if positive:
+                excluded |= _has(FLAGS[name])
+            if negative:
+                excluded |= ~_has(FLAGS[name])
+
+        # only draw from categories holding doors in some trial
+        counts = self.occupancy.T
+        active = ~excluded & counts.any(axis=1)
+        k = int(action.doors)
+        allowed = counts[active]
+        check_n_per_row(np.minimum(allowed.sum(axis=0), k)[:, np.newaxis],
+                        n=k, etype=etype)
+        chosen = np.zeros(counts.shape, dtype=np.int64)
+        chosen[active] = _hypergeometric(allowed, k, rng=self.rng)
+
+        self._set_counts(target=action.target,
+                         chosen=chosen,
+                         behavior=action.behavior,
+                         allow_spoiled=action.allow_spoiled,
+                         allow_redundant=action.allow_redundant)
+        return True
+
+    def _set_counts(self, target, chosen, behavior='overwrite',
+                    allow_spoiled=False, allow_redundant=True):
+        '''Count-based version of `cargoat.sim.MontyHallSim._set_array()`,
+        where `chosen` is the (categories, trials) number of selected doors
+        of each category.'''
+        etype = {'cars': BadCar,
+                 'revealed': BadReveal,
+                 'picked': BadPick}[target]
+        flag = FLAGS[target]
+        has = _has(flag)
+
+        if not allow_redundant:
+            already = has if behavior in ['overwrite', 'add'] else ~has
+            redundant = chosen[already].sum(axis=0) > 0
+            if np.any(redundant):
+                bad_trials_raise(redundant, "Redundant action for some trials.",
+                                 etype)
+
+        # then check for valid action
+        offlimits = {'picked': FLAGS['revealed'],
+                     'revealed': FLAGS['cars'] | FLAGS['picked'],
+                     'cars': 0}[target]
+        if behavior in ['overwrite', 'add'] and offlimits:
+            spoiling_rows = chosen[_has(offlimits)].sum(axis=0) > 0
+            if not allow_spoiled and np.any(spoiling_rows):
+                msg = {'picked': "Revealed doors were picked.",
+                       'revealed': "Cars or picked doors were revealed."}[target]
+                bad_trials_raise(spoiling_rows, msg, etype)
+            self.spoiled[spoiling_rows] = 1
+
+        # move the chosen & other doors of each category to their new one
+        chosen_to = CATEGORIES & ~flag if behavior == 'remove' else CATEGORIES | flag
+        other_to = CATEGORIES & ~flag if behavior == 'overwrite' else CATEGORIES
+        counts = self.occupancy.T
+        new = np.zeros(counts.shape, dtype=counts.dtype)
+        for c in CATEGORIES[counts.any(axis=1)]:
+            new[chosen_to[c]] += chosen[c].astype(counts.dtype)
+            new[other_to[c]] += counts[c] - chosen[c].astype(counts.dtype)
+        self.occupancy = new.T
+
+    # ---- Remodeling
+
+    def rearrange_doors(self, positions):
+        # doors are exchangeable, so a permutation leaves the counts as is
+        if self.occupancy is None:
+            super().rearrange_doors(positions)
+
+    # ---- Other Helpers
+
+    def _assign_from(self, sim):
+        self.occupancy = None
+        self._dense = {}
+        if isinstance(sim, OccupancyMontyHallSim) and sim.occupancy is not None:
+            self.occupancy = sim.occupancy
+            self._doors = sim._doors
+            self.spoiled = sim.spoiled
+            return
+        super()._assign_from(sim)
+
+    def copy(self):
+        '''
+        Create a copy of the current simulation.
+
+        Returns
+        -------
+        OccupancyMontyHallSim
+
+        '''
+        if self.occupancy is None:
+            return super().copy()
+        return self._from_occupancy(self.occupancy.copy(), self.spoiled.copy())
+
+    # ---- Results
+
+    def is_win(self):
+        '''
+        Return a boolean array indicating which trials are wins.  I.e.,
+        at least one door with a car is picked.  Spoiled games have not
+        bearing on this method
+        '''
+        if self.occupancy is None:
+            return super().is_win()
+        both = _has(FLAGS['cars']) & _has(FLAGS['picked'])
+        return self.occupancy[:, both].sum(axis=1) > 0
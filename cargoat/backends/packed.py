@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bit-packed storage for simulations with very many trials.
+"""
+
+import numpy as np
+
+from cargoat.arrayops import popcount
+from cargoat.backends.base import EncodedMontyHallSim
+
+class PackedMontyHallSim(EncodedMontyHallSim):
+    '''Simulation storing door arrays as bits.'''
+
+    def __init__(self, n, dtype=bool):
+        '''
+        A `cargoat.sim.MontyHallSim` which stores the `cars`, `picked`,
+        and `revealed` arrays as bitsets along the door axis (see
+        `np.packbits`), i.e. one bit per door rather than 8 bytes per door
+        for the default integer simulation.  This is intended for very
+        large numbers of trials.
+
+        The arrays are available as usual through the `cars`, `picked`, and
+        `revealed` attributes, but these are unpacked on every access.
+        **Changes made in place to these arrays are lost** - re-assign
+        the attribute instead.  The status methods (`query_doors_or()`,
+        `is_win()`, `count_totals()`) and the spoiling checks work directly
+        on the packed bytes with bitwise AND/OR and popcounts.
+
+        Parameters
+        ----------
+        n : int
+            Number of trials to simulate.
+        dtype : data-type, optional
+            Data type of the arrays produced when unpacking. The default
+            is `bool`.
+
+        Returns
+        -------
+        None.
+
+        '''
+        super().__init__(n, dtype=dtype)
+
+    # ---- Encoding
+
+    def _encode(self, a):
+        a = np.asarray(a)
+        if a.ndim == 2:
+            return np.packbits(a.astype(bool, copy=False), axis=1), a.shape[1]
+        elif a.size == 0:
+            return np.empty(0, dtype=np.uint8), None
+        raise ValueError('Door arrays must be 2D (trials, doors).')
+
+    def _decode(self, data, doors, dtype=None):
+        dtype = self.dtype if dtype is None else dtype
+        if doors is None:
+            return np.empty(0, dtype=dtype)
+        bits = np.unpackbits(data, axis=1, count=doors)
+        return bits.astype(dtype, copy=False)
+
+    # ---- Status of the sim
+
+    def _query_words(self, cars=False, picked=False, revealed=False,
+                     not_cars=False, not_picked=False, not_revealed=False):
+        '''Packed version of `query_doors_or()`.  Padding bits at the end
+        of each row are not meaningful.'''
+        out = np.zeros_like(self._data['picked'])
+        queries = [('cars', cars, not_cars),
+                   ('picked', picked, not_picked),
+                   ('revealed', revealed, not_revealed)]
+        for name, positive, negative in queries:
+            if positive:
+                out |= self._data[name]
+            if negative:
+                out |= ~self._data[name]
+        return out
+
+    def query_doors_or(self, cars=False, picked=False, revealed=False,
+                       not_cars=False, not_picked=False, not_revealed=False,
+                       out=None):
+        '''See `cargoat.sim.MontyHallSim.query_doors_or()`.  The query is
+        computed on the packed bytes, and only the output is unpacked.'''
+        words = self._query_words(cars=cars, picked=picked, revealed=revealed,
+                                  not_cars=not_cars, not_picked=not_picked,
+                                  not_revealed=not_revealed)
+        result = self._decode(words, self.shape[1], dtype=bool)
+        if out is None:
+            return result
+        np.copyto(out, result)
+        return out
+
+    def _overlap(self, new_array, **query):
+        words = self._query_words(**query) & self._encode(new_array)[0]
+        return self._decode(words, self.shape[1], dtype=bool)
+
+    def count_totals(self, target):
+        '''Return a count of the number of positives for each trial in the
+        simulation.  Target is `cars`, `picked`, or `revealed`. '''
+        return popcount(self._data[target]).sum(axis=1, dtype=int)
+
+    # ---- Generic setter functions
+
+    def _update_array(self, target, new_array, behavior='overwrite'):
+        words, doors = self._encode(new_array)
+        old = self._data[target]
+        if behavior == 'add':
+            words |= old
+        elif behavior == 'remove':
+            words = old & ~words
+        self._data[target] = words
+        self._doors[target] = doors
+
+    # ---- Results
+
+    def is_win(self):
+        '''
+        Return a boolean array indicating which trials are wins.  I.e.,
+        at least one door with a car is picked.  Spoiled games have not
+        bearing on this method
+        '''
+        return np.any(self._data['picked'] & self._data['cars'], axis=1)
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sparse (door index) storage for games with very many doors.
+"""
+
+from collections.abc import Iterable
+
+import numpy as np
+
+from cargoat.arrayops import random_floats
+from cargoat.backends.base import EncodedMontyHallSim
+from cargoat.errors import (
+    BadCar,
+    BadPick,
+    BadReveal,
+    bad_trials_raise,
+    check_n_per_row
+    )
+
+# Largest number of doors which are sampled per trial with the index-based
+# routines; larger selections use the dense implementation
+MAX_SPARSE_SELECTION = 16
+
+def _index_dtype(doors):
+    '''Smallest signed integer type able to hold door indices and -1.'''
+    return np.min_scalar_type(-max(int(doors), 1))
+
+def _count(idx):
+    '''Number of set doors per row of an index array.'''
+    return (idx >= 0).sum(axis=1)
+
+def _isin_rows(a, b):
+    '''Boolean array of `a.shape` marking entries of `a` which are found
+    in the same row of `b`.  Padding (-1) is never found.'''
+    found = (a[:, :, np.newaxis] == b[:, np.newaxis, :]).any(axis=2)
+    return found & (a >= 0)
+
+def _compact(idx):
+    '''Move padding to the end of each row and trim unused columns.'''
+    idx = -np.sort(-idx, axis=1)
+    width = _count(idx).max() if idx.size else 0
+    return idx[:, :width]
+
+def _union(a, b):
+    b = np.where(_isin_rows(b, a), -1, b)
+    return _compact(np.concatenate([a, b], axis=1))
+
+def _difference(a, b):
+    return _compact(np.where(_isin_rows(a, b), -1, a))
+
+def _sorted_unique(idx, doors):
+    '''Sort each row ascending, replacing padding and duplicates with
+    `doors` (i.e. past the last door).'''
+    idx = np.sort(np.where(idx < 0, doors, idx), axis=1)
+    if idx.shape[1] > 1:
+        dup = np.zeros(idx.shape, dtype=bool)
+        dup[:, 1:] = idx[:, 1:] == idx[:, :-1]
+        idx[dup] = doors
+    return idx
+
+def _first_bad(new, bad):
+    '''Trial & door of the first True in `bad`, in the order that dense
+    arrays would report it.'''
+    trial = np.argmax(bad.any(axis=1))
+    door = new[trial][bad[trial]].min()
+    return trial, door
+
+class SparseMontyHallSim(EncodedMontyHallSim):
+    '''Simulation storing door arrays as per-trial door indices.'''
+
+    _fill_value = -1
+
+    def __init__(self, n, dtype=bool):
+        '''
+        A `cargoat.sim.MontyHallSim` which stores the `cars`, `picked`,
+        and `revealed` arrays as door indices.  Each array is a
+        (trials, k) integer array listing the doors that are set in each
+        trial, padded with -1, where k is the most doors set in any trial.
+        This is intended for games with many doors but few cars, picks,
+        and reveals - e.g. 10,000 doors with one car and one pick
+        need a few bytes per trial rather than 30,000.
+
+        The arrays are available as usual through the `cars`, `picked`, and
+        `revealed` attributes, but these are expanded to dense arrays on
+        every access.  **Changes made in place to these arrays are lost** -
+        re-assign the attribute instead.
+
+        Initializing doors, picking/revealing/placing cars
+        (`cargoat.actions.generic.GenericAction` with a number of doors up
+        to `MAX_SPARSE_SELECTION`, or a list of doors), adding, removing,
+        and rearranging doors, and getting results all work on the indices.
+        Other actions (e.g. weighted picks) expand to dense arrays, which
+        is correct but slow for many doors.  Note that the random draws
+        differ from `cargoat.sim.MontyHallSim`, so a seeded game does not
+        reproduce the trials of the dense simulation.
+
+        Parameters
+        ----------
+        n : int
+            Number of trials to simulate.
+        dtype : data-type, optional
+            Data type of the arrays produced when expanding. The default
+            is `bool`.
+
+        Returns
+        -------
+        None.
+
+        '''
+        super().__init__(n, dtype=dtype)
+
+    # ---- Encoding
+
+    def _encode(self, a):
+        a = np.asarray(a)
+        if a.ndim != 2:
+            if a.size == 0:
+                return np.empty(0, dtype=np.int8), None
+            raise ValueError('Door arrays must be 2D (trials, doors).')
+        n, doors = a.shape
+        rows, cols = np.nonzero(a)
+        counts = np.bincount(rows, minlength=n)
+        width = counts.max() if n else 0
+        starts = np.cumsum(counts) - counts
+        idx = np.full((n, width), -1, dtype=_index_dtype(doors))
+        idx[rows, np.arange(len(rows)) - starts[rows]] = cols
+        return idx, doors
+
+    def _decode(self, data, doors):
+        if doors is None:
+            return np.empty(0, dtype=self.dtype)
+        out = np.zeros((data.shape[0], doors), dtype=self.dtype)
+        rows, cols = np.nonzero(data >= 0)
+        out[rows, data[rows, cols]] = 1
+        return out
+
+    def _blank(self, doors):
+        if doors < 0:
+            raise ValueError('Number of doors must be non-negative.')
+        return np.full((self.n, 0), -1, dtype=_index_dtype(doors))
+
+    def _store(self, target, idx, doors=None):
+        doors = self.shape[1] if doors is None else doors
+        self._data[target] = _compact(idx).astype(_index_dtype(doors))
+        self._doors[target] = doors
+
+    # ---- Status of the sim
+
+    def count_totals(self, target):
+        '''Return a count of the number of positives for each trial in the
+        simulation.  Target is `cars`, `picked`, or `revealed`. '''
+        return _count(self._data[target])
+
+    # ---- Selection
+
+    def _apply_generic_action(self, action):
+        if action.weighted or self.empty:
+            return False
+
+        doors = self.shape[1]
+        if isinstance(action.doors, (int, np.integer)):
+            if action.doors > MAX_SPARSE_SELECTION:
+                return False
+            new = self._sample(action, int(action.doors))
+            n = action.doors
+        elif isinstance(action.doors, Iterable):
+            chosen = np.asarray(action.doors, dtype=int)
+            if np.any((chosen < -doors) | (chosen >= doors)):
+                return False
+            chosen = np.unique(chosen % doors)
+            new = np.tile(chosen, (self.n, 1))
+            n = len(action.doors)
+        else:
+            return False
+
+        self._set_indices(target=action.target,
+                          new=new,
+                          behavior=action.behavior,
+                          n_per_row=n,
+                          allow_spoiled=action.allow_spoiled,
+                          allow_redundant=action.allow_redundant)
+        return True
+
+    def _sample(self, action, k):
+        '''Choose `k` doors uniformly for each trial, out of those allowed
+        by the `exclude_...` settings of a GenericAction.'''
+        doors = self.shape[1]
+        etype = {'cars': BadCar,
+                 'revealed': BadReveal,
+                 'picked': BadPick}[action.target]
+        excluded = [name for name, flag in [('picked', action.exclude_picked),
+                                            ('revealed', action.exclude_revealed),
+                                            ('cars', action.exclude_cars)]
+                    if flag]
+        required = [name for name, flag in [('picked', action.exclude_unpicked),
+                                            ('revealed', action.exclude_closed),
+                                            ('cars', action.exclude_carless)]
+                    if flag]
+
+        # only doors set in the `required` arrays are allowed:
+        # sample from the indices of those
+        if required:
+            candidates = self._data[required[0]].astype(int)
+            valid = candidates >= 0
+            for name in required[1:]:
+                valid &= _isin_rows(candidates, self._data[name])
+            for name in excluded:
+                valid &= ~_isin_rows(candidates, self._data[name])
+            check_n_per_row(np.minimum(valid.sum(axis=1), k)[:, np.newaxis],
+                            n=k, etype=etype)
+            keys = np.where(valid, random_floats(valid.shape, rng=self.rng), -1)
+            order = np.argsort(-keys, axis=1)[:, :k]
+            return np.take_along_axis(candidates, order, axis=1)
+
+        # otherwise, all but the `excluded` doors are allowed:
+        # draw k distinct ranks among the allowed doors (Floyd's algorithm)
+        # then map the ranks to doors by skipping the excluded ones
+        if excluded:
+            skip = np.concatenate([self._data[name] for name in excluded], axis=1)
+            skip = _sorted_unique(skip.astype(int), doors)
+        else:
+            skip = np.empty((self.n, 0), dtype=int)
+        allowed = doors - (skip < doors).sum(axis=1)
+        check_n_per_row(np.minimum(allowed, k)[:, np.newaxis], n=k, etype=etype)
+
+        chosen = np.empty((self.n, k), dtype=int)
+        for i in range(k):
+            j = allowed - k + i
+            t = (random_floats((self.n,), rng=self.rng) * (j + 1)).astype(int)
+            repeat = (chosen[:, :i] == t[:, np.newaxis]).any(axis=1)
+            chosen[:, i] = np.where(repeat, j, t)
+
+        for col in skip.T:
+            chosen += col[:, np.newaxis] <= chosen
+        return chosen
+
+    def _set_indices(self, target, new, behavior='overwrite', n_per_row=None,
+                     allow_spoiled=False, allow_redundant=True):
+        '''Index-based version of `cargoat.sim.MontyHallSim._set_array()`,
+        where `new` is an index array of the doors to set.'''
+        etype = {'cars': BadCar,
+                 'revealed': BadReveal,
+                 'picked': BadPick}[target]
+        old = self._data[target]
+
+        if n_per_row is not None:
+            check_n_per_row(_count(new)[:, np.newaxis], n=n_per_row, etype=etype)
+
+        if not allow_redundant:
+            if behavior in ['overwrite', 'add']:
+                redundant = _isin_rows(new, old)
+            else:
+                redundant = (new >= 0) & ~_isin_rows(new, old)
+            if np.any(redundant):
+                bad_trials_raise(redundant.any(axis=1),
+                                 "Redundant action for some trials.", etype)
+
+        # then check for valid action
+        offlimits = {'picked': ['revealed'],
+                     'revealed': ['cars', 'picked'],
+                     'cars': []}[target]
+        if behavior in ['overwrite', 'add'] and offlimits:
+            bad = np.zeros(new.shape, dtype=bool)
+            for name in offlimits:
+                bad |= _isin_rows(new, self._data[name])
+            spoiling_rows = bad.any(axis=1)
+            if not allow_spoiled and np.any(spoiling_rows):
+                trial, door = _first_bad(new, bad)
+                msg = {'picked': "Revealed doors were picked",
+                       'revealed': "Cars or picked doors were revealed"}[target]
+                bad_trials_raise(spoiling_rows,
+                                 f"{msg}, e.g. trial {trial} door {door}.",
+                                 etype)
+            self.spoiled[spoiling_rows] = 1
+
+        if behavior == 'add':
+            new = _union(old.astype(int), new)
+        elif behavior == 'remove':
+            new = _difference(old.astype(int), new)
+
+        self._store(target, new)
+
+    # ---- Remodeling
+
+    def _normalize_positions(self, positions, inserting=False):
+        '''Convert `positions` to non-negative door indices, or return None
+        if they are not integers (e.g. boolean masks or slices).'''
+        doors = self.shape[1]
+        positions = np.atleast_1d(positions)
+        if positions.ndim != 1 or not np.issubdtype(positions.dtype, np.integer):
+            return None
+        upper = doors if inserting else doors - 1
+        if np.any((positions < -doors) | (positions > upper)):
+            raise IndexError(f'Door positions out of bounds for {doors} doors.')
+        return np.where(positions < 0, positions + doors, positions)
+
+    def insert_doors(self, positions):
+        doors = self.shape[1]
+        pos = self._normalize_positions(positions, inserting=True)
+        if pos is None:
+            return super().insert_doors(positions)
+        pos = np.sort(pos)
+        for name in ('cars', 'picked', 'revealed'):
+            idx = self._data[name].astype(int)
+            shifted = idx + np.searchsorted(pos, idx, side='right')
+            self._store(name, np.where(idx >= 0, shifted, -1), doors + len(pos))
+
+    def delete_doors(self, positions):
+        doors = self.shape[1]
+        pos = self._normalize_positions(positions)
+        if pos is None:
+            return super().delete_doors(positions)
+        pos = np.unique(pos)
+        for name in ('cars', 'picked', 'revealed'):
+            idx = self._data[name].astype(int)
+            shifted = idx - np.searchsorted(pos, idx, side='left')
+            keep = (idx >= 0) & ~np.isin(idx, pos)
+            self._store(name, np.where(keep, shifted, -1), doors - len(pos))
+
+    def rearrange_doors(self, positions):
+        inverse = np.argsort(positions)
+        for name in ('cars', 'picked', 'revealed'):
+            idx = self._data[name].astype(int)
+            self._store(name, np.where(idx >= 0, inverse[idx], -1))
+
+    # ---- Results
+
+    def is_win(self):
+        '''
+        Return a boolean array indicating which trials are wins.  I.e.,
+        at least one door with a car is picked.  Spoiled games have not
+        bearing on this method
+        '''
+        return _isin_rows(self._data['picked'], self._data['cars']).any(axis=1)
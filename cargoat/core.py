@@ -4,12 +4,101 @@
 Core functions for doing things in cargoat.
 """
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 import numpy as np
 
 from cargoat.errors import MontyHallError
-from cargoat.sim import MontyHallSim
+from cargoat.sim import MontyHallSim, combine_results, combine_sims
+from cargoat.stats import INTERVALS
+
+def _run_game(game, sim, start=0, finish=True):
+    '''Apply each action of `game` to `sim`, reporting the failing step
+    (counting from `start`).  When `finish` is True, the game is over, and
+    the arrays reused by the actions (`sim.workspace`) are released.'''
+    for i, action in enumerate(game, start=start):
+        try:
+            action(sim)
+        except Exception as error:
+            msg = f'Error for step {i}: {repr(action)}'
+            raise MontyHallError(msg) from error
+
+    if finish:
+        sim.workspace.clear()
+    return sim
+
+def _get_rng(seed=None, rng=None):
+    '''Return the `np.random.Generator` used by `play()`, or None when the
+    global `np.random` state is used (seeding it with `seed`).'''
+    if rng is None:
+        if seed is not None:
+            np.random.seed(seed)
+        return None
+
+    if seed is not None:
+        raise ValueError('Only one of `seed` and `rng` can be provided.')
+    return np.random.default_rng(rng)
+
+def _new_sim(n, dtype, sim_class, rng=None):
+    '''Create an empty simulation for `play()`.'''
+    sim = sim_class(n=n) if dtype is None else sim_class(n=n, dtype=dtype)
+    sim.rng = rng
+    return sim
+
+def _chunk_sizes(n, chunk_size):
+    '''Generate the number of trials of each chunk.  Without trials, there
+    is a single empty chunk (as for `play()` without chunks).'''
+    n = int(n)
+    chunk_size = int(chunk_size)
+    if chunk_size < 1:
+        raise ValueError('`chunk_size` must be a positive integer.')
+    if n == 0:
+        yield 0
+    for start in range(0, n, chunk_size):
+        yield min(chunk_size, n - start)
+
+def _play_worker(game, n, stream, dtype, sim_class, chunk_size):
+    '''Run the trials of one worker of `play()`, drawing from a
+    `np.random.Generator` seeded with a child `np.random.SeedSequence`.'''
+    rng = np.random.default_rng(stream)
+    if chunk_size is None:
+        return _run_game(game, _new_sim(n, dtype, sim_class, rng))
+
+    sims = (_run_game(game, _new_sim(size, dtype, sim_class, rng))
+            for size in _chunk_sizes(n, chunk_size))
+    return combine_results([sim.get_results() for sim in sims])
+
+EXECUTORS = {'processes': ProcessPoolExecutor,
+             'threads': ThreadPoolExecutor}
+
+def _play_parallel(game, n, seed, dtype, sim_class, chunk_size, workers,
+                   parallel):
+    '''Split the trials of `play()` across a pool of workers.'''
+    if parallel not in EXECUTORS:
+        raise ValueError('`parallel` must be "processes" or "threads", '
+                         f'not {parallel}.')
+
+    base, extra = divmod(int(n), workers)
+    sizes = [base + (i < extra) for i in range(workers)]
+    sizes = [size for size in sizes if size > 0]
+    if not sizes:
+        # no trials: run the empty game in this process
+        return _play_worker(game, 0, np.random.SeedSequence(seed), dtype,
+                            sim_class, chunk_size)
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
 
-def play(game, n=100, seed=None):
+    with EXECUTORS[parallel](max_workers=len(sizes)) as executor:
+        futures = [executor.submit(_play_worker, game, size, stream,
+                                   dtype, sim_class, chunk_size)
+                   for size, stream in zip(sizes, streams)]
+        outputs = [future.result() for future in futures]
+
+    if chunk_size is not None:
+        return combine_results(outputs)
+    return combine_sims(outputs)
+
+def play(game, n=100, seed=None, dtype=None, sim_class=MontyHallSim,
+         chunk_size=None, workers=None, parallel='processes', rng=None):
     '''
     Run a MontyHall simulation.
 
@@ -20,28 +109,230 @@ def play(game, n=100, seed=None):
     n : int, optional
         Number of games to simulate. The default is 100.
     seed: number, optional
-        Set the seed for the RNG.  See numpy docs for more information.
+        Set the seed for the global `np.random` state (when `rng` is not
+        provided).  See numpy docs for more information.
+    dtype : data-type, optional
+        Storage dtype for the simulation arrays.  The default is None,
+        which uses the default of `sim_class` (`int` for `MontyHallSim`);
+        `bool` or `np.uint8` use 8x less memory.  See
+        `cargoat.sim.MontyHallSim`.
+    sim_class : type, optional
+        Class of the simulation object to create.  The default is
+        `cargoat.sim.MontyHallSim`; see `cargoat.backends` for alternative
+        storage layouts.
+    chunk_size : int, optional
+        Simulate at most this many trials at once.  The default is None,
+        in which case all trials are simulated together.  When set, only
+        the results of each chunk are kept, and the combined results
+        are returned (rather than a simulation), so memory use is bounded by
+        the chunk size regardless of `n`.  See `iter_play()` to
+        access the simulation of each chunk.
+    workers : int, optional
+        Number of workers to split the trials between.  The default is
+        None, in which case the game runs in the current thread.  Each
+        worker draws from an independent `np.random.Generator`, spawned
+        from `seed` (see `np.random.SeedSequence.spawn`), so the output is
+        reproducible for the same `seed` and `workers` (but differs from
+        running without workers).  The simulations of the workers are merged
+        with `cargoat.sim.combine_sims()`, or only their results when
+        `chunk_size` is set.
+    parallel : 'processes' or 'threads', optional
+        Run the workers in a pool of processes or of threads. The default
+        is 'processes'.  Threads avoid the cost of starting processes and
+        transferring simulations between them, and run concurrently as most
+        of the work is done by numpy (which releases the GIL); processes
+        are better for games with many small steps.  For processes, the
+        game must be picklable, e.g. the conditions of
+        `cargoat.actions.logical.IfElse` must be module-level functions
+        rather than lambdas.
+    rng : np.random.Generator or int, optional
+        Random number generator used by all the actions of the game,
+        or a seed for creating one (see `np.random.default_rng`).
+        The default is None, in which case the global `np.random` state is
+        used.  Generators are faster than the global state, can use other
+        bit generators (e.g. `np.random.Philox`), and keep concurrent calls
+        of `play()` independent.  When used with `workers`, the streams of
+        the workers are seeded from `rng`.
 
     Raises
     ------
+    ValueError
+        Both `seed` and `rng` were provided.
     MontyHallError
         Problem with completing the game.
 
     Returns
     -------
+    sim : MontyHallSim or dict
+        Simulation object, recording the trials and results.  When
+        `chunk_size` is set, the combined results of all trials instead
+        (see `cargoat.sim.MontyHallSim.get_results()`).
+
+    '''
+    if workers is not None and workers > 1:
+        if rng is not None:
+            seed = _get_rng(seed=seed, rng=rng).integers(2**63)
+        return _play_parallel(game, n=n, seed=seed, dtype=dtype,
+                              sim_class=sim_class, chunk_size=chunk_size,
+                              workers=int(workers), parallel=parallel)
+
+    if chunk_size is not None:
+        chunks = iter_play(game, n=n, chunk_size=chunk_size, seed=seed,
+                           dtype=dtype, sim_class=sim_class, rng=rng)
+        return combine_results([sim.get_results() for sim in chunks])
+
+    rng = _get_rng(seed=seed, rng=rng)
+    return _run_game(game, _new_sim(n, dtype, sim_class, rng))
+
+def iter_play(game, n=100, chunk_size=10**6, seed=None, dtype=None,
+              sim_class=MontyHallSim, rng=None):
+    '''
+    Run a MontyHall simulation in chunks of trials, generating the
+    simulation of each chunk in turn.  Only one chunk is held in memory
+    at a time (unless the simulations are kept by the caller).
+
+    Parameters
+    ----------
+    game : list-like
+        A list of objects from the `cargoat.actions` subpackage.
+    n : int, optional
+        Total number of games to simulate. The default is 100.
+    chunk_size : int, optional
+        Number of games per chunk; the last chunk may be smaller.
+        The default is 10**6.  When `n` is 0, a single empty chunk is
+        generated.
+    seed: number, optional
+        Set the seed for the global `np.random` state.  See `play()`.
+    dtype : data-type, optional
+        Storage dtype for the simulation arrays.  See `play()`.
+    sim_class : type, optional
+        Class of the simulation objects to create.  See `play()`.
+    rng : np.random.Generator or int, optional
+        Random number generator shared by all chunks.  See `play()`.
+
+    Raises
+    ------
+    ValueError
+        `chunk_size` is not positive, or both `seed` and `rng` were
+        provided.
+    MontyHallError
+        Problem with completing the game.
+
+    Yields
+    ------
     sim : MontyHallSim
-        Simulation object, recording the trials and results.
+        Simulation object of each chunk.
+
+    Examples
+    --------
+
+    ```python
+    >>> import cargoat as cg
+    >>> game = [cg.InitDoorsRandom(), cg.Pick(), cg.Reveal(), cg.Switch()]
+    >>> results = [sim.get_results() for sim in
+    ...            cg.iter_play(game, n=10**8, chunk_size=10**6)]
+    >>> cg.combine_results(results)['trials']
+    100000000
+
+    ```
 
     '''
-    if seed:
-        np.random.seed(seed)
+    sizes = _chunk_sizes(n, chunk_size)
+    rng = _get_rng(seed=seed, rng=rng)
 
-    sim = MontyHallSim(n=n)
-    for i, action in enumerate(game):
-        try:
-            action(sim)
-        except Exception as error:
-            msg = f'Error for step {i}: {repr(action)}'
-            raise MontyHallError(msg) from error
+    for size in sizes:
+        yield _run_game(game, _new_sim(size, dtype, sim_class, rng))
 
-    return sim
+def play_until(game, ci_width=0.01, confidence=0.95, max_n=10**7,
+               chunk_size=10**5, method='wilson', seed=None, dtype=None,
+               sim_class=MontyHallSim, rng=None):
+    '''
+    Run a MontyHall simulation until the proportion of wins is known to a
+    given precision.
+
+    Trials are run in chunks (see `iter_play()`), keeping a running count of
+    wins.  After each chunk a confidence interval for the proportion of wins
+    is computed, and the simulation stops once the interval is no wider than
+    `ci_width`, or after `max_n` trials.
+
+    Parameters
+    ----------
+    game : list-like
+        A list of objects from the `cargoat.actions` subpackage.
+    ci_width : float, optional
+        Target width of the confidence interval, as a proportion (e.g.
+        0.01 for +/- 0.5 percentage points). The default is 0.01.
+    confidence : float, optional
+        Confidence level of the interval. The default is 0.95.
+    max_n : int, optional
+        Maximum number of trials to simulate. The default is 10**7.
+    chunk_size : int, optional
+        Number of trials per chunk; the precision is checked after each
+        chunk. The default is 10**5.
+    method : 'wilson' or 'clopper-pearson', optional
+        Type of confidence interval, see `cargoat.stats`. The default
+        is 'wilson'.
+    seed: number, optional
+        Set the seed for the global `np.random` state.  See `play()`.
+    dtype : data-type, optional
+        Storage dtype for the simulation arrays.  See `play()`.
+    sim_class : type, optional
+        Class of the simulation objects to create.  See `play()`.
+    rng : np.random.Generator or int, optional
+        Random number generator shared by all chunks.  See `play()`.
+
+    Raises
+    ------
+    ValueError
+        Unknown `method`, invalid `confidence`, `max_n` or `chunk_size`,
+        or both `seed` and `rng` were provided.
+    MontyHallError
+        Problem with completing the game.
+
+    Returns
+    -------
+    results : dict
+        Results of all the trials (see `MontyHallSim.get_results()`), with
+        additional entries: `interval`, the (low, high) bounds of the
+        confidence interval for the proportion of wins; `confidence`; and
+        `converged`, whether the target width was reached.
+
+    Examples
+    --------
+
+    ```python
+    >>> import cargoat as cg
+    >>> game = [cg.InitDoorsRandom(), cg.Pick(), cg.Reveal(), cg.Switch()]
+    >>> results = cg.play_until(game, ci_width=0.01, chunk_size=1000)
+    >>> results['converged']
+    True
+    >>> low, high = results['interval']
+    >>> high - low <= 0.01
+    True
+
+    ```
+
+    '''
+    if method not in INTERVALS:
+        raise ValueError(f'`method` must be one of {list(INTERVALS)}, not {method}.')
+    if not 0 < confidence < 1:
+        raise ValueError('`confidence` must be between 0 and 1.')
+    if max_n < 1:
+        raise ValueError('`max_n` must be a positive integer.')
+    interval = INTERVALS[method]
+
+    results = []
+    for sim in iter_play(game, n=max_n, chunk_size=chunk_size, seed=seed,
+                         dtype=dtype, sim_class=sim_class, rng=rng):
+        results.append(sim.get_results())
+        wins = sum(r['wins'] for r in results)
+        trials = sum(r['trials'] for r in results)
+        low, high = interval(wins, trials, confidence)
+        if high - low <= ci_width:
+            break
+
+    out = combine_results(results)
+    out['interval'] = (low, high)
+    out['confidence'] = confidence
+    out['converged'] = bool(high - low <= ci_width)
+    return out
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Count-compressed simulation of Monty Hall games, storing each distinct state
+of a trial once along with the number of trials in it.
+"""
+
+import numpy as np
+
+from cargoat.core import _get_rng
+from cargoat.errors import MontyHallError, UnsupportedActionError
+from cargoat.exact import _apply
+from cargoat.sim import MontyHallSim, _make_results
+
+class _Counts:
+    '''Weights of the states are numbers of trials, which are split between
+    outcomes by sampling (see `cargoat.exact._Probabilities`).'''
+
+    def __init__(self, rng=None):
+        self.rng = rng
+
+    @property
+    def random(self):
+        '''Source of random draws (the global state if `rng` is None).'''
+        return np.random if self.rng is None else self.rng
+
+    def split(self, counts, rows, probs):
+        out = np.zeros(len(rows), dtype=counts.dtype)
+        # outcomes of the same state are consecutive
+        starts = np.flatnonzero(np.diff(rows, prepend=-1))
+        stops = np.append(starts[1:], len(rows))
+        for start, stop in zip(starts, stops):
+            pvals = probs[start:stop] / probs[start:stop].sum()
+            out[start:stop] = self.random.multinomial(counts[rows[start]], pvals)
+        return out
+
+    def chance(self, counts, prob):
+        yes = self.random.binomial(counts, prob).astype(counts.dtype)
+        return yes, counts - yes
+
+    def results(self, sim, counts, condition=None):
+        return _results(sim, counts, condition=condition)
+
+def _results(sim, counts, condition=None):
+    '''Results dictionary of the states `sim` holding `counts` trials,
+    see `play_counts()`.'''
+    if condition is not None:
+        condition = np.asarray(condition).astype(bool)
+        sim, counts = sim.select(x=condition), counts[condition]
+
+    trials = counts.sum()
+    spoiled = sim.spoiled.astype(bool) if sim.n else np.zeros(0, dtype=bool)
+    wins = counts[sim.is_win()].sum() if not sim.empty else 0
+
+    results = _make_results(trials=int(trials),
+                            wins=wins,
+                            spoiled_games=np.any(spoiled))
+    results['percent_spoiled'] = (counts[spoiled].sum() / trials * 100
+                                  if trials else np.nan)
+    return results
+
+def _play_states(game, n, rng=None):
+    '''Run `game` on `n` trials, returning the distinct states and the
+    number of trials in each.'''
+    weights = _Counts(rng)
+    sim = MontyHallSim(1, dtype=bool)
+    counts = np.array([n], dtype=np.int64)
+    for i, action in enumerate(game):
+        try:
+            sim, counts = _apply(action, sim, counts, weights)
+        except UnsupportedActionError:
+            raise
+        except Exception as error:
+            msg = f'Error for step {i}: {repr(action)}'
+            raise MontyHallError(msg) from error
+
+    return sim, counts
+
+def play_counts(game, n=100, seed=None, rng=None):
+    '''
+    Simulate a Monty Hall game, storing each distinct state of a trial once
+    with a count of its trials.
+
+    Each state (the cars, picked, and revealed doors, and whether it is
+    spoiled) holds a number of trials.  Random actions split the trials of
+    each state between its possible outcomes with a single multinomial
+    draw (or a binomial draw for `cargoat.actions.logical.ChanceTo`),
+    rather than sampling each trial.  The runtime therefore depends on the
+    number of distinct states rather than on `n`, so that e.g. `1e12`
+    trials of a 3-door game take milliseconds.  The results follow the
+    same distribution as those of `cargoat.core.play()`.
+
+    The game can contain the same actions as for `cargoat.exact.solve()`;
+    in particular, `cargoat.actions.logical.IfElse` conditions must be
+    callables which only depend on the door arrays.  Conditions are called
+    with a simulation holding one trial per state.  A
+    `cargoat.actions.logical.TryExcept` applies its second action if
+    the first fails for any state.
+
+    Parameters
+    ----------
+    game : list-like
+        A list of objects from the `cargoat.actions` subpackage.
+    n : int, optional
+        Number of trials to simulate. The default is 100.
+    seed : int, optional
+        Random seed for the global `np.random` state. The default is None.
+    rng : np.random.Generator or int, optional
+        Random number generator (or seed for `np.random.default_rng()`)
+        to use instead of the global state, see `cargoat.core.play()`.
+        Only one of `seed` and `rng` can be provided. The default is None.
+
+    Raises
+    ------
+    UnsupportedActionError
+        The game contains an action which cannot be applied to states.
+    MontyHallError
+        Problem with completing the game.
+
+    Returns
+    -------
+    results : dict
+        Results in the same format as `cargoat.sim.MontyHallSim.get_results()`,
+        with an additional `percent_spoiled` entry.
+
+    Examples
+    --------
+
+    ```python
+    >>> import cargoat as cg
+    >>> game = [cg.InitDoorsRandom(), cg.Pick(), cg.Reveal(), cg.Switch()]
+    >>> results = cg.play_counts(game, n=10**12, rng=0)
+    >>> results['trials']
+    1000000000000
+    >>> round(results['percent_wins'], 3)
+    66.667
+
+    ```
+
+    '''
+    rng = _get_rng(seed=seed, rng=rng)
+    sim, counts = _play_states(game, int(n), rng=rng)
+    return _results(sim, counts)
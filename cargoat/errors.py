@@ -23,6 +23,10 @@ class BadReveal(MontyHallError):
 class BadCar(MontyHallError):
     """Exception indicating a car placement/removal violated the game rules."""
 
+class UnsupportedActionError(NotImplementedError):
+    """Exception indicating an action which cannot be handled by an
+    alternative engine, e.g. the exact solver in `cargoat.exact`."""
+
 def bad_trials_raise(badrows, msg, errortype):
     '''Typical cargoat error message, saying what went wrong during
     the simulation, and on which rows.'''
@@ -36,7 +40,7 @@ def check_n_per_row(a, n, etype, emessage=None, include_eg=True):
     per row.  Call `bad_trials_raise()` when condition is not met for all.'''
     if emessage is None:
         emessage = "Incorrect number of selections for some trials."
-    n_per_row = a.astype(int).sum(axis=1)
+    n_per_row = a.sum(axis=1, dtype=int)
     wrong_n = (n_per_row != n)
     if np.any(wrong_n):
         if include_eg:
@@ -50,10 +54,11 @@ def check_redundancy_for_setting(old_array, new_array, behavior,
     if emessage is None:
         emessage = "Redundant action for some trials."
 
+    # logical operations keep this valid for boolean & unsigned arrays
     if behavior in ['overwrite', 'add']:
-        redundant =  (new_array + old_array) > 1
+        redundant = np.logical_and(new_array, old_array)
     elif behavior == 'remove':
-        redundant = (old_array - new_array) < 0
+        redundant = np.logical_and(new_array, np.logical_not(old_array))
     else:
         raise ValueError('`behavior` must be "overwrite", "add" or "remove"')
 
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exact solution of Monty Hall games, by enumerating the possible states of
+a trial and their probabilities rather than simulating.
+"""
+
+from collections.abc import Iterable
+import itertools as it
+import pprint
+
+import numpy as np
+
+from cargoat.actions.convenience import Pass, Stay, Switch
+from cargoat.actions.generic import GenericAction
+from cargoat.actions.initialization import (InitDoorsEmpty,
+                                            InitDoorsFixed,
+                                            InitDoorsRandom)
+from cargoat.actions.logical import ChanceTo, IfElse, TryExcept
+from cargoat.actions.remodeling import AddDoors, RemoveDoors, RearrangeDoors
+from cargoat.actions.results import ShowResults
+from cargoat.actions.spoiling import CheckSpoiled, MarkSpoiled, MarkUnspoiled
+from cargoat.errors import MontyHallError, UnsupportedActionError
+from cargoat.sim import MontyHallSim, _make_results, combine_sims
+
+# actions without randomness, which are applied to the states directly
+DETERMINISTIC = (AddDoors,
+                 CheckSpoiled,
+                 InitDoorsEmpty,
+                 InitDoorsFixed,
+                 MarkSpoiled,
+                 MarkUnspoiled,
+                 Pass,
+                 RearrangeDoors,
+                 RemoveDoors,
+                 Stay)
+
+class _Probabilities:
+    '''Weights of the states are their probabilities.  Other weightings
+    (e.g. sampled counts, see `cargoat.counts`) implement the same methods.'''
+
+    def split(self, p, rows, probs):
+        '''Weights of the outcomes of a selection, given the weights `p` of
+        the states, the state `rows` of each outcome, and their
+        probabilities `probs` (see `_selection_outcomes()`).'''
+        return p[rows] * probs
+
+    def chance(self, p, prob):
+        '''Split weights into those of an event with probability `prob`, and
+        of its complement.'''
+        return p * prob, p * (1 - prob)
+
+    def results(self, sim, p, condition=None):
+        '''Results dictionary for `cargoat.actions.results.ShowResults`.'''
+        return _results(sim, p, condition=condition)
+
+PROBABILITIES = _Probabilities()
+
+def _selection_outcomes(action, sim):
+    '''
+    Enumerate the possible selections of a
+    `cargoat.actions.generic.GenericAction` for each trial of `sim`.
+
+    Returns
+    -------
+    rows : 1D numpy array
+        Trial of `sim` for each outcome.
+    new_array : 2D numpy array
+        Selected doors for each outcome.
+    probs : 1D numpy array
+        Probability of each outcome, given its trial.
+    n : int
+        Number of selections per trial (see `MontyHallSim._set_array()`).
+
+    '''
+    allowed = sim._allowed_doors(picked=action.exclude_picked,
+                                 revealed=action.exclude_revealed,
+                                 cars=action.exclude_cars,
+                                 not_picked=action.exclude_unpicked,
+                                 not_revealed=action.exclude_closed,
+                                 not_cars=action.exclude_carless)
+    doors = action.doors
+    rows, selected, probs = [], [], []
+
+    if isinstance(doors, (int, np.integer)):
+        n = int(doors)
+        for i, mask in enumerate(allowed):
+            # rows with too few allowed doors select all of them, and
+            # fail the checks of `_set_array()` (as when simulating)
+            choices = list(it.combinations(np.flatnonzero(mask), min(n, mask.sum())))
+            rows += [i] * len(choices)
+            selected += choices
+            probs += [1 / len(choices)] * len(choices)
+    elif isinstance(doors, Iterable) and not action.weighted:
+        n = len(doors)
+        new_array = np.zeros(sim.shape, dtype=sim.dtype)
+        new_array[:, doors] = 1
+        return np.arange(sim.n), new_array, np.ones(sim.n), n
+    elif isinstance(doors, Iterable) and action.weighted:
+        n = 1
+        weights = np.asarray(doors, dtype=float)
+        for i, mask in enumerate(allowed):
+            if len(weights) == sim.shape[1]:
+                w = weights[mask]
+            elif len(weights) == mask.sum():
+                w = weights
+            else:
+                raise ValueError(f"Number of weights ({len(weights)}) does not "
+                                 "match number of open spots for some rows.")
+            if w.sum() == 0:
+                raise ValueError("Weights sum to zero.")
+            for door, weight in zip(np.flatnonzero(mask), w):
+                if weight > 0:
+                    rows.append(i)
+                    selected.append((door,))
+                    probs.append(weight / w.sum())
+    else:
+        raise ValueError('Cannot interpret `doors` as an integer, '
+                         'choice array, or weighted choice array. '
+                         'Please see documentation.')
+
+    rows = np.array(rows, dtype=int)
+    new_array = np.zeros((len(rows), sim.shape[1]), dtype=sim.dtype)
+    for j, choice in enumerate(selected):
+        new_array[j, list(choice)] = 1
+
+    return rows, new_array, np.array(probs, dtype=float), n
+
+def _merge(sim, p):
+    '''Combine identical states (summing their probabilities), and drop
+    states with zero probability.'''
+    keep = p > 0
+    sim, p = sim.select(x=keep), p[keep]
+    if sim.empty or sim.n == 0:
+        return sim, p
+
+    key = np.column_stack([sim.cars, sim.picked, sim.revealed, sim.spoiled])
+    _, first, inverse = np.unique(key, axis=0, return_index=True,
+                                  return_inverse=True)
+    total = np.bincount(inverse.ravel(), weights=p)
+    if p.dtype.kind in 'iu':
+        total = np.rint(total).astype(p.dtype)
+    return sim.select(x=first), total
+
+def _concat(branches):
+    '''Stack the states of several (sim, p) pairs.'''
+    branches = [(sim, p) for sim, p in branches if np.any(p > 0)]
+    if len(branches) == 1:
+        return _merge(*branches[0])
+    sim = combine_sims([sim for sim, _ in branches])
+    return _merge(sim, np.concatenate([p for _, p in branches]))
+
+def _select(action, sim, p, weights=PROBABILITIES):
+    '''Apply a `cargoat.actions.generic.GenericAction`.'''
+    rows, new_array, probs, n = _selection_outcomes(action, sim)
+    out = sim.select(x=rows)
+    out._set_array(target=action.target,
+                   new_array=new_array,
+                   behavior=action.behavior,
+                   n_per_row=n,
+                   allow_spoiled=action.allow_spoiled,
+                   allow_redundant=action.allow_redundant)
+    return _merge(out, weights.split(p, rows, probs))
+
+def _per_row(action):
+    '''Check if an action has parameters for each trial.'''
+    if isinstance(action, InitDoorsRandom):
+        return action.per_row
+    return np.ndim(action.p) > 0
+
+def _apply(action, sim, p, weights=PROBABILITIES):
+    '''Apply an action to the states `sim` with weights `p` (by default
+    probabilities), returning the new states and weights.'''
+    if isinstance(action, GenericAction):
+        return _select(action, sim, p, weights)
+
+    elif isinstance(action, (InitDoorsRandom, ChanceTo)) and _per_row(action):
+        raise UnsupportedActionError(f'{repr(action)} has parameters for each '
+                                     'trial, which cannot be used with states.')
+
+    elif isinstance(action, InitDoorsRandom):
+        sim.init_doors(action.cars + action.goats)
+        return _select(action._place_cars, sim, p, weights)
+
+    elif isinstance(action, Switch):
+        return _apply(action.action, sim, p, weights)
+
+    elif isinstance(action, ChanceTo):
+        yes, no = weights.chance(p, action.p)
+        branches = [(sim, no)]
+        if np.any(yes > 0):
+            done = _apply(action.action, *_merge(sim.copy(), yes), weights)
+            branches.insert(0, done)
+        return _concat(branches)
+
+    elif isinstance(action, IfElse):
+        if not action.condition_call:
+            raise UnsupportedActionError('IfElse with a precomputed condition '
+                                         'cannot be solved exactly, as it '
+                                         'refers to individual trials.')
+        bools = np.asarray(action.condition(sim)).astype(bool)
+        branches = []
+        for a, rows in [(action.a, bools), (action.b, ~bools)]:
+            if rows.any():
+                branches.append(_apply(a, sim.select(x=rows), p[rows], weights))
+        return _concat(branches)
+
+    elif isinstance(action, TryExcept):
+        try:
+            return _apply(action.a, sim.copy(), p, weights)
+        except UnsupportedActionError:
+            raise
+        except Exception:
+            return _apply(action.b, sim, p, weights)
+
+    elif isinstance(action, ShowResults):
+        if action.spoiled_games is not None:
+            bools = action._get_spoiled_games_condition(sim)
+        elif action.condition is None:
+            bools = None
+        else:
+            bools = action.condition(sim) if action.condition_call else action.condition
+        pprint.pprint(weights.results(sim, p, condition=bools), sort_dicts=False)
+        return sim, p
+
+    elif isinstance(action, DETERMINISTIC):
+        return _merge(action(sim), p)
+
+    raise UnsupportedActionError(f'Cannot solve {repr(action)} exactly; use '
+                                 '`cargoat.play()` to simulate it instead.')
+
+def _results(sim, p, n=1, condition=None):
+    '''Results dictionary of the states `sim` with probabilities `p`,
+    see `solve()`.'''
+    if condition is not None:
+        condition = np.asarray(condition).astype(bool)
+        sim, p = sim.select(x=condition), p[condition]
+
+    total = p.sum()
+    p = p / total if total else p
+    spoiled = sim.spoiled.astype(bool) if sim.n else np.zeros(0, dtype=bool)
+    wins = p[sim.is_win()].sum() if not sim.empty else 0.0
+
+    results = _make_results(trials=n if condition is None else n * total,
+                            wins=n * total * wins,
+                            spoiled_games=np.any(spoiled))
+    results['percent_spoiled'] = p[spoiled].sum() * 100
+    return results
+
+def solve(game, n=1):
+    '''
+    Compute the exact results of a Monty Hall game.
+
+    Rather than simulating trials, the probability of each possible state of
+    a trial (the cars, picked, and revealed doors, and whether it is
+    spoiled) is propagated through the actions of the game.  This is much
+    faster than simulating for games with a moderate number of doors, and
+    has no sampling error.
+
+    The game can contain the actions in `cargoat.actions`, except that
+    `cargoat.actions.logical.IfElse` conditions must be callables which
+    only depend on the door arrays (not on the trial number, e.g.
+    `sim.idx`).  Conditions passed to `IfElse` and
+    `cargoat.actions.results.ShowResults` are called with a simulation
+    holding one trial per possible state.  `ShowResults` prints the exact
+    results.  `cargoat.actions.logical.TryExcept` applies its second action
+    if the first fails for any possible state, as when simulating many
+    trials.
+
+    Parameters
+    ----------
+    game : list-like
+        A list of objects from the `cargoat.actions` subpackage.
+    n : int, optional
+        Number of trials to scale the results by. The default is 1, in which
+        case `wins` and `losses` are probabilities.
+
+    Raises
+    ------
+    UnsupportedActionError
+        The game contains an action which cannot be solved exactly.
+    MontyHallError
+        Problem with completing the game, e.g. an action would raise an
+        error when simulating.
+
+    Returns
+    -------
+    results : dict
+        Results in the same format as `cargoat.sim.MontyHallSim.get_results()`,
+        with expected numbers of wins and losses for `n` trials.  The
+        `spoiled_games` entry indicates if any trials can be spoiled, and an
+        additional `percent_spoiled` entry gives the probability of a spoiled
+        trial.
+
+    Examples
+    --------
+
+    ```python
+    >>> import cargoat as cg
+    >>> game = [cg.InitDoorsRandom(), cg.Pick(), cg.Reveal(), cg.Switch()]
+    >>> cg.solve(game)['percent_wins']
+    66.66666666666666
+
+    ```
+
+    '''
+    sim = MontyHallSim(1, dtype=bool)
+    p = np.ones(1)
+    for i, action in enumerate(game):
+        try:
+            sim, p = _apply(action, sim, p)
+        except UnsupportedActionError:
+            raise
+        except Exception as error:
+            msg = f'Error for step {i}: {repr(action)}'
+            raise MontyHallError(msg) from error
+
+    return _results(sim, p, n=n)
@@ -6,10 +6,11 @@ running a given Monty Hall experiment many times.
 """
 
 import warnings
+import weakref
 
 import numpy as np
 
-from cargoat.arrayops import get_index_success
+from cargoat.arrayops import Workspace, get_index_success
 from cargoat.errors import (
     BadCar,
     BadPick,
@@ -22,7 +23,8 @@ from cargoat.errors import (
 def combine_sims(sims, index=None, copy=True):
     '''
     Merge two or more simulations together, by stacking their
-    trials together.
+    trials together.  The storage dtype of the new simulation is the
+    common dtype of the merged arrays (see `np.result_type`).
 
     Parameters
     ----------
@@ -107,7 +109,6 @@ def combine_sims(sims, index=None, copy=True):
     n = len(sims)
     rows = [x.shape[0] for x in sims]
     cols = [x.shape[1] for x in sims if not x.empty]
-    copyfun = (lambda x: x.copy()) if copy else (lambda x: x)
 
     if len(set(cols)) != 1:
         raise ValueError('All sims must have the same number of doors (columns).')
@@ -118,32 +119,65 @@ def combine_sims(sims, index=None, copy=True):
     if len(index) != sum(rows):
         raise ValueError('Index length must match number of trials across simulations.')
 
-    shape = (len(index), cols[0])
+    # keep the storage class when all simulations share it
+    classes = set(type(x) for x in sims if not x.empty)
+    cls = classes.pop() if len(classes) == 1 else MontyHallSim
 
-    cars = np.zeros(shape, dtype=int)
-    picked = np.zeros(shape, dtype=int)
-    revealed = np.zeros(shape, dtype=int)
-    spoiled = np.zeros(shape[0], dtype=bool)
+    return cls._combine(sims, index=np.asarray(index), copy=copy)
 
-    for i in np.unique(index):
-        sim = sims[i]
-        cars[index == i, :] = copyfun(sim.cars)
-        picked[index == i, :] = copyfun(sim.picked)
-        revealed[index == i, :] = copyfun(sim.revealed)
-        spoiled[index == i] = sim.spoiled
+def combine_results(results):
+    '''
+    Merge the results of two or more simulations, as returned by
+    `MontyHallSim.get_results()`.  This gives the same results as calling
+    `get_results()` on the combined simulations (see `combine_sims()`),
+    without keeping the simulations themselves.
 
-    return MontyHallSim.from_arrays(picked=picked,
-                                    revealed=revealed,
-                                    cars=cars,
-                                    spoiled=spoiled,
-                                    copy=False)
+    Parameters
+    ----------
+    results : list-like
+        Collection of results dictionaries.
+
+    Raises
+    ------
+    ValueError
+        No results were provided.
+
+    Returns
+    -------
+    dict
+        Combined results.
+
+    '''
+    results = list(results)
+    if not results:
+        raise ValueError('Must provide at least one results dictionary.')
+
+    return _make_results(trials=sum(r['trials'] for r in results),
+                         wins=sum(r['wins'] for r in results),
+                         spoiled_games=np.any([r['spoiled_games'] for r in results]))
+
+def _make_results(trials, wins, spoiled_games):
+    '''Build the dictionary returned by `MontyHallSim.get_results()` from
+    the number of trials & wins, and whether any trials were spoiled.'''
+    losses = trials - wins
+    return {
+        'trials': trials,
+        'wins': wins,
+        'losses': losses,
+        'percent_wins': (wins / trials) * 100,
+        'percent_losses': (losses / trials) * 100,
+        'spoiled_games': spoiled_games
+        }
 
 class MontyHallSim:
     '''Class for remembering the status of the game simualtion.'''
 
+    # whether the storage keeps a mask of valid doors, see `valid`
+    _ragged = True
+
     # ---- Dunder methods
 
-    def __init__(self, n):
+    def __init__(self, n, dtype=int):
         '''
         The MontyHallSim object tracks the game status for repeated Monty Hall
         games.
@@ -154,7 +188,8 @@ class MontyHallSim:
             - `self.revealed`: Indicates doors that have been opened
             - `self.cars`: Indicates doors which have a car behind them.
 
-        These are all binary, 2D, integer arrays.  The shape of the arrays
+        These are all binary, 2D arrays, stored with the data type given
+        by `dtype` (integer by default).  The shape of the arrays
         during/after a typical simulation will be (trials, doors) - one row
         constitutes one game.  The initialization argument `n` determines
         the number of trials.  The number of doors is determined by the particular
@@ -164,6 +199,27 @@ class MontyHallSim:
         shape (trials,).  This simply records whether a trial has broken
         the rules of the traditional Monty Hall game.
 
+        Trials can have different numbers of doors, by padding them to the
+        largest number of doors (see `init_doors()`).  The `valid` attribute
+        is then a boolean array of the simulation shape marking the doors
+        which exist in each trial; it is None when all trials have all the
+        doors.  Padding doors are never selected by the actions, never match
+        `query_doors_or()`, and setting them spoils the trial.
+
+        The `rng` attribute is the random number generator used by the
+        actions (a `np.random.Generator`).  By default it is None, in which
+        case the global `np.random` state is used.  Simulations created
+        from another (e.g. with `select()` or `copy()`) share its `rng`.
+
+        The `workspace` attribute (a `cargoat.arrayops.Workspace`) holds
+        arrays which the actions reuse for their selections (released at
+        the end of `cargoat.core.play()`, and not pickled), and the door
+        arrays allocated by the simulation are updated in place, so that the
+        steps of a game do not allocate new arrays of the simulation shape.
+        Arrays from elsewhere (e.g. passed to `from_arrays()` with
+        `copy=False`, or assigned to the attributes) are never changed by
+        the actions: they are copied on their first update.
+
         MontyHallSims are updated by applying rules/actions, i.e. from the
         `cargoat.actions` subpackage.
 
@@ -179,6 +235,12 @@ class MontyHallSim:
         ----------
         n : int
             Number of trials to simulate.
+        dtype : data-type, optional
+            Data type used to store the cars, picked, and revealed arrays.
+            The default is `int` (8 bytes per door).  Compact types like
+            `bool` or `np.uint8` use one byte per door, which reduces memory
+            substantially for large simulations; the dtype is kept by all
+            the actions in `cargoat.actions`.
 
         Returns
         -------
@@ -186,6 +248,13 @@ class MontyHallSim:
 
         '''
         self.n = int(n)
+        self.dtype = np.dtype(dtype)
+        self.rng = None
+        self.workspace = Workspace()
+        self._valid = None
+        # weak references to the door arrays allocated by the simulation,
+        # which can be updated in place (see `_update_array()`)
+        self._allocated = {}
 
         self.make_empty()
 
@@ -199,13 +268,30 @@ class MontyHallSim:
                         (self.picked == sim.picked).all(),
                         (self.revealed == sim.revealed).all(),
                         (self.spoiled == sim.spoiled).all(),
+                        (self._valid_mask() == sim._valid_mask()).all(),
                         (self.n == sim.n)])
 
+    def __getstate__(self):
+        # weak references cannot be pickled; keep the names of the
+        # allocated arrays, which are still allocated once unpickled.  The
+        # reused arrays of the workspace are left out.
+        state = self.__dict__.copy()
+        state['workspace'] = Workspace()
+        state['_allocated'] = [target for target, ref in self._allocated.items()
+                               if ref() is not None and ref() is state.get(target)]
+        return state
+
+    def __setstate__(self, state):
+        allocated = state.pop('_allocated', [])
+        self.__dict__.update(state)
+        self._allocated = {}
+        self._set_allocated(**{target: state[target] for target in allocated})
+
     # ---- Class methods
 
     @classmethod
     def from_arrays(cls, picked=None, revealed=None, cars=None,
-                    spoiled=None, default=0, copy=True):
+                    spoiled=None, default=0, copy=True, dtype=None, valid=None):
         '''
         Construct a MontyHallSim from existing numpy arrays.
 
@@ -225,7 +311,18 @@ class MontyHallSim:
         copy : bool, optional
             Call an explicit copy on the arrays before binding to the new
             simulation being created. Intended to prevent multiple simulations
-            pointing to the same arrays.  The default is True.
+            pointing to the same arrays.  The default is True.  With False,
+            the arrays passed are not changed by the actions (they are
+            copied on their first update).
+        dtype : data-type, optional
+            Storage dtype for the new simulation.  The default is None,
+            in which case the dtype of the first provided array (of `cars`,
+            `picked`, and `revealed`) is used.  Arrays with a different dtype
+            are converted (and thus copied, regardless of `copy`).
+        valid : 2D boolean numpy array, optional
+            Doors which exist in each trial, for trials with different
+            numbers of doors (see `valid`). The default is None, in which
+            case all doors are valid.
 
         Raises
         ------
@@ -248,13 +345,14 @@ class MontyHallSim:
 
         base = [a for a in mainarrays if a is not None][0]
         shape = base.shape
+        dtype = base.dtype if dtype is None else np.dtype(dtype)
 
         if picked is None:
-            picked = np.full(shape, default)
+            picked = np.full(shape, default, dtype=dtype)
         if revealed is None:
-            revealed = np.full(shape, default)
+            revealed = np.full(shape, default, dtype=dtype)
         if cars is None:
-            cars = np.full(shape, default)
+            cars = np.full(shape, default, dtype=dtype)
 
         shape_set = set(i.shape for i in (cars, picked, revealed))
 
@@ -269,6 +367,9 @@ class MontyHallSim:
             raise ValueError('spoiled array does not match')
 
         for a in (cars, picked, revealed, spoiled):
+            # boolean arrays are binary by definition; skip the sort
+            if a.dtype == bool:
+                continue
             uniq = np.unique(a)
             if any(u not in (0, 1) for u in uniq):
                 msg = ("Non-binary integer detected in incoming arrays.")
@@ -276,12 +377,49 @@ class MontyHallSim:
 
         copyfun = (lambda x: x.copy()) if copy else (lambda x: x)
 
-        out = cls(n)
-        out.cars = copyfun(cars)
-        out.picked = copyfun(picked)
-        out.revealed = copyfun(revealed)
+        out = cls(n, dtype=dtype)
+        for name, array in (('cars', cars), ('picked', picked), ('revealed', revealed)):
+            stored = array.astype(dtype, copy=copy)
+            setattr(out, name, stored)
+            if stored is not array:
+                out._set_allocated(**{name: stored})
         out.spoiled = copyfun(spoiled)
+        out.valid = None if valid is None else copyfun(valid)
+
+        return out
 
+    @classmethod
+    def _combine(cls, sims, index, copy=True):
+        '''Implementation of `combine_sims()`, after the arguments have been
+        validated.  Storage backends can override this to merge simulations
+        without converting to dense arrays.'''
+        shape = (len(index), [x.shape[1] for x in sims if not x.empty][0])
+        dtype = np.result_type(*[x.cars.dtype for x in sims if not x.empty])
+        copyfun = (lambda x: x.copy()) if copy else (lambda x: x)
+
+        cars = np.zeros(shape, dtype=dtype)
+        picked = np.zeros(shape, dtype=dtype)
+        revealed = np.zeros(shape, dtype=dtype)
+        spoiled = np.zeros(shape[0], dtype=bool)
+        ragged = any(x.valid is not None for x in sims)
+        valid = np.ones(shape, dtype=bool) if ragged else None
+
+        for i in np.unique(index):
+            sim = sims[i]
+            cars[index == i, :] = copyfun(sim.cars)
+            picked[index == i, :] = copyfun(sim.picked)
+            revealed[index == i, :] = copyfun(sim.revealed)
+            spoiled[index == i] = sim.spoiled
+            if ragged and sim.valid is not None:
+                valid[index == i, :] = sim.valid
+
+        out = cls.from_arrays(picked=picked,
+                              revealed=revealed,
+                              cars=cars,
+                              spoiled=spoiled,
+                              copy=False)
+        out._set_allocated(cars=cars, picked=picked, revealed=revealed)
+        out.valid = valid
         return out
 
     # ---- Properties
@@ -307,24 +445,79 @@ class MontyHallSim:
         arrs = [self.cars, self.picked, self.revealed, self.spoiled]
         return all(a.size == 0 for a in arrs)
 
+    @property
+    def valid(self):
+        '''Boolean array of the simulation shape marking the doors which
+        exist in each trial, or None when all trials have all the doors.
+        Setting an all-True mask stores None.'''
+        return self._valid
+
+    @valid.setter
+    def valid(self, value):
+        if value is not None:
+            value = np.asarray(value, dtype=bool)
+            if value.all():
+                value = None
+            elif not self._ragged:
+                raise NotImplementedError(f'{type(self).__name__} does not '
+                                          'support trials with different '
+                                          'numbers of doors.')
+            elif value.shape != self.shape:
+                raise ValueError(f'Valid mask shape {value.shape} does not '
+                                 f'match simulation shape {self.shape}')
+        self._valid = value
+
+    def _valid_mask(self):
+        '''`valid`, as an array even when all doors are valid.'''
+        if self.valid is None:
+            return np.ones(self.shape, dtype=bool)
+        return self.valid
 
     # ---- Initialization
     def init_doors(self, doors):
-        '''Populate arrays with zeros.'''
+        '''Populate arrays with zeros.  `doors` can also be an array with
+        the number of doors of each trial, in which case the trials are
+        padded to the largest number of doors (see `valid`).'''
+        counts = None
+        if np.ndim(doors) > 0:
+            counts = np.broadcast_to(np.asarray(doors, dtype=int), (self.n,))
+            doors = int(counts.max()) if self.n else 0
         shape = (self.n, doors)
-        self.cars = np.zeros(shape, dtype=int)
-        self.picked = np.zeros(shape, dtype=int)
-        self.revealed = np.zeros(shape, dtype=int)
+        self.cars = np.zeros(shape, dtype=self.dtype)
+        self.picked = np.zeros(shape, dtype=self.dtype)
+        self.revealed = np.zeros(shape, dtype=self.dtype)
+        self._set_allocated(cars=self.cars, picked=self.picked, revealed=self.revealed)
         self.spoiled = np.zeros(self.n, dtype=bool)
+        self.valid = (None if counts is None else
+                      np.arange(doors) < counts[:, np.newaxis])
 
     def make_empty(self):
         '''Save empty arrays into main arrays.'''
-        self.cars = np.empty(0, dtype=int)
-        self.picked = np.empty(0, dtype=int)
-        self.revealed = np.empty(0, dtype=int)
+        self.cars = np.empty(0, dtype=self.dtype)
+        self.picked = np.empty(0, dtype=self.dtype)
+        self.revealed = np.empty(0, dtype=self.dtype)
         self.spoiled = np.empty(0, dtype=bool)
+        self.valid = None
 
     # ---- Indexing
+    @staticmethod
+    def _indexers(x=None, y=None, use_ix_=True):
+        '''Convert the `x` & `y` arguments of `select()` to numpy indexers
+        for the trial and door axes.'''
+        # this prevents loss of dimension for selecting single doors
+        x = [x] if isinstance(x, int) else x
+        y = [y] if isinstance(y, int) else y
+
+        # this allows for selection of trials and doors simulataneously
+        if (x is not None and y is not None) and use_ix_:
+            x, y = np.ix_(x, y)
+
+        # this allows indexing of only one axis
+        x = slice(None) if x is None else x
+        y = slice(None) if y is None else y
+
+        return x, y
+
     def select(self, x=None, y=None, copy=True, use_ix_=True):
         '''
         Index the simulation to create a new one.
@@ -339,7 +532,10 @@ class MontyHallSim:
             in which case all doors are selected.
         copy : bool, optional
             Create an explicit copy of the arrays before binding to the
-            newly created simulation. The default is True.  Note that
+            newly created simulation. The default is True.  Without a copy,
+            the arrays can be views of this simulation's arrays (which are
+            copied on the first update by an action of either simulation,
+            rather than changed in place).  Note that
             many indexing operations with this function trigger numpy advanced
             indexing and thus create copies of the main arrays.
             For now, copy is set to default and wastefully create more copies.
@@ -356,18 +552,7 @@ class MontyHallSim:
             New simulation object.
 
         '''
-        # this prevents loss of dimension for selecting single doors
-        x = [x] if isinstance(x, int) else x
-        y = [y] if isinstance(y, int) else y
-
-        # this allows for selection of trials and doors simulataneously
-        if (x is not None and y is not None) and use_ix_:
-            x, y = np.ix_(x, y)
-
-        # this allows indexing of only one axis
-        x = slice(None) if x is None else x
-        y = slice(None) if y is None else y
-
+        x, y = self._indexers(x, y, use_ix_=use_ix_)
         copyfun = (lambda x: x.copy()) if copy else (lambda x: x)
 
         cars = copyfun(self.cars[x, y])
@@ -375,21 +560,28 @@ class MontyHallSim:
         revealed = copyfun(self.revealed[x, y])
         spoiled = copyfun(self.spoiled[x])
 
-        return self.from_arrays(picked=picked,
-                                revealed=revealed,
-                                cars=cars,
-                                spoiled=spoiled,
-                                copy=False)
+        out = self.from_arrays(picked=picked,
+                               revealed=revealed,
+                               cars=cars,
+                               spoiled=spoiled,
+                               copy=False)
+        if copy:
+            out._set_allocated(cars=cars, picked=picked, revealed=revealed)
+        if self.valid is not None:
+            out.valid = self.valid[x, y]
+        out.rng = self.rng
+        return out
 
 
     # ---- Status of the sim
     def pickable_doors(self, exclude_current=True):
         '''Array of the simulation shape indicating which doors are
         not revealed (with or without the current picked doors).'''
-        return ~self.query_doors_or(picked=exclude_current, revealed=True)
+        return self._allowed_doors(picked=exclude_current, revealed=True)
 
     def query_doors_or(self, cars=False, picked=False, revealed=False,
-                       not_cars=False, not_picked=False, not_revealed=False):
+                       not_cars=False, not_picked=False, not_revealed=False,
+                       out=None):
         '''
         Return a boolean array indicating which doors of the simulation
         meet one or more conditions.
@@ -408,38 +600,58 @@ class MontyHallSim:
             Signal doors that are not picked. The default is False.
         not_revealed : bool, optional
             Signal doors that are closed. The default is False.
+        out : numpy array, optional
+            Boolean array of the simulation shape to write the result into.
+            The default is None, in which case a new array is created.
 
         Returns
         -------
         out : numpy array
+            Padding doors (see `valid`) never meet any condition.
 
         '''
-        c = int(cars)
-        p = int(picked)
-        r = int(revealed)
-        notc = int(not_cars)
-        notp = int(not_picked)
-        notr = int(not_revealed)
-
-        out = np.logical_or.reduce([
-            c * self.cars,
-            p * self.picked,
-            r * self.revealed,
-            notc * (1 - self.cars),
-            notp * (1 - self.picked),
-            notr * (1 - self.revealed)
-            ])
+        # logical ops avoid upcasting compact (bool/uint8) arrays
+        if out is None:
+            out = np.zeros(self.shape, dtype=bool)
+        else:
+            out[...] = False
+        queries = [(self.cars, cars, not_cars),
+                   (self.picked, picked, not_picked),
+                   (self.revealed, revealed, not_revealed)]
+        for arr, positive, negative in queries:
+            if positive:
+                out |= arr.astype(bool, copy=False)
+            if negative:
+                out |= np.logical_not(arr)
+        if self.valid is not None:
+            out &= self.valid
         return out
 
+    def _allowed_doors(self, out=None, **query):
+        '''Boolean array of the valid doors which meet none of the conditions
+        of `query_doors_or(**query)`, i.e. the doors an action can select.
+        It is written into `out` when given.'''
+        allowed = np.logical_not(self.query_doors_or(**query, out=out), out=out)
+        if self.valid is not None:
+            allowed &= self.valid
+        return allowed
+
+    def _overlap(self, new_array, **query):
+        '''Boolean array of cells set in `new_array` which also meet the
+        conditions of `query_doors_or(**query)`.  Used for spoiling checks.'''
+        return np.logical_and(self.query_doors_or(**query), new_array)
+
     def revealable_doors(self):
         '''Array of the simulation shape indicating which doors are
         not revealed, don't contain cars, and aren't currently picked.'''
-        return ~self.query_doors_or(cars=True, picked=True, revealed=True)
+        return self._allowed_doors(cars=True, picked=True, revealed=True)
 
     def count_totals(self, target):
         '''Return a count of the number of positives for each trial in the
         simulation.  Target is `cars`, `picked`, or `revealed`. '''
         arr = getattr(self, target)
+        if self.valid is not None:
+            return np.logical_and(arr, self.valid).sum(axis=1)
         return arr.sum(axis=1)
 
     def show(self, start=0, end=10):
@@ -453,6 +665,9 @@ class MontyHallSim:
         print(self.revealed[start:end, ])
         print('\nPicked:')
         print(self.picked[start:end, ])
+        if self.valid is not None:
+            print('\nValid:')
+            print(self.valid[start:end, ].astype(int))
 
     # ---- Generic setter functions
 
@@ -522,7 +737,6 @@ class MontyHallSim:
 
         '''
 
-        old_array = getattr(self, target)
         check_spoiling = self._get_spoiling_func(target)
         etype = {'cars': BadCar,
                  'revealed': BadReveal,
@@ -537,24 +751,80 @@ class MontyHallSim:
             check_n_per_row(a=new_array, n=n_per_row, etype=etype)
 
         if not allow_redundant:
-            check_redundancy_for_setting(old_array=old_array, new_array=new_array,
+            check_redundancy_for_setting(old_array=getattr(self, target),
+                                         new_array=new_array,
                                          behavior=behavior, etype=etype)
 
         # then check for valid action
         kosher = check_spoiling(new_array, behavior=behavior, allow_spoiled=allow_spoiled)
+        if self.valid is not None:
+            kosher &= self._check_padding(new_array, behavior, etype=etype,
+                                          allow_spoiled=allow_spoiled)
 
         # mark spoiled games (only based on invalid picks)
         spoiling_rows = np.any(~kosher, axis=1)
         self.spoiled[spoiling_rows] = 1
 
-        # update sim.picked
+        self._update_array(target, new_array, behavior=behavior)
+
+    def _set_allocated(self, **arrays):
+        '''Record door arrays (by target name) as allocated by the
+        simulation, so that the actions can update them in place.'''
+        for target, array in arrays.items():
+            self._allocated[target] = weakref.ref(array)
+
+    def _is_allocated(self, target, array):
+        '''Whether `array`, the current `target` array, was allocated by
+        the simulation (see `_set_allocated()`).'''
+        ref = self._allocated.get(target)
+        return ref is not None and ref() is array
+
+    def _update_array(self, target, new_array, behavior='overwrite'):
+        '''Combine `new_array` with the current target array according to
+        `behavior` (see `_set_array()`), without any checks.  The target
+        array is updated in place when it was allocated by the simulation,
+        has the right shape, and is writeable; it is replaced otherwise, so
+        that arrays shared with the caller (e.g. from `from_arrays()` with
+        `copy=False`) are left unchanged.'''
+        old_array = getattr(self, target)
+        if (old_array.shape == new_array.shape and old_array.flags.writeable
+                and self._is_allocated(target, old_array)):
+            if behavior == 'add':
+                np.logical_or(old_array, new_array, out=old_array)
+            elif behavior == 'remove':
+                np.logical_and(old_array, np.logical_not(new_array), out=old_array)
+            else:
+                np.copyto(old_array, new_array, casting='unsafe')
+            # re-assign, so that storage backends register the change
+            return setattr(self, target, old_array)
+
         if behavior == 'add':
-            new_array = np.logical_or(new_array, old_array).astype(int)
+            new_array = np.logical_or(new_array, old_array)
         elif behavior == 'remove':
-            new_array = old_array - np.logical_and(new_array, old_array).astype(int)
-            new_array[new_array < 0] = 0
+            new_array = np.logical_and(old_array, np.logical_not(new_array))
 
+        # copied, as `new_array` can be a reused array (see `workspace`)
+        new_array = new_array.astype(self.dtype)
         setattr(self, target, new_array)
+        self._set_allocated(**{target: new_array})
+
+    def _check_padding(self, new_array, behavior, etype, allow_spoiled=True):
+        '''
+        Checks if a new array sets padding doors (see `valid`), which
+        spoils the game.  Removals do not trigger spoiling.
+        '''
+        if behavior == 'remove':
+            return np.full(self.shape, True)
+
+        valid = ~np.logical_and(new_array, ~self.valid)
+        if not allow_spoiled and np.any(~valid):
+            invalid_rows = np.any(~valid, axis=1)
+            trial, door = get_index_success(~valid)
+            msg = ("Padding doors (not part of the trial) were set, e.g. "
+                   f"trial {trial} door {door}.")
+            bad_trials_raise(invalid_rows, msg, etype)
+
+        return valid
 
     # ---- Pick setting
 
@@ -565,7 +835,7 @@ class MontyHallSim:
         not trigger spoiling.
         '''
         if behavior in ['add', 'overwrite']:
-            valid =  ~ np.logical_and(self.revealed, picks)
+            valid = ~self._overlap(picks, revealed=True)
         elif behavior == 'remove':
             valid = np.full(self.shape, True)
 
@@ -586,9 +856,8 @@ class MontyHallSim:
         cars or picked foors are revealed.  Removals (closing) do
         not trigger spoiling.
         '''
-        offlimits = self.query_doors_or(cars=True, picked=True)
         if behavior in ['add', 'overwrite']:
-            valid =  ~np.logical_and(offlimits, reveals)
+            valid = ~self._overlap(reveals, cars=True, picked=True)
         elif behavior == 'remove':
             valid = np.full(self.shape, True)
 
@@ -611,6 +880,35 @@ class MontyHallSim:
         valid = np.full(self.shape, True)
         return valid
 
+    # ---- Remodeling
+
+    def insert_doors(self, positions):
+        '''Insert empty doors (closed, unpicked goats) before the given
+        door indices.  See `np.insert` for the interpretation of
+        `positions`.'''
+        foo = lambda a: np.insert(arr=a, obj=positions, values=0, axis=1)
+        valid = self.valid
+        self.apply_func(foo)
+        if valid is not None:
+            self.valid = np.insert(arr=valid, obj=positions, values=True, axis=1)
+
+    def delete_doors(self, positions):
+        '''Delete the doors at the given indices.  See `np.delete` for the
+        interpretation of `positions`.'''
+        foo = lambda a: np.delete(arr=a, obj=positions, axis=1)
+        valid = self.valid
+        self.apply_func(foo)
+        if valid is not None:
+            self.valid = foo(valid)
+
+    def rearrange_doors(self, positions):
+        '''Reorder the doors, such that new door *i* is old door
+        `positions[i]`.'''
+        foo = lambda a: a.copy()[:, positions]
+        self.apply_func(foo)
+        if self.valid is not None:
+            self.valid = foo(self.valid)
+
     # ---- Other Helpers
     def apply_func(self, func, inplace=False, cars=True, picked=True, revealed=True):
         '''
@@ -641,9 +939,27 @@ class MontyHallSim:
             a = getattr(self, attr)
             if inplace:
                 func(a)
+                # re-assign, so that storage backends register the change
+                setattr(self, attr, a)
             else:
                 setattr(self, attr, func(a))
 
+    def _assign_from(self, sim):
+        '''Take on the state (arrays) of another simulation with the same
+        number of trials, e.g. one produced by `combine_sims()`.'''
+        self.cars = sim.cars
+        self.picked = sim.picked
+        self.revealed = sim.revealed
+        self.spoiled = sim.spoiled
+        self.valid = sim.valid
+
+    def _apply_generic_action(self, action):
+        '''Hook for storage backends which can apply a
+        `cargoat.actions.generic.GenericAction` without dense arrays.
+        Should return True if the action was applied, or False to use
+        the default implementation of the action.'''
+        return False
+
     def copy(self):
         '''
         Create a copy of the current simulation.
@@ -654,13 +970,17 @@ class MontyHallSim:
 
         '''
         if self.empty:
-            return MontyHallSim(self.n)
+            out = MontyHallSim(self.n, dtype=self.dtype)
         else:
-            return self.from_arrays(picked=self.picked,
-                                    revealed=self.revealed,
-                                    cars=self.cars,
-                                    spoiled=self.spoiled,
-                                    copy=True)
+            out = self.from_arrays(picked=self.picked,
+                                   revealed=self.revealed,
+                                   cars=self.cars,
+                                   spoiled=self.spoiled,
+                                   copy=True)
+            if self.valid is not None:
+                out.valid = self.valid.copy()
+        out.rng = self.rng
+        return out
 
     # ---- Results
 
@@ -668,9 +988,12 @@ class MontyHallSim:
         '''
         Return a boolean array indicating which trials are wins.  I.e.,
         at least one door with a car is picked.  Spoiled games have not
-        bearing on this method
+        bearing on this method, and padding doors (see `valid`) are ignored.
         '''
-        return np.any(self.picked * self.cars, axis=1)
+        both = np.logical_and(self.picked, self.cars)
+        if self.valid is not None:
+            both &= self.valid
+        return np.any(both, axis=1)
 
     def get_results(self, condition=None):
         '''
@@ -693,20 +1016,8 @@ class MontyHallSim:
 
         sim = self.select(x=condition) if condition is not None else self
 
-        wins = np.sum(np.any(sim.picked * sim.cars, axis=1))
-        losses = sim.n - wins
-        percent_wins = (wins / sim.n) * 100
-        percent_losses = (losses / sim.n) * 100
-        spoiled_games = np.any(sim.spoiled)
-        results = {
-            'trials': sim.n,
-            'wins': wins,
-            'losses': losses,
-            'percent_wins': percent_wins,
-            'percent_losses': percent_losses,
-            'spoiled_games': spoiled_games
-            }
-
-        return results
+        return _make_results(trials=sim.n,
+                             wins=np.sum(sim.is_win()),
+                             spoiled_games=np.any(sim.spoiled))
 
 
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Confidence intervals for the proportion of wins.
+"""
+
+import math
+from statistics import NormalDist
+
+def _check(wins, trials, confidence):
+    if trials < 1:
+        raise ValueError('Need at least one trial for a confidence interval.')
+    if not 0 <= wins <= trials:
+        raise ValueError('`wins` must be between 0 and `trials`.')
+    if not 0 < confidence < 1:
+        raise ValueError('`confidence` must be between 0 and 1.')
+
+def wilson_interval(wins, trials, confidence=0.95):
+    '''
+    Wilson score interval for the proportion of wins.
+
+    Parameters
+    ----------
+    wins : int
+        Number of wins.
+    trials : int
+        Number of trials.
+    confidence : float, optional
+        Confidence level of the interval. The default is 0.95.
+
+    Returns
+    -------
+    low, high : float
+        Bounds of the interval, as proportions.
+
+    '''
+    _check(wins, trials, confidence)
+    z = NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+    p = wins / trials
+    denom = 1 + z ** 2 / trials
+    center = (p + z ** 2 / (2 * trials)) / denom
+    half = z * math.sqrt(p * (1 - p) / trials + z ** 2 / (4 * trials ** 2)) / denom
+    low = 0.0 if wins == 0 else max(0.0, center - half)
+    high = 1.0 if wins == trials else min(1.0, center + half)
+    return low, high
+
+def _betacf(a, b, x, eps=1e-15, maxiter=100000):
+    '''Continued fraction for the regularized incomplete beta function
+    (modified Lentz's method).'''
+    tiny = 1e-300
+    c = 1.0
+    d = 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, maxiter):
+        for aa in (m * (b - m) * x / ((a - 1 + 2 * m) * (a + 2 * m)),
+                   -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 1 + 2 * m))):
+            d = 1 + aa * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + aa / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1) < eps:
+            break
+    return h
+
+def _betainc(a, b, x):
+    '''Regularized incomplete beta function, I_x(a, b).'''
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) +
+                     a * math.log(x) + b * math.log1p(-x))
+    if x < (a + 1) / (a + b + 2):
+        return front * _betacf(a, b, x) / a
+    return 1 - front * _betacf(b, a, 1 - x) / b
+
+def _beta_ppf(q, a, b, tol=1e-12):
+    '''Quantile of the beta distribution, by bisection.'''
+    low, high = 0.0, 1.0
+    while high - low > tol:
+        mid = (low + high) / 2
+        if _betainc(a, b, mid) < q:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+def clopper_pearson_interval(wins, trials, confidence=0.95):
+    '''
+    Clopper-Pearson ("exact") interval for the proportion of wins.  This
+    guarantees at least the nominal coverage, so it is usually wider than
+    the Wilson interval (see `wilson_interval()`).
+
+    Parameters
+    ----------
+    wins : int
+        Number of wins.
+    trials : int
+        Number of trials.
+    confidence : float, optional
+        Confidence level of the interval. The default is 0.95.
+
+    Returns
+    -------
+    low, high : float
+        Bounds of the interval, as proportions.
+
+    '''
+    _check(wins, trials, confidence)
+    alpha = 1 - confidence
+    low = 0.0 if wins == 0 else _beta_ppf(alpha / 2, wins, trials - wins + 1)
+    high = 1.0 if wins == trials else _beta_ppf(1 - alpha / 2, wins + 1, trials - wins)
+    return low, high
+
+INTERVALS = {'wilson': wilson_interval,
+             'clopper-pearson': clopper_pearson_interval}
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Running several variants of a game on the same trials.
+"""
+
+import copy
+import itertools as it
+
+import numpy as np
+
+from cargoat.actions.base import MontyHallAction
+from cargoat.actions.initialization import InitDoorsRandom
+from cargoat.actions.logical import ChanceTo, IfElse
+from cargoat.core import _get_rng, _new_sim, _run_game
+from cargoat.sim import MontyHallSim, _make_results
+
+def _same_value(a, b):
+    '''Check if two action attributes are equal.  Actions are equal if they
+    have the same type and attributes; other objects (e.g. functions) are
+    compared with `==`.'''
+    if a is b:
+        return True
+    if isinstance(a, MontyHallAction) or isinstance(b, MontyHallAction):
+        return type(a) is type(b) and _same_value(vars(a), vars(b))
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.shape(a) == np.shape(b) and np.array_equal(a, b)
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_same_value(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return (type(a) is type(b) and len(a) == len(b) and
+                all(_same_value(x, y) for x, y in zip(a, b)))
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return False
+
+def _shared_prefix(games):
+    '''Number of leading actions shared by all games.'''
+    k = 0
+    for steps in zip(*games):
+        if not all(_same_value(steps[0], action) for action in steps[1:]):
+            break
+        k += 1
+    return k
+
+class _Node:
+    '''Node of a trie of games: an action, the games ending after it, and
+    the nodes of the actions which can follow it.'''
+
+    def __init__(self, action=None):
+        self.action = action
+        self.ends = []
+        self.children = []
+
+    def child(self, action):
+        '''Get the child node for `action`, adding it if needed.'''
+        for node in self.children:
+            if _same_value(node.action, action):
+                return node
+        node = _Node(action)
+        self.children.append(node)
+        return node
+
+def _build_trie(games):
+    '''Trie of the action sequences of `games`.'''
+    root = _Node()
+    for i, game in enumerate(games):
+        node = root
+        for action in game:
+            node = node.child(action)
+        node.ends.append(i)
+    return root
+
+def _run_trie(node, sim, step, fork, func, out):
+    '''Run the games below `node`, starting from `sim` (the state after
+    `step` actions), storing `func` of each finished simulation in `out`.'''
+    for i in node.ends:
+        last = i == node.ends[-1] and not node.children
+        done = sim if last else fork(sim)
+        done.workspace.clear()
+        out[i] = func(done)
+
+    rng = sim.rng
+    state = np.random.get_state()
+    for j, child in enumerate(node.children):
+        branch = sim if j == len(node.children) - 1 else fork(sim)
+        # every branch continues from the same random state
+        if rng is None:
+            np.random.set_state(state)
+        else:
+            branch.rng = copy.deepcopy(rng)
+        _run_game([child.action], branch, start=step, finish=False)
+        _run_trie(child, branch, step + 1, fork, func, out)
+
+def play_many(games, n=100, seed=None, dtype=None, sim_class=MontyHallSim,
+              rng=None, func=None):
+    '''
+    Run several games which share some of their actions, running each
+    shared sequence of actions only once.
+
+    The games are arranged in a prefix tree (trie) of their actions.  Each
+    action is applied once for all the games starting with the same
+    actions up to it, and the simulation is only copied where games
+    diverge (the last branch at each divergence continues with the
+    original).  E.g. ten games starting with the same `InitDoorsRandom`,
+    `Pick`, and `Reveal` run these three actions once.  Wherever games
+    diverge, each branch continues from the same random state, so the
+    games are run with common random numbers (see `compare()`).
+
+    Actions are shared if they are the same object, or have the same type
+    and attributes (so `cg.Pick()` in one game matches `cg.Pick()` in
+    another).
+
+    Parameters
+    ----------
+    games : list-like
+        Games, each a list of objects from the `cargoat.actions`
+        subpackage.
+    n : int, optional
+        Number of trials to simulate for each game. The default is 100.
+    seed: number, optional
+        Set the seed for the global `np.random` state.  See
+        `cargoat.core.play()`.
+    dtype : data-type, optional
+        Storage dtype for the simulation arrays.  See `cargoat.core.play()`.
+    sim_class : type, optional
+        Class of the simulation objects to create.  See `cargoat.core.play()`.
+    rng : np.random.Generator or int, optional
+        Random number generator to use instead of the global state.  See
+        `cargoat.core.play()`.
+    func : callable, optional
+        Function applied to the simulation of each game once it is finished,
+        e.g. `lambda sim: sim.get_results()`, so that the simulations do not
+        need to be kept. The default is None, in which case the simulations
+        are returned.
+
+    Raises
+    ------
+    ValueError
+        Both `seed` and `rng` were provided.
+    MontyHallError
+        Problem with completing one of the games.
+
+    Returns
+    -------
+    out : list
+        Simulation (or output of `func`) of each game, in the order of
+        `games`.
+
+    Examples
+    --------
+
+    ```python
+    >>> import cargoat as cg
+    >>> base = [cg.InitDoorsRandom(), cg.Pick(), cg.Reveal()]
+    >>> games = [base + [cg.ChanceTo(p / 10, cg.Switch())] for p in range(11)]
+    >>> results = cg.play_many(games, n=1000, func=lambda sim: sim.get_results())
+    >>> len(results)
+    11
+
+    ```
+
+    '''
+    games = [list(game) for game in games]
+    func = (lambda sim: sim) if func is None else func
+    rng = _get_rng(seed=seed, rng=rng)
+
+    def fork(sim):
+        if sim.empty:
+            return _new_sim(n, dtype, sim_class, sim.rng)
+        return sim.copy()
+
+    out = [None] * len(games)
+    _run_trie(_build_trie(games), _new_sim(n, dtype, sim_class, rng),
+              step=0, fork=fork, func=func, out=out)
+    return out
+
+def compare(games, n=100, seed=None, dtype=None, sim_class=MontyHallSim,
+            rng=None):
+    '''
+    Compare several variants of a game, e.g. staying vs switching, on the
+    same trials (common random numbers).
+
+    The actions shared at the start of all games (e.g. initializing doors,
+    picking, and revealing) are run once, see `play_many()`.  Each game then
+    continues from this shared state, with its remaining actions drawing
+    the same random numbers as the other games.  Differences between the games are
+    therefore paired by trial.  For similar games (whose outcomes are
+    positively correlated) they have a much smaller variance than
+    differences between separate calls of `cargoat.core.play()`; note
+    that games with opposite outcomes (like staying and switching in the
+    classic game) are negatively correlated, and gain nothing from pairing.
+    The standard errors with and without pairing are both reported.
+
+    Actions are shared if they are the same object, or have the same type
+    and attributes (so `cg.Pick()` in one game matches `cg.Pick()` in
+    another).
+
+    Parameters
+    ----------
+    games : list-like
+        Two or more games, each a list of objects from the
+        `cargoat.actions` subpackage.
+    n : int, optional
+        Number of trials to simulate. The default is 100.
+    seed: number, optional
+        Set the seed for the global `np.random` state.  See
+        `cargoat.core.play()`.
+    dtype : data-type, optional
+        Storage dtype for the simulation arrays.  See `cargoat.core.play()`.
+    sim_class : type, optional
+        Class of the simulation objects to create.  See `cargoat.core.play()`.
+    rng : np.random.Generator or int, optional
+        Random number generator to use instead of the global state.  See
+        `cargoat.core.play()`.
+
+    Raises
+    ------
+    ValueError
+        Fewer than two games, or both `seed` and `rng` were provided.
+    MontyHallError
+        Problem with completing one of the games.
+
+    Returns
+    -------
+    comparison : dict
+        - `results`: list of the results of each game (see
+        `cargoat.sim.MontyHallSim.get_results()`)
+        - `difference`: (games, games) array, where entry (i, j) is the
+        proportion of wins of game i minus that of game j
+        - `std_error`: standard errors of the paired differences
+        - `independent_std_error`: standard errors the differences would
+        have if the games were simulated independently
+        - `shared_steps`: number of actions shared by all games
+
+    Examples
+    --------
+
+    ```python
+    >>> import cargoat as cg
+    >>> base = [cg.InitDoorsRandom(), cg.Pick(), cg.Reveal()]
+    >>> games = [base + [cg.Switch()], base + [cg.ChanceTo(0.9, cg.Switch())]]
+    >>> comparison = cg.compare(games, n=10000)
+    >>> comparison['shared_steps']
+    3
+    >>> bool(comparison['std_error'][1, 0] < comparison['independent_std_error'][1, 0])
+    True
+
+    ```
+
+    '''
+    games = [list(game) for game in games]
+    if len(games) < 2:
+        raise ValueError('Need at least two games to compare.')
+
+    finished = play_many(games, n=n, seed=seed, dtype=dtype,
+                         sim_class=sim_class, rng=rng,
+                         func=lambda sim: (sim.is_win(), sim.get_results()))
+    wins, results = zip(*finished)
+
+    wins = np.array(wins, dtype=float)
+    cov = np.atleast_2d(np.cov(wins))
+    var = np.diag(cov)
+    p = wins.mean(axis=1)
+    paired = var[:, np.newaxis] + var[np.newaxis, :] - 2 * cov
+    independent = var[:, np.newaxis] + var[np.newaxis, :]
+
+    return {'results': list(results),
+            'difference': p[:, np.newaxis] - p[np.newaxis, :],
+            'std_error': np.sqrt(np.maximum(paired, 0) / n),
+            'independent_std_error': np.sqrt(independent / n),
+            'shared_steps': _shared_prefix(games)}
+
+# attributes of the actions which accept arrays with one value per trial
+_PER_TRIAL_PARAMS = {ChanceTo: ('p',),
+                     InitDoorsRandom: ('cars', 'goats'),
+                     IfElse: ('condition',)}
+
+def _check_swept(actions, columns):
+    '''Check that the swept parameters (`columns`) are only passed to
+    actions accepting arrays with one value per trial, searching the
+    actions nested in logical actions.'''
+    for action in actions:
+        if not isinstance(action, MontyHallAction):
+            continue
+        accepted = [name for cls, names in _PER_TRIAL_PARAMS.items()
+                    if isinstance(action, cls) for name in names]
+        for name, value in vars(action).items():
+            if name.startswith('_') or name in accepted:
+                continue
+            if isinstance(value, MontyHallAction):
+                _check_swept([value], columns)
+            elif isinstance(value, (list, tuple)):
+                _check_swept(value, columns)
+            elif (isinstance(value, np.ndarray) and
+                  any(np.shares_memory(value, column) for column in columns.values())):
+                raise ValueError(f'Swept parameter passed as `{name}` of '
+                                 f'{type(action).__name__}, which does not '
+                                 'accept a value per trial.  See `sweep()` '
+                                 'for the supported actions.')
+
+def sweep(game, params, n=100, seed=None, dtype=None, sim_class=MontyHallSim,
+          rng=None):
+    '''
+    Run a game for every combination of parameter values, in a single
+    simulation.
+
+    Rather than one simulation per configuration, the trials of all the
+    configurations are stacked into one simulation, with the parameters
+    passed to the actions as arrays holding the value for each trial.
+    E.g. sweeping the probability of switching over 100 values runs one
+    simulation of `100 * n` trials, with a `cargoat.actions.logical.ChanceTo`
+    whose `p` is an array.  Actions accepting arrays of parameters are
+    `ChanceTo` (`p`) and `cargoat.actions.initialization.InitDoorsRandom`
+    (`cars` and `goats`, padding trials with fewer doors, which needs a
+    `sim_class` supporting them), as well as the `condition` of
+    `cargoat.actions.logical.IfElse` (when not called).
+
+    Parameters
+    ----------
+    game : callable
+        Function creating the game, called with the parameters as keyword
+        arguments (each an array with one value per trial), and returning a
+        list of objects from the `cargoat.actions` subpackage.
+    params : dict
+        Values of each parameter (keyword argument of `game`) to sweep.
+        The game is run for every combination of values.
+    n : int, optional
+        Number of trials to simulate per configuration. The default is 100.
+    seed: number, optional
+        Set the seed for the global `np.random` state.  See
+        `cargoat.core.play()`.
+    dtype : data-type, optional
+        Storage dtype for the simulation arrays.  See `cargoat.core.play()`.
+    sim_class : type, optional
+        Class of the simulation object to create.  See `cargoat.core.play()`.
+    rng : np.random.Generator or int, optional
+        Random number generator to use instead of the global state.  See
+        `cargoat.core.play()`.
+
+    Raises
+    ------
+    ValueError
+        Both `seed` and `rng` were provided, or a parameter was passed to
+        an action (attribute) not accepting arrays of parameters.
+    MontyHallError
+        Problem with completing the game.
+
+    Returns
+    -------
+    table : list of dict
+        One record per configuration, holding the value of each parameter
+        and the results of its trials (see
+        `cargoat.sim.MontyHallSim.get_results()`).  This can be passed to
+        `pandas.DataFrame` to create a table.
+
+    Examples
+    --------
+
+    ```python
+    >>> import cargoat as cg
+    >>> def game(p):
+    ...     return [cg.InitDoorsRandom(), cg.Pick(), cg.Reveal(),
+    ...             cg.ChanceTo(p, cg.Switch())]
+    >>> table = cg.sweep(game, {'p': [0, 0.5, 1]}, n=1000)
+    >>> [row['p'] for row in table]
+    [0.0, 0.5, 1.0]
+
+    ```
+
+    '''
+    names = list(params)
+    grid = list(it.product(*[np.atleast_1d(params[name]).tolist()
+                             for name in names]))
+    columns = {name: np.repeat([values[i] for values in grid], n)
+               for i, name in enumerate(names)}
+
+    actions = game(**columns)
+    _check_swept(actions, columns)
+
+    rng = _get_rng(seed=seed, rng=rng)
+    sim = _run_game(actions, _new_sim(n * len(grid), dtype, sim_class, rng))
+
+    wins = sim.is_win().reshape(len(grid), n).sum(axis=1)
+    spoiled = np.asarray(sim.spoiled, dtype=bool).reshape(len(grid), n).any(axis=1)
+    return [{**dict(zip(names, values)),
+             **_make_results(trials=n, wins=wins[i], spoiled_games=spoiled[i])}
+            for i, values in enumerate(grid)]
@@ -27,7 +27,7 @@ setup(name='cargoat',
       author='Tom Earnest',
       author_email='earnestt1234@gmail.com',
       license='MIT',
-      packages=['cargoat'],
-      install_requires=['numpy>=1.2'],
+      packages=['cargoat', 'cargoat.actions', 'cargoat.backends'],
+      install_requires=['numpy>=1.17'],
       long_description=long_description,
       long_description_content_type='text/markdown')
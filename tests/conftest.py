@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""
+Shared test setup.
+"""
+
+import os
+
+# run with the default dispatch thresholds rather than those saved by
+# `cargoat.arrayops.calibrate()` on this machine (set before importing cargoat)
+os.environ['CARGOAT_NO_CALIBRATION'] = '1'
@@ -6,14 +6,34 @@ Created on Sun Apr 16 22:23:37 2023
 @author: earnestt1234
 """
 
+import json
+import math
+import os
+import subprocess
+import sys
+
 import numpy as np
 import pytest
 
-from cargoat.arrayops import (get_index_success,
+from cargoat import arrayops
+from cargoat.arrayops import (AliasTable,
+                              Workspace,
+                              calibrate,
+                              get_index_success,
+                              load_calibration,
                               n_per_row,
                               one_per_row,
                               one_per_row_weighted)
 
+def check_uniform_subsets(a, n, atol=0.01):
+    '''Check that the rows of the binary array `a` are uniformly
+    distributed over the subsets of `n` columns.'''
+    codes = a.astype(int) @ (2 ** np.arange(a.shape[1]))
+    freq = np.unique(codes, return_counts=True)[1] / len(a)
+    subsets = math.comb(a.shape[1], n)
+    assert len(freq) == subsets
+    assert np.allclose(freq, 1 / subsets, atol=atol)
+
 class TestGetIndexSuccess:
 
     def make_array(self):
@@ -73,6 +93,96 @@ class TestNPerRow:
             a = n_per_row(shape, 2, allowed=allowed, column_threshold=column_threshold, enforce_allowed=False)
             assert np.all(a.sum(axis=1) == 2)
 
+    @pytest.mark.parametrize('dtype', [int, bool, np.uint8])
+    @pytest.mark.parametrize('with_allowed', [True, False])
+    @pytest.mark.parametrize('column_threshold', [1000, 0])
+    def test_dtype(self, dtype, with_allowed, column_threshold):
+        allowed = np.full((3, 3), True) if with_allowed else None
+        a = n_per_row((3, 3), 2, allowed=allowed, dtype=dtype,
+                      column_threshold=column_threshold)
+        assert a.dtype == dtype and np.all(a.sum(axis=1) == 2)
+
+    @pytest.mark.parametrize('with_allowed', [True, False])
+    @pytest.mark.parametrize('column_threshold', [1000, 0])
+    def test_rng(self, with_allowed, column_threshold):
+        allowed = np.full((20, 5), True) if with_allowed else None
+        draw = lambda seed: n_per_row((20, 5), 2, allowed=allowed,
+                                      column_threshold=column_threshold,
+                                      rng=np.random.default_rng(seed))
+        assert np.all(draw(1) == draw(1)) and np.any(draw(1) != draw(2))
+        assert np.all(draw(1).sum(axis=1) == 2)
+
+    @pytest.mark.parametrize('with_allowed', [True, False])
+    @pytest.mark.parametrize('column_threshold', [1000, 0])
+    def test_uniform(self, with_allowed, column_threshold):
+        # every pair of the allowed doors is equally likely
+        allowed = np.full((40000, 6), True)
+        allowed[:, 2] = False
+        a = n_per_row(allowed.shape, 2, allowed=allowed if with_allowed else None,
+                      column_threshold=column_threshold,
+                      rng=np.random.default_rng(0))
+        assert np.all(a.sum(axis=1) == 2)
+        if with_allowed:
+            assert not np.any(a[:, 2])
+            a = a[:, allowed[0]]
+        check_uniform_subsets(a, 2)
+
+    def test_count_kernel_uniform(self):
+        # 10 columns with 2 selections uses the count-based kernel; each
+        # row has its own allowed doors
+        rng = np.random.default_rng(0)
+        allowed = np.zeros((60000, 10), dtype=bool)
+        allowed[:30000, [1, 4, 7, 8]] = True
+        allowed[30000:, [0, 9, 5]] = True
+        a = n_per_row(allowed.shape, 2, allowed=allowed, rng=rng)
+        assert np.all(a.sum(axis=1) == 2) and not np.any(a & ~allowed)
+        check_uniform_subsets(a[:30000][:, [1, 4, 7, 8]], 2)
+        check_uniform_subsets(a[30000:][:, [0, 5, 9]], 2)
+
+    @pytest.mark.parametrize('enforce_allowed', [True, False])
+    def test_count_kernel_no_room(self, enforce_allowed):
+        allowed = np.zeros((5, 10), dtype=bool)
+        allowed[:, 3] = True
+        a = n_per_row((5, 10), 2, allowed=allowed, enforce_allowed=enforce_allowed)
+        assert np.all(a[:, 3] == 1)
+        assert np.all(a.sum(axis=1) == (1 if enforce_allowed else 2))
+
+    def test_complement_uniform(self):
+        # selecting 4 of 5 (allowed) cells leaves out one cell per row
+        rng = np.random.default_rng(0)
+        check_uniform_subsets(n_per_row((50000, 5), 4, rng=rng), 4)
+        allowed = np.ones((50000, 6), dtype=bool)
+        allowed[:, 2] = False
+        a = n_per_row(allowed.shape, 4, allowed=allowed, rng=rng)
+        assert not np.any(a[:, 2])
+        check_uniform_subsets(a[:, [0, 1, 3, 4, 5]], 4)
+
+    def test_complement_ragged(self):
+        allowed = np.zeros((4, 12), dtype=bool)
+        allowed[0, :3] = allowed[1, 7:] = allowed[2, 2:6] = allowed[3, ::3] = True
+        a = n_per_row(allowed.shape, 3, allowed=allowed, rng=np.random.default_rng(0))
+        assert np.all(a.sum(axis=1) == 3) and not np.any(a & ~allowed)
+
+    def test_complement_int_allowed(self):
+        assert np.all(n_per_row((5, 10), 8, allowed=np.ones((5, 10), int)).sum(axis=1) == 8)
+        allowed = np.ones((5, 20), int)
+        allowed[:, 0] = 0
+        a = n_per_row((5, 20), 16, allowed=allowed, rng=np.random.default_rng(0))
+        assert np.all(a.sum(axis=1) == 16) and not np.any(a[:, 0])
+
+    def test_per_row_n(self):
+        n = np.array([0, 1, 2, 3])
+        allowed = np.full((4, 5), True)
+        allowed[:, 3:] = False
+        a = n_per_row((4, 5), n, allowed=allowed, rng=np.random.default_rng(0))
+        assert np.all(a.sum(axis=1) == n) and not np.any(a[:, 3:])
+
+    def test_per_row_n_uniform(self):
+        n = np.repeat([1, 2], 30000)
+        a = n_per_row((60000, 4), n, rng=np.random.default_rng(0))
+        check_uniform_subsets(a[:30000], 1)
+        check_uniform_subsets(a[30000:], 2)
+
 class TestOnePerRow:
 
     @pytest.mark.parametrize('column_threshold', [1000, 0])
@@ -111,6 +221,34 @@ class TestOnePerRow:
             a = one_per_row(shape, allowed=allowed, column_threshold=column_threshold, enforce_allowed=False)
             assert np.all(a.sum(axis=1) == 1)
 
+    @pytest.mark.parametrize('dtype', [int, bool, np.uint8])
+    @pytest.mark.parametrize('with_allowed', [True, False])
+    @pytest.mark.parametrize('column_threshold', [1000, 0])
+    def test_dtype(self, dtype, with_allowed, column_threshold):
+        allowed = np.full((3, 3), True) if with_allowed else None
+        a = one_per_row((3, 3), allowed=allowed, dtype=dtype,
+                        column_threshold=column_threshold)
+        assert a.dtype == dtype and np.all(a.sum(axis=1) == 1)
+
+    @pytest.mark.parametrize('with_allowed', [True, False])
+    @pytest.mark.parametrize('column_threshold', [1000, 0])
+    def test_rng(self, with_allowed, column_threshold):
+        allowed = np.full((20, 5), True) if with_allowed else None
+        draw = lambda seed: one_per_row((20, 5), allowed=allowed,
+                                        column_threshold=column_threshold,
+                                        rng=np.random.default_rng(seed))
+        assert np.all(draw(1) == draw(1)) and np.any(draw(1) != draw(2))
+
+    def test_sparse_mask(self):
+        # one or two allowed doors per row, as when switching
+        allowed = np.zeros((40000, 100), dtype=bool)
+        allowed[:, 17] = True
+        allowed[::2, 60] = True
+        a = one_per_row(allowed.shape, allowed=allowed, rng=np.random.default_rng(0))
+        assert np.all(a.sum(axis=1) == 1) and not np.any(a & ~allowed)
+        assert np.all(a[1::2, 17] == 1)
+        assert a[::2, 17].mean() == pytest.approx(0.5, abs=0.02)
+
 class TestOnePerRowWeighted:
 
     def test_certain_door(self):
@@ -146,8 +284,221 @@ class TestOnePerRowWeighted:
         with pytest.raises(ValueError):
             one_per_row_weighted((3, 3), weights=[0, 0, 0])
 
+    @pytest.mark.parametrize('dtype', [int, bool, np.uint8])
+    def test_dtype(self, dtype):
+        a = one_per_row_weighted((3, 3), weights=[1, 1, 1], dtype=dtype)
+        assert a.dtype == dtype and np.all(a.sum(axis=1) == 1)
+
+    def test_rng(self):
+        draw = lambda seed: one_per_row_weighted((20, 5), weights=[1, 2, 3, 4, 5],
+                                                 rng=np.random.default_rng(seed))
+        assert np.all(draw(1) == draw(1)) and np.any(draw(1) != draw(2))
+
     def test_row_unallowed(self):
         allowed = np.full((3, 3), True)
         allowed[0, :] = False
         with pytest.raises(ValueError):
             one_per_row_weighted((3, 3), weights=[1, 1, 1], allowed=allowed)
+
+    def test_skewed_distribution(self):
+        weights = np.array([0.5, 0.3, 0.2, 0.])
+        a = one_per_row_weighted((40000, 4), weights=weights,
+                                 rng=np.random.default_rng(0))
+        assert np.allclose(a.mean(axis=0), weights, atol=0.01)
+
+    def test_skewed_distribution_allowed(self):
+        # one weight per allowed door
+        weights = np.array([0.5, 0.3, 0.2, 0.])
+        allowed = np.full((40000, 5), True)
+        allowed[:, 1] = False
+        a = one_per_row_weighted(allowed.shape, weights=weights, allowed=allowed,
+                                 rng=np.random.default_rng(0))
+        assert not np.any(a[:, 1])
+        assert np.allclose(a[:, allowed[0]].mean(axis=0), weights, atol=0.01)
+
+    def test_masked_full_weights_distribution(self):
+        # weights for all doors, renormalized over the allowed ones
+        allowed = np.full((40000, 3), True)
+        allowed[::2, 0] = False
+        a = one_per_row_weighted(allowed.shape, weights=[1, 1, 2], allowed=allowed,
+                                 rng=np.random.default_rng(0))
+        assert np.allclose(a[::2].mean(axis=0), [0, 1 / 3, 2 / 3], atol=0.01)
+        assert np.allclose(a[1::2].mean(axis=0), [1 / 4, 1 / 4, 1 / 2], atol=0.01)
+
+    def test_table(self):
+        table = AliasTable([1, 0, 0])
+        a = one_per_row_weighted((3, 3), weights=[1, 0, 0], table=table)
+        assert np.all(a[:, 0] == 1)
+
+class TestAliasTable:
+
+    def test_distribution(self):
+        weights = np.array([1, 2, 3, 4, 0, 10])
+        table = AliasTable(weights)
+        draws = table.draw(100000, rng=np.random.default_rng(0))
+        freq = np.bincount(draws, minlength=len(weights)) / len(draws)
+        assert freq[4] == 0
+        assert np.allclose(freq, weights / weights.sum(), atol=0.01)
+
+    def test_zero_weights(self):
+        with pytest.raises(ValueError):
+            AliasTable([0, 0]).draw(5)
+
+    def test_equal(self):
+        assert AliasTable([1, 2]) == AliasTable([2, 4])
+        assert AliasTable([1, 2]) != AliasTable([2, 1])
+
+class TestCalibration:
+
+    @pytest.fixture(autouse=True)
+    def restore(self, monkeypatch):
+        monkeypatch.setattr(arrayops, 'COLUMN_THRESHOLD', arrayops.COLUMN_THRESHOLD)
+        monkeypatch.setattr(arrayops, 'COUNT_RATIO', arrayops.COUNT_RATIO)
+
+    def test_calibrate(self, tmp_path):
+        path = str(tmp_path / 'cache' / 'dispatch.json')
+        thresholds = calibrate(save=True, path=path, cells=2 ** 12, repeat=1,
+                               rng=np.random.default_rng(0))
+        assert thresholds == {'COLUMN_THRESHOLD': arrayops.COLUMN_THRESHOLD,
+                              'COUNT_RATIO': arrayops.COUNT_RATIO}
+        assert thresholds['COLUMN_THRESHOLD'] >= 100
+        assert load_calibration(path) == thresholds
+
+    def test_no_save(self, tmp_path):
+        path = str(tmp_path / 'dispatch.json')
+        calibrate(path=path, cells=2 ** 10, repeat=1)
+        assert not os.path.exists(path)
+
+    def test_defaults_at_import(self):
+        assert arrayops.COLUMN_THRESHOLD == 1000 and arrayops.COUNT_RATIO == 4
+
+    @pytest.mark.parametrize('threshold, doors', [(100, 150), (5000, 2000)])
+    def test_same_results(self, threshold, doors):
+        # rows without room are handled as with the default threshold
+        allowed = np.ones((3, doors), dtype=bool)
+        allowed[1, 1:] = False
+        arrayops.COLUMN_THRESHOLD = threshold
+        if doors >= 1000:
+            with pytest.raises(ValueError):
+                n_per_row(allowed.shape, 3, allowed=allowed)
+            with pytest.raises(ValueError):
+                one_per_row(allowed.shape, allowed=np.zeros_like(allowed))
+        else:
+            a = n_per_row(allowed.shape, 3, allowed=allowed)
+            assert a.sum(axis=1).tolist() == [3, 1, 3]
+            a = n_per_row(allowed.shape, 3, allowed=allowed, enforce_allowed=False)
+            assert a.sum(axis=1).tolist() == [3, 3, 3]
+            assert one_per_row(allowed.shape, allowed=np.zeros_like(allowed)).sum() == 0
+
+    def test_load(self, tmp_path):
+        path = tmp_path / 'dispatch.json'
+        path.write_text(json.dumps({'COLUMN_THRESHOLD': 300, 'COUNT_RATIO': 2.5,
+                                    'numpy': np.__version__}))
+        assert load_calibration(str(path)) == {'COLUMN_THRESHOLD': 300, 'COUNT_RATIO': 2.5}
+        assert arrayops.COLUMN_THRESHOLD == 300 and arrayops.COUNT_RATIO == 2.5
+
+    @pytest.mark.parametrize('content', ['{"COLUMN_THRESHOLD": 300, "COUNT_RATIO": 2, "numpy": "0.0"}',
+                                         '{"COLUMN_THRESHOLD": 300}',
+                                         'not json',
+                                         None])
+    def test_load_defaults(self, tmp_path, content):
+        path = tmp_path / 'dispatch.json'
+        if content is not None:
+            path.write_text(content)
+        arrayops.COLUMN_THRESHOLD = 300
+        assert load_calibration(str(path)) is None
+        assert arrayops.COLUMN_THRESHOLD == 1000 and arrayops.COUNT_RATIO == 4
+
+    @pytest.mark.parametrize('skip, expected', [('', ['300', '2.5']),
+                                                ('1', ['1000', '4'])])
+    def test_loaded_at_import(self, tmp_path, skip, expected):
+        path = tmp_path / 'dispatch.json'
+        path.write_text(json.dumps({'COLUMN_THRESHOLD': 300, 'COUNT_RATIO': 2.5,
+                                    'numpy': np.__version__}))
+        env = {**os.environ, 'CARGOAT_CALIBRATION_FILE': str(path),
+               'CARGOAT_NO_CALIBRATION': skip}
+        out = subprocess.run([sys.executable, '-c', 'import cargoat.arrayops as a; '
+                              'print(a.COLUMN_THRESHOLD, a.COUNT_RATIO)'],
+                             env=env, capture_output=True, text=True, check=True)
+        assert out.stdout.split() == expected
+
+class TestRandomKeys:
+
+    @pytest.fixture
+    def few_keys(self, monkeypatch):
+        # keys with few values, so that many rows have ties
+        def random_keys(shape, rng=None):
+            return rng.integers(0, 2 ** 8, size=shape, dtype=np.uint32)
+        monkeypatch.setattr(arrayops, 'random_keys', random_keys)
+
+    def test_dtype(self):
+        keys = arrayops.random_keys((3, 4), rng=np.random.default_rng(0))
+        assert keys.dtype == np.uint32 and keys.shape == (3, 4)
+        assert arrayops.random_keys((3, 4)).dtype == np.uint32
+
+    @pytest.mark.parametrize('with_allowed', [True, False])
+    def test_ties_n_per_row(self, few_keys, with_allowed):
+        allowed = np.ones((50000, 6), dtype=bool) if with_allowed else None
+        if with_allowed:
+            allowed[:, 2] = False
+        a = n_per_row((50000, 6), 2, allowed=allowed, rng=np.random.default_rng(0))
+        if with_allowed:
+            assert not np.any(a[:, 2])
+            a = np.delete(a, 2, axis=1)
+        check_uniform_subsets(a, 2)
+
+    def test_ties_per_row_n(self, few_keys):
+        n = np.repeat([1, 2], 30000)
+        a = n_per_row((60000, 5), n, rng=np.random.default_rng(0))
+        assert np.all(a.sum(axis=1) == n)
+        check_uniform_subsets(a[30000:], 2)
+
+class TestWorkspace:
+
+    def test_reuse(self):
+        ws = Workspace()
+        a = ws.get('a', (3, 4), bool)
+        assert ws.get('a', (3, 4), bool) is a
+        assert ws.get('a', (3, 5), bool) is not a
+        assert ws.get('a', (3, 5), int).dtype == int
+        assert ws.nbytes == 3 * 5 * np.dtype(int).itemsize
+        ws.clear()
+        assert ws.nbytes == 0
+
+class TestOut:
+
+    @pytest.mark.parametrize('n', [1, 2, 4])
+    @pytest.mark.parametrize('with_allowed', [True, False])
+    @pytest.mark.parametrize('column_threshold', [1000, 0])
+    def test_n_per_row(self, n, with_allowed, column_threshold):
+        allowed = None
+        if with_allowed:
+            allowed = np.ones((20, 6), dtype=bool)
+            allowed[:, 1] = False
+        expected = n_per_row((20, 6), n, allowed=allowed, rng=np.random.default_rng(0),
+                             column_threshold=column_threshold)
+        out = np.full((20, 6), 7)
+        a = n_per_row((20, 6), n, allowed=allowed, rng=np.random.default_rng(0),
+                      column_threshold=column_threshold, out=out)
+        assert a is out and np.array_equal(a, expected)
+
+    @pytest.mark.parametrize('with_allowed', [True, False])
+    def test_one_per_row(self, with_allowed):
+        allowed = np.eye(5, dtype=bool) if with_allowed else None
+        out = np.ones((5, 5), dtype=bool)
+        a = one_per_row((5, 5), allowed=allowed, out=out)
+        assert a is out and np.all(a.sum(axis=1) == 1)
+        if with_allowed:
+            assert np.array_equal(a, allowed)
+
+    @pytest.mark.parametrize('weights', [[1, 2, 3, 4], [1, 2, 3]])
+    def test_one_per_row_weighted(self, weights):
+        allowed = np.ones((10, 4), dtype=bool)
+        allowed[:, 0] = len(weights) == 4
+        out = np.ones((10, 4), dtype=np.uint8)
+        a = one_per_row_weighted((10, 4), weights, allowed=allowed, out=out)
+        assert a is out and np.all(a.sum(axis=1) == 1)
+
+    def test_wrong_shape(self):
+        with pytest.raises(ValueError):
+            n_per_row((5, 5), 2, out=np.zeros((5, 4)))
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests shared by the simulation backends storing the door arrays of each
+trial (see `cargoat.backends`), checked against the dense simulation.
+"""
+
+import itertools as it
+
+import numpy as np
+import pytest
+
+import cargoat as cg
+from cargoat.backends import (FusedMontyHallSim, MemmapMontyHallSim,
+                              PackedMontyHallSim)
+from cargoat.errors import BadPick, BadReveal
+
+main_arrays = ['cars', 'revealed', 'picked']
+
+BACKENDS = [PackedMontyHallSim, FusedMontyHallSim, MemmapMontyHallSim]
+
+# backends placing the cars themselves, so that only fixed placements match
+# the dense simulation
+NATIVE_INIT = (MemmapMontyHallSim,)
+
+# fixed car placements, so that the random draws match the dense simulation
+games = {
+    'classic': [cg.InitDoorsFixed([0, 1, 0]),
+                cg.Pick(),
+                cg.Reveal(),
+                cg.Switch()],
+    'many_doors': [cg.InitDoorsFixed([1] * 2 + [0] * 18),
+                   cg.Pick(),
+                   cg.Reveal(doors=10),
+                   cg.ChanceTo(0.5, cg.Switch()),
+                   cg.PlaceCar(exclude_revealed=False)],
+    'remodel': [cg.InitDoorsFixed([0, 1, 0, 0, 0, 0, 0, 0, 1]),
+                cg.Pick([0, 1]),
+                cg.AddDoors([0]),
+                cg.RemoveDoors([1, 2]),
+                cg.RearrangeDoors([7, 6, 5, 4, 3, 2, 1, 0]),
+                cg.Reveal(allow_spoiled=True, exclude_cars=False),
+                cg.CheckSpoiled(behavior='spoil')],
+    'logical': [cg.InitDoorsFixed([0, 0, 1, 0]),
+                cg.IfElse(lambda s: s.idx % 2 == 0, cg.Pick(), cg.Pick([0])),
+                cg.TryExcept(cg.Reveal(2), cg.Reveal()),
+                cg.Close(),
+                cg.Unpick(),
+                cg.Pick([1, 2, 3], weighted=True)],
+    }
+
+# random car placements, for the backends placing the cars as the dense
+# simulation does
+random_games = {
+    'classic_random': [cg.InitDoorsRandom(cars=1, goats=2),
+                       cg.Pick(),
+                       cg.Reveal(),
+                       cg.Switch()],
+    'many_doors_random': [cg.InitDoorsRandom(cars=2, goats=18),
+                          cg.Pick(),
+                          cg.Reveal(doors=10),
+                          cg.ChanceTo(0.5, cg.Switch())],
+    }
+
+def make_sim(sim_class, n=10, doors=10):
+    rng = np.random.default_rng(0)
+    arrays = {a: rng.integers(0, 2, (n, doors)) for a in main_arrays}
+    return sim_class.from_arrays(**arrays)
+
+@pytest.fixture(params=BACKENDS, ids=lambda cls: cls.__name__)
+def sim_class(request):
+    return request.param
+
+class TestStorage:
+
+    def test_empty(self, sim_class):
+        sim = sim_class(10)
+        assert sim.empty and sim.copy().empty
+        sim.init_doors(3)
+        assert not sim.empty
+        sim.make_empty()
+        assert sim.empty
+
+    def test_inplace_apply_func(self, sim_class):
+        sim = sim_class(3)
+        sim.init_doors(3)
+        sim.apply_func(lambda x: np.place(x, x == 0, 1), inplace=True)
+        assert all(np.all(getattr(sim, a) == 1) for a in main_arrays)
+
+    def test_select_rows(self, sim_class):
+        sim = make_sim(sim_class)
+        x = np.arange(10) % 3 == 0
+        new = sim.select(x=x)
+        assert isinstance(new, sim_class)
+        assert np.all(new.cars == sim.cars[x]) and new.n == x.sum()
+
+    def test_select_doors(self, sim_class):
+        sim = make_sim(sim_class)
+        new = sim.select(x=[0, 1], y=[2, 3])
+        assert np.all(new.picked == sim.picked[np.ix_([0, 1], [2, 3])])
+
+    def test_copy_independent(self, sim_class):
+        sim = make_sim(sim_class)
+        new = sim.copy()
+        new.picked = np.zeros(sim.shape)
+        assert new != sim
+
+    def test_combine(self, sim_class):
+        sim = make_sim(sim_class)
+        a, b = sim.select(x=slice(0, 4)), sim.select(x=slice(4, None))
+        combined = cg.combine_sims([a, b], index=[0] * 4 + [1] * 6)
+        assert isinstance(combined, sim_class)
+        assert combined == sim
+
+class TestStatus:
+
+    def test_query_doors_or_all_combos(self, sim_class):
+        sim = make_sim(sim_class)
+        dense = cg.MontyHallSim.from_arrays(cars=np.asarray(sim.cars),
+                                            picked=np.asarray(sim.picked),
+                                            revealed=np.asarray(sim.revealed))
+        keys = ['cars', 'picked', 'revealed',
+                'not_cars', 'not_picked', 'not_revealed']
+        for flags in it.product([False, True], repeat=len(keys)):
+            kwargs = dict(zip(keys, flags))
+            assert np.all(sim.query_doors_or(**kwargs) ==
+                          dense.query_doors_or(**kwargs))
+            out = np.ones(sim.shape, dtype=bool)
+            assert sim.query_doors_or(**kwargs, out=out) is out
+            assert np.all(out == dense.query_doors_or(**kwargs))
+
+    @pytest.mark.parametrize('target', main_arrays)
+    def test_count_totals(self, sim_class, target):
+        sim = make_sim(sim_class)
+        assert np.all(sim.count_totals(target) == np.asarray(getattr(sim, target)).sum(axis=1))
+
+    def test_is_win(self, sim_class):
+        sim = make_sim(sim_class)
+        expected = np.any(np.asarray(sim.cars) & np.asarray(sim.picked), axis=1)
+        assert np.all(sim.is_win() == expected)
+
+    def test_spoiling_pick(self, sim_class):
+        sim = sim_class(3)
+        sim.init_doors(3)
+        sim.revealed = np.eye(3)
+        with pytest.raises(BadPick):
+            sim._set_array('picked', np.eye(3))
+
+    def test_spoiling_reveal(self, sim_class):
+        sim = sim_class(3)
+        sim.init_doors(3)
+        sim.cars = np.eye(3)
+        sim._set_array('revealed', np.eye(3), allow_spoiled=True)
+        assert np.all(sim.spoiled)
+        with pytest.raises(BadReveal):
+            sim._set_array('revealed', np.eye(3))
+
+class TestGames:
+
+    @pytest.mark.parametrize('name', [*games, *random_games])
+    def test_matches_dense(self, sim_class, name):
+        if name in random_games and sim_class in NATIVE_INIT:
+            pytest.skip(f'{sim_class.__name__} places the cars itself')
+        game = {**games, **random_games}[name]
+        dense = cg.play(game, n=200, seed=7, dtype=bool)
+        sim = cg.play(game, n=200, seed=7, sim_class=sim_class)
+        assert isinstance(sim, sim_class)
+        assert sim == dense
+        assert sim.get_results() == dense.get_results()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the functions for running games.
+"""
+
+import numpy as np
+import pytest
+
+import cargoat as cg
+from cargoat.errors import MontyHallError
+
+game = [cg.InitDoorsRandom(), cg.Pick(), cg.Reveal(), cg.Switch()]
+
+class TestPlay:
+
+    def test_returns_sim(self):
+        sim = cg.play(game, n=10)
+        assert isinstance(sim, cg.MontyHallSim) and sim.n == 10
+
+    def test_seed(self):
+        assert cg.play(game, n=50, seed=3) == cg.play(game, n=50, seed=3)
+
+    def test_seed_zero(self):
+        assert cg.play(game, n=50, seed=0) == cg.play(game, n=50, seed=0)
+
+    def test_error_step(self):
+        with pytest.raises(MontyHallError, match='step 1'):
+            cg.play([cg.InitDoorsRandom(), cg.Reveal(3)], n=10)
+
+class TestChunkedPlay:
+
+    @pytest.mark.parametrize('chunk_size', [1, 7, 100])
+    def test_chunk_sizes(self, chunk_size):
+        chunks = list(cg.iter_play(game, n=100, chunk_size=chunk_size))
+        assert [sim.n for sim in chunks[:-1]] == [chunk_size] * (len(chunks) - 1)
+        assert sum(sim.n for sim in chunks) == 100
+
+    def test_single_chunk_matches_play(self):
+        results = cg.play(game, n=100, seed=5, chunk_size=100)
+        assert results == cg.play(game, n=100, seed=5).get_results()
+
+    def test_results_match_chunks(self):
+        sims = list(cg.iter_play(game, n=100, chunk_size=30, seed=5))
+        results = cg.play(game, n=100, seed=5, chunk_size=30)
+        assert results == cg.combine_sims(sims).get_results()
+        assert results['trials'] == 100
+
+    def test_odds(self):
+        results = cg.play(game, n=30000, seed=0, chunk_size=1000)
+        assert results['percent_wins'] == pytest.approx(200 / 3, abs=1.5)
+
+    def test_bad_chunk_size(self):
+        with pytest.raises(ValueError):
+            list(cg.iter_play(game, n=10, chunk_size=0))
+
+    @pytest.mark.filterwarnings("ignore:invalid value")
+    def test_no_trials(self):
+        assert [sim.n for sim in cg.iter_play(game, n=0, chunk_size=10)] == [0]
+        results = cg.play(game, n=0, chunk_size=10)
+        assert results['trials'] == 0 and results['wins'] == 0
+
+class TestCombineResults:
+
+    def test_spoiled(self):
+        a = cg.play(game, n=10).get_results()
+        b = cg.play(game + [cg.MarkSpoiled()], n=10).get_results()
+        assert not cg.combine_results([a, a])['spoiled_games']
+        assert cg.combine_results([a, b])['spoiled_games']
+
+    def test_percent(self):
+        a = cg.play(game, n=10).get_results()
+        combined = cg.combine_results([a, a, a])
+        assert combined['trials'] == 30 and combined['wins'] == 3 * a['wins']
+        assert np.isclose(combined['percent_wins'], a['percent_wins'])
+
+    def test_no_results(self):
+        with pytest.raises(ValueError):
+            cg.combine_results([])
+
+class TestProcesses:
+
+    def test_merged_sim(self):
+        sim = cg.play(game, n=101, workers=2)
+        assert isinstance(sim, cg.MontyHallSim) and sim.n == 101
+        assert np.all(sim.count_totals('picked') == 1)
+
+    def test_reproducible(self):
+        a = cg.play(game, n=100, seed=4, workers=2)
+        b = cg.play(game, n=100, seed=4, workers=2)
+        c = cg.play(game, n=100, seed=5, workers=2)
+        assert a == b and a != c
+
+    def test_results(self):
+        results = cg.play(game, n=1000, seed=4, workers=3, chunk_size=100)
+        assert results['trials'] == 1000
+
+    def test_more_workers_than_trials(self):
+        sim = cg.play(game, n=2, workers=3)
+        assert sim.n == 2
+
+    def test_error(self):
+        with pytest.raises(MontyHallError):
+            cg.play([cg.InitDoorsRandom(), cg.Reveal(3)], n=10, workers=2)
+
+    @pytest.mark.filterwarnings("ignore:invalid value")
+    @pytest.mark.parametrize('parallel', ['processes', 'threads'])
+    def test_no_trials(self, parallel):
+        assert cg.play(game, n=0, workers=2, parallel=parallel).n == 0
+        results = cg.play(game, n=0, workers=2, chunk_size=10, parallel=parallel)
+        assert results['trials'] == 0
+
+class TestThreads:
+
+    def test_matches_processes(self):
+        a = cg.play(game, n=100, seed=4, workers=2, parallel='threads')
+        b = cg.play(game, n=100, seed=4, workers=2)
+        assert a == b
+
+    def test_unpicklable_game(self):
+        ifelse = [cg.InitDoorsRandom(),
+                  cg.IfElse(lambda s: s.idx % 2 == 0, cg.Pick(), cg.Pick([0]))]
+        sim = cg.play(ifelse, n=100, workers=2, parallel='threads')
+        assert np.all(sim.picked[1::2, 0] == 1)
+
+    def test_results(self):
+        results = cg.play(game, n=1000, workers=3, chunk_size=100,
+                          parallel='threads')
+        assert results['trials'] == 1000
+
+    def test_bad_parallel(self):
+        with pytest.raises(ValueError):
+            cg.play(game, n=10, workers=2, parallel='fibers')
+
+class TestGenerator:
+
+    @pytest.mark.parametrize('bit_generator', [np.random.PCG64, np.random.Philox])
+    def test_reproducible(self, bit_generator):
+        make = lambda seed: np.random.Generator(bit_generator(seed))
+        a = cg.play(game, n=100, rng=make(1))
+        assert a == cg.play(game, n=100, rng=make(1))
+        assert a != cg.play(game, n=100, rng=make(2))
+
+    def test_int_seed(self):
+        assert cg.play(game, n=100, rng=0) == cg.play(game, n=100, rng=0)
+
+    def test_global_state_untouched(self):
+        np.random.seed(1)
+        expected = np.random.rand()
+        np.random.seed(1)
+        cg.play(game + [cg.ChanceTo(0.5, cg.Stay())], n=100, rng=3)
+        assert np.random.rand() == expected
+
+    def test_sim_rng(self):
+        rng = np.random.default_rng(0)
+        assert cg.play(game, n=10, rng=rng).rng is rng
+
+    def test_chunks(self):
+        a = cg.play(game, n=100, chunk_size=30, rng=2)
+        sims = list(cg.iter_play(game, n=100, chunk_size=30, rng=2))
+        assert a == cg.combine_sims(sims).get_results()
+
+    def test_workers(self):
+        a = cg.play(game, n=100, workers=2, parallel='threads', rng=2)
+        assert a == cg.play(game, n=100, workers=2, parallel='threads', rng=2)
+
+    def test_seed_and_rng(self):
+        with pytest.raises(ValueError):
+            cg.play(game, n=10, seed=1, rng=1)
+
+class TestPlayUntil:
+
+    def test_converges(self):
+        results = cg.play_until(game, ci_width=0.02, chunk_size=500, rng=0)
+        low, high = results['interval']
+        assert results['converged'] and high - low <= 0.02
+        assert low <= results['wins'] / results['trials'] <= high
+        assert results['trials'] % 500 == 0 and results['trials'] < 10**7
+
+    def test_stops_early(self):
+        a = cg.play_until(game, ci_width=0.05, chunk_size=100, rng=0)
+        b = cg.play_until(game, ci_width=0.02, chunk_size=100, rng=0)
+        assert a['trials'] < b['trials']
+
+    def test_max_n(self):
+        results = cg.play_until(game, ci_width=1e-6, max_n=1000, chunk_size=300)
+        assert results['trials'] == 1000 and not results['converged']
+
+    def test_clopper_pearson(self):
+        wilson = cg.play_until(game, ci_width=0.02, chunk_size=100, rng=0)
+        exact = cg.play_until(game, ci_width=0.02, chunk_size=100, rng=0,
+                              method='clopper-pearson')
+        assert exact['converged'] and exact['trials'] >= wilson['trials']
+
+    def test_seed(self):
+        a = cg.play_until(game, ci_width=0.05, chunk_size=100, seed=3)
+        assert a == cg.play_until(game, ci_width=0.05, chunk_size=100, seed=3)
+
+    def test_bad_arguments(self):
+        with pytest.raises(ValueError):
+            cg.play_until(game, method='bayes')
+        with pytest.raises(ValueError):
+            cg.play_until(game, confidence=95)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the count-compressed simulation.
+"""
+
+import numpy as np
+import pytest
+
+import cargoat as cg
+from cargoat.counts import _play_states
+from cargoat.errors import MontyHallError, UnsupportedActionError
+
+game = [cg.InitDoorsRandom(), cg.Pick(), cg.Reveal(), cg.Switch()]
+
+class TestStates:
+
+    def test_counts_sum_to_n(self):
+        sim, counts = _play_states(game, 1000, rng=np.random.default_rng(0))
+        assert counts.sum() == 1000 and np.all(counts > 0)
+        assert sim.n == len(counts)
+
+    def test_states_distinct(self):
+        sim, _ = _play_states(game, 1000, rng=np.random.default_rng(0))
+        key = np.column_stack([sim.cars, sim.picked, sim.revealed])
+        assert len(np.unique(key, axis=0)) == sim.n <= 12
+
+    def test_valid_states(self):
+        many = [cg.InitDoorsRandom(cars=2, goats=6), cg.Pick(2), cg.Reveal(3)]
+        sim, _ = _play_states(many, 500, rng=np.random.default_rng(0))
+        assert np.all(sim.count_totals('cars') == 2)
+        assert np.all(sim.count_totals('revealed') == 3)
+        assert not np.any(sim.query_doors_or(cars=True, picked=True) & sim.revealed)
+
+class TestPlayCounts:
+
+    def test_odds(self):
+        results = cg.play_counts(game, n=10**9, rng=0)
+        assert results['trials'] == 10**9
+        assert results['percent_wins'] == pytest.approx(200 / 3, abs=0.01)
+
+    def test_chance(self):
+        results = cg.play_counts(game + [cg.ChanceTo(0.5, cg.Switch())],
+                                 n=10**8, rng=1)
+        assert results['percent_wins'] == pytest.approx(50, abs=0.05)
+
+    def test_ifelse(self):
+        condition = lambda s: s.picked[:, 0] == 1
+        ifelse = [cg.InitDoorsRandom(),
+                  cg.Pick(),
+                  cg.Reveal(),
+                  cg.IfElse(condition, cg.Stay(), cg.Switch())]
+        expected = cg.solve(ifelse)['percent_wins']
+        results = cg.play_counts(ifelse, n=10**8, rng=2)
+        assert results['percent_wins'] == pytest.approx(expected, abs=0.05)
+
+    def test_spoiled(self):
+        spoiling = [cg.InitDoorsRandom(),
+                    cg.Pick(),
+                    cg.Reveal(exclude_cars=False, allow_spoiled=True)]
+        results = cg.play_counts(spoiling, n=10**6, rng=0)
+        assert results['spoiled_games']
+        assert results['percent_spoiled'] == pytest.approx(100 / 3, abs=0.5)
+
+    def test_small_n(self):
+        results = cg.play_counts(game + [cg.ChanceTo(0.5, cg.Switch())], n=1, rng=0)
+        assert results['trials'] == 1 and results['wins'] in (0, 1)
+
+    def test_reproducible(self):
+        a = cg.play_counts(game, n=10**6, rng=np.random.default_rng(3))
+        assert a == cg.play_counts(game, n=10**6, rng=np.random.default_rng(3))
+        assert cg.play_counts(game, n=10**6, seed=3) == cg.play_counts(game, n=10**6, seed=3)
+
+    def test_error_step(self):
+        with pytest.raises(MontyHallError, match='step 1'):
+            cg.play_counts([cg.InitDoorsRandom(), cg.Reveal(3)], n=10)
+
+    def test_unsupported(self):
+        ifelse = cg.IfElse(np.ones(10, dtype=bool), cg.Stay(), cg.Switch(),
+                          condition_call=False)
+        with pytest.raises(UnsupportedActionError):
+            cg.play_counts(game + [ifelse], n=10)
+
+    def test_per_trial_parameters(self):
+        with pytest.raises(UnsupportedActionError):
+            cg.play_counts([cg.InitDoorsRandom(goats=[2, 3])], n=10)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the exact solver.
+"""
+
+import numpy as np
+import pytest
+
+import cargoat as cg
+from cargoat.actions.base import MontyHallAction
+from cargoat.errors import MontyHallError, UnsupportedActionError
+
+classic = [cg.InitDoorsRandom(), cg.Pick(), cg.Reveal()]
+
+def first_door_car(sim):
+    return sim.cars[:, 0] == 1
+
+class TestKnownValues:
+
+    @pytest.mark.parametrize('last, p', [(cg.Switch(), 2 / 3),
+                                         (cg.Stay(), 1 / 3),
+                                         (cg.ChanceTo(0.5, cg.Switch()), 1 / 2)])
+    def test_classic(self, last, p):
+        results = cg.solve(classic + [last])
+        assert results['wins'] == pytest.approx(p)
+        assert results['losses'] == pytest.approx(1 - p)
+        assert results['percent_wins'] == pytest.approx(100 * p)
+        assert not results['spoiled_games']
+
+    def test_many_doors(self):
+        game = [cg.InitDoorsRandom(cars=1, goats=9),
+                cg.Pick(),
+                cg.Reveal(doors=8),
+                cg.Switch()]
+        assert cg.solve(game)['wins'] == pytest.approx(0.9)
+
+    def test_numpy_integer_doors(self):
+        game = [cg.InitDoorsRandom(cars=1, goats=9),
+                cg.Pick(),
+                cg.Reveal(doors=np.int64(8)),
+                cg.Switch()]
+        assert cg.solve(game)['wins'] == pytest.approx(0.9)
+
+    def test_weighted_pick(self):
+        game = [cg.InitDoorsRandom(cars=1, goats=4),
+                cg.Pick([1, 2, 3, 4, 5], weighted=True),
+                cg.Reveal(doors=2),
+                cg.Switch()]
+        assert cg.solve(game)['wins'] == pytest.approx(0.4)
+
+    def test_spoiled(self):
+        game = [cg.InitDoorsRandom(),
+                cg.Pick(),
+                cg.Reveal(exclude_cars=False, allow_spoiled=True)]
+        results = cg.solve(game)
+        assert results['spoiled_games']
+        assert results['percent_spoiled'] == pytest.approx(100 / 3)
+
+    def test_fixed_doors(self):
+        game = [cg.InitDoorsFixed([1, 0, 0]), cg.Pick([0])]
+        assert cg.solve(game)['wins'] == 1
+
+    def test_scaled(self):
+        results = cg.solve(classic + [cg.Switch()], n=300)
+        assert results['trials'] == 300
+        assert results['wins'] == pytest.approx(200)
+
+class TestMatchesSimulation:
+
+    @pytest.mark.parametrize('game', [
+        classic + [cg.IfElse(first_door_car, cg.Switch(), cg.Stay())],
+        [cg.InitDoorsRandom(cars=2, goats=3), cg.Pick(2), cg.Reveal(1),
+         cg.Unpick(), cg.Switch()],
+        [cg.InitDoorsRandom(), cg.AddDoors([0]), cg.Pick(), cg.PlaceCar(exclude_revealed=False),
+         cg.RearrangeDoors([3, 2, 1, 0]), cg.Reveal()],
+        ])
+    def test_game(self, game):
+        exact = cg.solve(game)['percent_wins']
+        simulated = cg.play(game, n=20000, rng=0).get_results()['percent_wins']
+        assert exact == pytest.approx(simulated, abs=1.5)
+
+class TestErrors:
+
+    def test_unsupported_action(self):
+        class Custom(MontyHallAction):
+            def __call__(self, sim):
+                return sim
+        with pytest.raises(UnsupportedActionError):
+            cg.solve(classic + [Custom()])
+
+    def test_precomputed_condition(self):
+        ifelse = cg.IfElse([True], cg.Switch(), cg.Stay(), condition_call=False)
+        with pytest.raises(UnsupportedActionError):
+            cg.solve(classic + [ifelse])
+
+    @pytest.mark.parametrize('action', [cg.InitDoorsRandom(goats=[2, 3]),
+                                        cg.ChanceTo([0.2, 0.4], cg.Switch())])
+    def test_per_trial_parameters(self, action):
+        with pytest.raises(UnsupportedActionError):
+            cg.solve(classic + [action])
+
+    def test_game_error(self):
+        with pytest.raises(MontyHallError, match='step 2'):
+            cg.solve(classic[:2] + [cg.Reveal(2)])
+
+    def test_try_except(self):
+        game = classic[:2] + [cg.TryExcept(cg.Reveal(2), cg.Reveal()), cg.Switch()]
+        assert cg.solve(game)['wins'] == pytest.approx(2 / 3)
+
+class TestShowResults:
+
+    def test_prints(self, capsys):
+        cg.solve(classic + [cg.Switch(), cg.ShowResults()])
+        assert 'percent_wins' in capsys.readouterr().out
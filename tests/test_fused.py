@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the fused bitflag simulation backend.  Tests shared by the
+backends are in test_backends.py.
+"""
+
+import numpy as np
+import pytest
+
+from cargoat.backends import FusedMontyHallSim
+
+class TestStorage:
+
+    @pytest.mark.parametrize('doors', [1, 3, 8, 9, 17])
+    def test_roundtrip(self, doors):
+        a = np.random.randint(0, 2, (5, doors))
+        sim = FusedMontyHallSim.from_arrays(picked=a)
+        assert np.all(sim.picked == a) and sim.shape == (5, doors)
+
+    def test_flags(self):
+        sim = FusedMontyHallSim.from_arrays(cars=np.array([[1, 0, 0]]),
+                                            picked=np.array([[1, 1, 0]]),
+                                            revealed=np.array([[0, 0, 1]]))
+        assert np.all(sim.state == [[3, 2, 4]])
+
+    def test_fused_size(self):
+        sim = FusedMontyHallSim(1000)
+        sim.init_doors(16)
+        assert sim.nbytes == 1000 * 16
@@ -126,3 +126,52 @@ class TestPickCounts:
             print()
         assert True
 
+
+class TestSelectionDistribution:
+
+    def subset_counts(self, a):
+        codes = a.astype(int) @ (2 ** np.arange(a.shape[1]))
+        return np.unique(codes, return_counts=True)[1]
+
+    def test_place_cars(self):
+        sim = cg.MontyHallSim(50000)
+        sim.rng = np.random.default_rng(0)
+        cg.InitDoorsRandom(cars=2, goats=3)(sim)
+        counts = self.subset_counts(sim.cars)
+        assert len(counts) == 10
+        assert np.allclose(counts / sim.n, 1 / 10, atol=0.01)
+
+    def test_reveal(self):
+        sim = cg.MontyHallSim.from_arrays(cars=np.tile([1, 0, 0, 0, 0, 0], (60000, 1)),
+                                          picked=np.tile([0, 1, 0, 0, 0, 0], (60000, 1)))
+        sim.rng = np.random.default_rng(0)
+        cg.Reveal(2)(sim)
+        assert not np.any(sim.revealed[:, :2])
+        counts = self.subset_counts(sim.revealed[:, 2:])
+        assert len(counts) == 6
+        assert np.allclose(counts / sim.n, 1 / 6, atol=0.01)
+
+    def test_reveal_all_but_one(self):
+        sim = cg.MontyHallSim(40000)
+        sim.rng = np.random.default_rng(0)
+        cg.InitDoorsRandom(cars=1, goats=9)(sim)
+        cg.Pick()(sim)
+        cg.Reveal(8)(sim)
+        closed = ~sim.revealed.astype(bool) & ~sim.picked.astype(bool)
+        assert np.all(closed.sum(axis=1) == 1)
+        assert not np.any(sim.revealed.astype(bool) & sim.cars.astype(bool))
+        # the closed door hides the car unless the pick did
+        assert np.isclose(np.mean(np.any(closed & sim.cars.astype(bool), axis=1)), 0.9,
+                          atol=0.01)
+
+    def test_weighted_pick(self):
+        sim = cg.MontyHallSim(50000)
+        sim.rng = np.random.default_rng(0)
+        sim.init_doors(4)
+        cg.Pick([0.1, 0.2, 0.3, 0.4], weighted=True)(sim)
+        assert np.allclose(sim.picked.mean(axis=0), [0.1, 0.2, 0.3, 0.4], atol=0.01)
+
+    def test_weighted_table_equal(self):
+        a = GA('picked', doors=[1, 2, 3], weighted=True)
+        b = GA('picked', doors=[1, 2, 3], weighted=True)
+        assert a._table == b._table
@@ -10,6 +10,7 @@ import pytest
 
 import cargoat as cg
 from cargoat import InitDoorsEmpty, InitDoorsFixed, InitDoorsRandom
+from cargoat.errors import UnsupportedActionError
 
 all_basic_inits = [InitDoorsEmpty(3),
                    InitDoorsFixed((1, 0, 0)),
@@ -106,3 +107,30 @@ class TestInitDoorsRandom:
         assert np.all(sim.cars.sum(axis=1) == 0)
 
 
+    def test_per_trial_counts(self):
+        sim = self.make_sim()
+        cars, goats = np.array([1, 2, 0, 1, 3]), np.array([2, 1, 4, 3, 0])
+        InitDoorsRandom(cars=cars, goats=goats)(sim)
+        assert sim.shape == (5, 4)
+        assert np.all(sim.cars.sum(axis=1) == cars)
+
+    def test_per_trial_padding(self):
+        sim = self.make_sim()
+        goats = np.array([2, 3, 4, 2, 3])
+        InitDoorsRandom(goats=goats)(sim)
+        padding = np.arange(5) >= (goats + 1)[:, np.newaxis]
+        assert np.all(sim.valid == ~padding)
+        assert not np.any(sim.revealed) and not np.any(sim.cars.astype(bool) & padding)
+
+    @pytest.mark.parametrize('sim_class', [cg.FusedMontyHallSim, cg.PackedMontyHallSim])
+    def test_per_trial_padding_backend(self, sim_class):
+        sim = sim_class(5)
+        with pytest.raises(UnsupportedActionError):
+            InitDoorsRandom(goats=np.array([2, 3, 4, 2, 3]))(sim)
+
+    def test_per_trial_same_doors_backend(self):
+        sim = cg.FusedMontyHallSim(5)
+        cars = np.array([1, 2, 0, 1, 3])
+        InitDoorsRandom(cars=cars, goats=3 - cars)(sim)
+        assert sim.shape == (5, 3) and sim.valid is None
+        assert np.all(sim.cars.sum(axis=1) == cars) and not np.any(sim.revealed)
@@ -36,6 +36,13 @@ class TestChanceTo:
         action(sim)
         assert np.all(0 < sim.picked.astype(bool).sum(axis=1).sum() < 1000)
 
+    def test_per_trial(self):
+        p = np.repeat([0., 1.], 500)
+        sim = self.make_sim()
+        cg.ChanceTo(p, cg.Pick())(sim)
+        picked = sim.picked.astype(bool).sum(axis=1)
+        assert np.all(picked[:500] == 0) and np.all(picked[500:] == 1)
+
 class TestIfElse:
 
     def make_sim(self):
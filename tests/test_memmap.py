@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the memory-mapped simulation backend.  Tests shared by the
+backends are in test_backends.py.
+"""
+
+from functools import partial
+
+import numpy as np
+import pytest
+
+import cargoat as cg
+from cargoat.backends import MemmapMontyHallSim
+from cargoat.errors import BadPick, MontyHallError
+
+main_arrays = ['cars', 'revealed', 'picked']
+
+def make_sim(n=10, doors=10, **kwargs):
+    rng = np.random.default_rng(0)
+    arrays = {a: rng.integers(0, 2, (n, doors)).astype(bool) for a in main_arrays}
+    sim = MemmapMontyHallSim(n, **kwargs)
+    for a in main_arrays:
+        setattr(sim, a, arrays[a])
+    sim.spoiled = np.zeros(n, dtype=bool)
+    return sim
+
+class TestStorage:
+
+    def test_mapped(self):
+        sim = make_sim()
+        assert all(isinstance(getattr(sim, a), np.memmap) for a in main_arrays)
+        assert isinstance(sim.spoiled, np.memmap)
+
+    def test_scratch_dir(self, tmp_path):
+        game = [cg.InitDoorsRandom(), cg.Pick()]
+        sim_class = partial(MemmapMontyHallSim, scratch_dir=tmp_path)
+        sim = cg.play(game, n=20, sim_class=sim_class)
+        assert sim.scratch_dir == tmp_path
+        assert np.all(sim.count_totals('picked') == 1)
+
+    def test_from_arrays_no_copy(self, tmp_path):
+        picked = np.memmap(tmp_path / 'picked.dat', dtype=bool, mode='w+', shape=(4, 3))
+        picked[:, 0] = True
+        sim = MemmapMontyHallSim.from_arrays(picked=picked, copy=False)
+        assert sim.picked is picked
+
+        # actions copy the array before writing
+        cg.Switch()(sim)
+        assert np.all(sim.picked[:, 0] == 0)
+        assert np.all(picked[:, 0] == 1)
+
+    def test_from_arrays_copy(self, tmp_path):
+        picked = np.memmap(tmp_path / 'picked.dat', dtype=bool, mode='w+', shape=(4, 3))
+        sim = MemmapMontyHallSim.from_arrays(picked=picked)
+        sim.picked[:, 0] = True
+        assert not np.any(picked)
+
+    def test_from_arrays_valid(self):
+        picked = np.zeros((4, 3), dtype=bool)
+        sim = MemmapMontyHallSim.from_arrays(picked=picked, valid=np.ones((4, 3), dtype=bool))
+        assert sim.valid is None
+        valid = np.ones((4, 3), dtype=bool)
+        valid[0, 2] = False
+        with pytest.raises(NotImplementedError):
+            MemmapMontyHallSim.from_arrays(picked=picked, valid=valid)
+
+    def test_select(self):
+        sim = make_sim(block_size=3)
+        x = np.arange(10) % 3 == 0
+        new = sim.select(x=x, y=[2, 3])
+        assert isinstance(new, MemmapMontyHallSim) and new.block_size == 3
+        assert np.all(new.picked == sim.picked[np.ix_(x, [2, 3])])
+
+    def test_combine(self):
+        sim = make_sim(block_size=3)
+        a, b = sim.select(x=slice(0, 4)), sim.select(x=slice(4, None))
+        combined = cg.combine_sims([a, b])
+        assert isinstance(combined, MemmapMontyHallSim)
+        assert combined == sim
+
+    def test_inplace_apply_func(self):
+        sim = make_sim(block_size=3)
+        sim.apply_func(lambda x: np.place(x, x == 0, 1), inplace=True)
+        assert all(np.all(getattr(sim, a) == 1) for a in main_arrays)
+
+class TestBlocks:
+
+    @pytest.mark.parametrize('block_size', [1, 7, 100])
+    def test_valid_game(self, block_size):
+        game = [cg.InitDoorsRandom(cars=1, goats=4),
+                cg.Pick(),
+                cg.Reveal(doors=2)]
+        sim_class = partial(MemmapMontyHallSim, block_size=block_size)
+        sim = cg.play(game, n=50, sim_class=sim_class)
+        assert np.all(sim.count_totals('cars') == 1)
+        assert np.all(sim.count_totals('revealed') == 2)
+        assert not np.any(sim.query_doors_or(cars=True, picked=True) & sim.revealed)
+
+    def test_classic_odds(self):
+        game = [cg.InitDoorsRandom(), cg.Pick(), cg.Reveal(), cg.Switch()]
+        sim_class = partial(MemmapMontyHallSim, block_size=1000)
+        results = cg.play(game, n=30000, seed=0, sim_class=sim_class).get_results()
+        assert results['percent_wins'] == pytest.approx(200 / 3, abs=1.5)
+
+    def test_error_in_block(self):
+        sim = MemmapMontyHallSim(10, block_size=4)
+        sim.init_doors(3)
+        revealed = np.zeros((10, 3), dtype=bool)
+        revealed[5, :] = True
+        sim.revealed = revealed
+        with pytest.raises(BadPick, match='relative to trial 4'):
+            cg.Pick()(sim)
+
+    def test_results_condition(self):
+        sim = make_sim(n=50, block_size=7)
+        condition = np.arange(50) % 4 == 0
+        dense = cg.MontyHallSim.from_arrays(cars=np.array(sim.cars),
+                                            picked=np.array(sim.picked),
+                                            revealed=np.array(sim.revealed))
+        assert sim.get_results() == dense.get_results()
+        assert (sim.get_results(condition=condition) ==
+                dense.get_results(condition=condition))
+
+class TestGames:
+
+    def test_error_step(self):
+        game = [cg.InitDoorsRandom(), cg.Reveal(3)]
+        with pytest.raises(MontyHallError):
+            cg.play(game, n=10, sim_class=MemmapMontyHallSim)
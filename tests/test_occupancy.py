@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the occupancy-count simulation backend.
+"""
+
+import numpy as np
+import pytest
+
+import cargoat as cg
+from cargoat.actions.generic import GenericAction
+from cargoat.backends import OccupancyMontyHallSim
+from cargoat.backends.occupancy import _hypergeometric
+from cargoat.errors import BadPick, BadReveal, MontyHallError
+
+classic = [cg.InitDoorsRandom(), cg.Pick(), cg.Reveal(), cg.Switch()]
+
+def play(game, n=1000, rng=0):
+    return cg.play(game, n=n, sim_class=OccupancyMontyHallSim, rng=rng)
+
+def consistent(sim):
+    '''Check that the counts match the expanded arrays.'''
+    counts = {a: sim.count_totals(a) for a in ['cars', 'picked', 'revealed']}
+    wins = sim.is_win()
+    assert sim.occupancy is not None
+    sim._expand()
+    assert sim.occupancy is None
+    return (all(np.array_equal(counts[a], sim.count_totals(a)) for a in counts)
+            and np.array_equal(wins, sim.is_win()))
+
+class TestHypergeometric:
+
+    @pytest.mark.parametrize('rng', [None, np.random.default_rng(0)])
+    def test_totals(self, rng):
+        counts = np.array([[0, 5, 1, 2], [3, 0, 1, 2], [0, 0, 0, 2]])
+        drawn = _hypergeometric(counts, 2, rng=rng)
+        assert np.all(drawn.sum(axis=0) == 2)
+        assert np.all((drawn >= 0) & (drawn <= counts))
+
+    def test_distribution(self):
+        counts = np.tile([[1], [2], [3]], 60000)
+        drawn = _hypergeometric(counts, 2, rng=np.random.default_rng(1))
+        # each door is drawn with probability 2 / 6
+        assert drawn.mean(axis=1) == pytest.approx([1 / 3, 2 / 3, 1], abs=0.01)
+
+class TestCounts:
+
+    def test_init(self):
+        sim = play([cg.InitDoorsRandom(cars=2, goats=5)])
+        assert sim.shape == (1000, 7)
+        assert np.all(sim.occupancy[:, 0] == 5) and np.all(sim.occupancy[:, 1] == 2)
+
+    def test_classic_counts(self):
+        sim = play(classic)
+        assert np.all(sim.occupancy.sum(axis=1) == 3)
+        assert np.all(sim.count_totals('picked') == 1)
+        assert np.all(sim.count_totals('revealed') == 1)
+        assert consistent(sim)
+
+    def test_classic_odds(self):
+        results = play(classic, n=60000).get_results()
+        assert results['percent_wins'] == pytest.approx(200 / 3, abs=1)
+
+    def test_million_doors(self):
+        doors = 10 ** 6
+        game = [cg.InitDoorsRandom(cars=1, goats=doors - 1),
+                cg.Pick(),
+                cg.Reveal(doors=doors - 2),
+                cg.Switch()]
+        sim = play(game)
+        assert sim.shape == (1000, doors) and sim.nbytes == 1000 * 8 * 4
+        assert sim.get_results()['percent_wins'] >= 99.8
+
+    def test_logical(self):
+        game = [cg.InitDoorsRandom(cars=1, goats=5),
+                cg.Pick(),
+                cg.ChanceTo(0.5, cg.Reveal(doors=2)),
+                cg.TryExcept(cg.Reveal(doors=4), cg.Reveal())]
+        sim = play(game)
+        assert sim.occupancy is not None
+        assert set(sim.count_totals('revealed')) == {1, 3}
+
+    def test_rearrange(self):
+        sim = play(classic + [cg.RearrangeDoors([2, 0, 1])])
+        assert sim.occupancy is not None
+
+    def test_spoiled(self):
+        game = [cg.InitDoorsRandom(),
+                cg.Pick(),
+                cg.Reveal(exclude_cars=False, allow_spoiled=True)]
+        sim = play(game, n=30000)
+        assert sim.spoiled.mean() == pytest.approx(1 / 3, abs=0.02)
+
+    def test_remove(self):
+        game = classic + [GenericAction('picked', doors=1, behavior='remove',
+                                        exclude_unpicked=True)]
+        sim = play(game)
+        assert np.all(sim.count_totals('picked') == 0)
+
+    def test_errors(self):
+        with pytest.raises(MontyHallError):
+            play([cg.InitDoorsRandom(), cg.Reveal(3)])
+        sim = play([cg.InitDoorsRandom(), cg.Pick()])
+        with pytest.raises(BadReveal):
+            GenericAction('revealed', doors=3)(sim)
+        with pytest.raises(BadPick, match='Redundant'):
+            GenericAction('picked', doors=3, behavior='add',
+                          allow_redundant=False)(sim.copy())
+
+    def test_select_combine(self):
+        sim = play(classic)
+        x = np.arange(sim.n) % 3 == 0
+        a, b = sim.select(x=x), sim.select(x=~x)
+        assert a.occupancy is not None and a.n == x.sum()
+        combined = cg.combine_sims([a, b], index=(~x).astype(int))
+        assert combined == sim
+
+    def test_copy_independent(self):
+        sim = play(classic)
+        new = sim.copy()
+        cg.Switch()(new)
+        assert new != sim
+
+class TestFallback:
+
+    def test_indexed_pick(self):
+        game = [cg.InitDoorsRandom(cars=1, goats=3), cg.Pick([0])]
+        sim = play(game, n=40000)
+        assert sim.occupancy is None
+        assert sim.get_results()['percent_wins'] == pytest.approx(25, abs=1)
+
+    @pytest.mark.parametrize('game', [
+        [cg.InitDoorsFixed([0, 1, 0]), cg.Pick(), cg.Reveal(), cg.Switch()],
+        [cg.InitDoorsRandom(), cg.Pick([1, 1, 1], weighted=True), cg.Reveal()],
+        classic + [cg.AddDoors([0]), cg.Pick()],
+        classic + [cg.IfElse(lambda s: s.picked[:, 0] == 1, cg.Stay(), cg.Pass())],
+        ])
+    def test_valid_games(self, game):
+        sim = play(game)
+        assert isinstance(sim, OccupancyMontyHallSim) and sim.occupancy is None
+        assert np.all(sim.count_totals('picked') == 1)
+        assert not np.any(sim.revealed & (sim.cars | sim.picked))
+
+    def test_expand_after_counts(self):
+        sim = play(classic)
+        arrays = sim.cars, sim.picked, sim.revealed
+        assert all(a.dtype == bool and a.shape == (1000, 3) for a in arrays)
+        assert np.all(arrays[0].sum(axis=1) == 1)
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the bit-packed simulation backend.  Tests shared by the backends
+are in test_backends.py.
+"""
+
+import numpy as np
+import pytest
+
+from cargoat.backends import PackedMontyHallSim
+
+class TestStorage:
+
+    @pytest.mark.parametrize('doors', [1, 3, 8, 9, 17])
+    def test_roundtrip(self, doors):
+        a = np.random.randint(0, 2, (5, doors))
+        sim = PackedMontyHallSim.from_arrays(picked=a)
+        assert np.all(sim.picked == a) and sim.shape == (5, doors)
+
+    def test_packed_size(self):
+        sim = PackedMontyHallSim(1000)
+        sim.init_doors(16)
+        assert sim.nbytes == 3 * 1000 * 2
@@ -7,6 +7,7 @@ Created on Sun Dec 18 23:00:59 2022
 """
 
 import itertools as it
+import pickle
 
 import numpy as np
 import pytest
@@ -371,6 +372,12 @@ class TestSimStatusFuncs:
 
         assert(all(validations))
 
+    def test_query_doors_or_out(self):
+        sim = self.generate_revealable_sim()
+        out = np.ones(sim.shape, dtype=bool)
+        assert sim.query_doors_or(cars=True, out=out) is out
+        assert np.all(out == sim.cars.astype(bool))
+
     def test_revealable_doors(self):
         sim = self.generate_revealable_sim()
         revealable = sim.revealable_doors()
@@ -378,6 +385,100 @@ class TestSimStatusFuncs:
         answer[:, 3] = 1
         assert (revealable == answer).all()
 
+class TestInPlace:
+
+    @pytest.mark.parametrize('behavior', ['overwrite', 'add', 'remove'])
+    def test_update_in_place(self, behavior):
+        sim = cg.MontyHallSim(5)
+        sim.init_doors(3)
+        sim.picked[:, 0] = 1
+        picked = sim.picked
+        new = np.zeros(sim.shape, dtype=int)
+        new[:, [0, 1]] = 1
+        sim._set_array('picked', new, behavior=behavior, allow_spoiled=True)
+        assert sim.picked is picked
+        expected = {'overwrite': [1, 1, 0], 'add': [1, 1, 0], 'remove': [0, 0, 0]}
+        assert np.all(sim.picked == expected[behavior])
+
+    def test_read_only_target(self):
+        cars = np.zeros((5, 3), dtype=int)
+        cars[:, 0] = 1
+        cars.flags.writeable = False
+        sim = cg.MontyHallSim.from_arrays(cars=cars, copy=False)
+        cg.PlaceCar([1])(sim)
+        cg.PlaceCar([2])(sim)
+        assert np.all(cars == [1, 0, 0])
+        assert np.all(sim.cars == [1, 1, 1])
+
+    def test_from_arrays_no_copy(self):
+        cars = np.zeros((5, 3), dtype=int)
+        cars[:, 0] = 1
+        sim = cg.MontyHallSim.from_arrays(cars=cars, copy=False)
+        cg.PlaceCar([1])(sim)
+        cg.PlaceCar([2])(sim)
+        assert np.all(cars == [1, 0, 0])
+        assert np.all(sim.cars == [1, 1, 1])
+
+    def test_select_no_copy(self):
+        sim = cg.MontyHallSim(5)
+        sim.init_doors(3)
+        part = sim.select(x=slice(0, 3), copy=False)
+        cg.Pick([0])(part)
+        cg.Pick([1])(sim)
+        assert np.all(sim.picked == [0, 1, 0])
+        assert np.all(part.picked == [1, 0, 0])
+
+    def test_assigned_array(self):
+        sim = cg.MontyHallSim(5)
+        sim.init_doors(3)
+        picked = np.zeros((5, 3), dtype=int)
+        sim.picked = picked
+        cg.Pick([0])(sim)
+        cg.Pick([1])(sim)
+        assert not np.any(picked)
+        # replaced once, then updated in place
+        picked = sim.picked
+        cg.Pick([2])(sim)
+        assert sim.picked is picked
+
+    def test_pickled(self):
+        sim = cg.MontyHallSim(10)
+        for action in [cg.InitDoorsRandom(), cg.Pick(), cg.Reveal()]:
+            action(sim)
+        sim = pickle.loads(pickle.dumps(sim))
+        picked = sim.picked
+        cg.Switch()(sim)
+        assert sim.picked is picked
+
+    def test_workspace_not_shared(self):
+        # the selection array is reused, but not held by the simulation
+        sim = cg.MontyHallSim(1000)
+        sim.rng = np.random.default_rng(0)
+        cg.InitDoorsRandom(cars=1, goats=4)(sim)
+        cg.Pick()(sim)
+        picked = sim.picked.copy()
+        cg.Reveal()(sim)
+        assert np.all(sim.picked == picked)
+        assert not np.any(sim.revealed & (sim.picked | sim.cars))
+        assert not np.shares_memory(sim.revealed, sim.workspace.get('selection', sim.shape, sim.dtype))
+
+    def test_workspace_released(self):
+        game = [cg.InitDoorsRandom(goats=5), cg.Pick(), cg.Reveal(), cg.Switch()]
+        sim = cg.play(game, n=100)
+        assert sim.workspace.nbytes == 0
+        cg.Reveal()(sim)
+        assert sim.workspace.nbytes > 0
+        assert pickle.loads(pickle.dumps(sim)).workspace.nbytes == 0
+        assert sim.workspace.nbytes > 0
+
+    def test_fixed_buffers(self):
+        sim = cg.MontyHallSim(1000)
+        game = [cg.InitDoorsRandom(cars=1, goats=9), cg.Pick(), cg.Reveal(3),
+                cg.Switch(), cg.Reveal(2), cg.Switch()]
+        for action in game:
+            action(sim)
+        assert sorted(sim.workspace.buffers) == ['allowed', 'selection']
+
 class TestSimSetArray:
 
     def generate_blank_sim(self):
@@ -564,6 +665,13 @@ class TestCopy:
                     np.all(b.revealed == 1),
                     np.all(b.spoiled == True)])
 
+    def test_copy_rng(self):
+        a = cg.MontyHallSim(3)
+        a.rng = np.random.default_rng(0)
+        assert a.copy().rng is a.rng
+        a.init_doors(3)
+        assert a.copy().rng is a.rng and a.select(x=[0]).rng is a.rng
+
 class TestGetResults:
 
     def make_sim(self):
@@ -689,3 +797,176 @@ class TestCombineSims:
         b = cg.MontyHallSim(3)
         c = cg.combine_sims([a, b])
         assert a == c
+
+    @pytest.mark.parametrize("dtype", [bool, np.uint8])
+    def test_compact_dtype(self, dtype):
+        a, b = self.make_sims()
+        a = cg.MontyHallSim.from_arrays(picked=a.picked, dtype=dtype)
+        b = cg.MontyHallSim.from_arrays(picked=b.picked, dtype=dtype)
+        c = cg.combine_sims([a, b])
+        assert c.dtype == dtype and c.picked.dtype == dtype
+
+class TestSimDtype:
+
+    compact = [bool, np.uint8]
+
+    @pytest.mark.parametrize("dtype", compact)
+    def test_init_doors(self, dtype):
+        sim = cg.MontyHallSim(5, dtype=dtype)
+        sim.init_doors(3)
+        assert all(getattr(sim, a).dtype == dtype for a in main_arrays)
+
+    @pytest.mark.parametrize("dtype", compact)
+    def test_from_arrays_cast(self, dtype):
+        a = np.ones((3, 3), dtype=int)
+        sim = cg.MontyHallSim.from_arrays(picked=a, dtype=dtype)
+        assert all(getattr(sim, a).dtype == dtype for a in main_arrays)
+
+    def test_from_arrays_infer(self):
+        a = np.ones((3, 3), dtype=bool)
+        sim = cg.MontyHallSim.from_arrays(picked=a, copy=False)
+        assert sim.dtype == bool and sim.picked is a
+
+    @pytest.mark.parametrize("dtype", compact)
+    def test_copy_keeps_dtype(self, dtype):
+        sim = cg.MontyHallSim(5, dtype=dtype)
+        assert sim.copy().dtype == dtype
+        sim.init_doors(3)
+        assert sim.copy().cars.dtype == dtype
+
+    @pytest.mark.parametrize("dtype", compact)
+    def test_game_keeps_dtype(self, dtype):
+        game = [cg.InitDoorsRandom(cars=2, goats=3),
+                cg.Pick(),
+                cg.Reveal(),
+                cg.ChanceTo(0.5, cg.Switch()),
+                cg.Unpick(),
+                cg.Pick([1, 1, 1, 1, 1], weighted=True),
+                cg.Close(),
+                cg.PlaceCar(exclude_revealed=False),
+                cg.AddDoors([0]),
+                cg.RemoveDoors([1]),
+                cg.RearrangeDoors([3, 2, 1, 0, 4])]
+        sim = cg.play(game, n=100, dtype=dtype)
+        assert all(getattr(sim, a).dtype == dtype for a in main_arrays)
+
+    @pytest.mark.parametrize("dtype", compact)
+    def test_same_results_as_int(self, dtype):
+        game = [cg.InitDoorsRandom(cars=1, goats=2),
+                cg.Pick(),
+                cg.Reveal(),
+                cg.Switch()]
+        a = cg.play(game, n=100, seed=42)
+        b = cg.play(game, n=100, seed=42, dtype=dtype)
+        assert a == b and a.get_results() == b.get_results()
+
+    @pytest.mark.parametrize("dtype", compact)
+    @pytest.mark.parametrize("behavior", ['add', 'remove'])
+    def test_redundant_not_allowed(self, dtype, behavior):
+        sim = cg.MontyHallSim(5, dtype=dtype)
+        sim.init_doors(3)
+        if behavior == 'add':
+            sim.picked[:, 0] = 1
+        new = np.zeros(sim.shape, dtype=dtype)
+        new[:, 0] = 1
+        with pytest.raises(BadPick):
+            sim._set_array('picked', new, behavior=behavior,
+                           allow_redundant=False)
+
+    @pytest.mark.parametrize("dtype", compact)
+    def test_remove(self, dtype):
+        sim = cg.MontyHallSim(5, dtype=dtype)
+        sim.init_doors(3)
+        sim.picked[:, :2] = 1
+        new = np.zeros(sim.shape, dtype=dtype)
+        new[:, [0, 2]] = 1
+        sim._set_array('picked', new, behavior='remove')
+        assert np.all(sim.picked == [0, 1, 0]) and sim.picked.dtype == dtype
+
+class TestRaggedDoors:
+
+    doors = np.array([3, 4, 6, 3])
+
+    def make_sim(self):
+        sim = cg.MontyHallSim(4)
+        sim.init_doors(self.doors)
+        return sim
+
+    def test_init(self):
+        sim = self.make_sim()
+        assert sim.shape == (4, 6)
+        assert np.all(sim.valid.sum(axis=1) == self.doors)
+
+    def test_uniform_is_none(self):
+        sim = cg.MontyHallSim(4)
+        sim.init_doors([3, 3, 3, 3])
+        assert sim.valid is None and sim.shape == (4, 3)
+
+    def test_query_excludes_padding(self):
+        sim = self.make_sim()
+        closed = sim.query_doors_or(not_revealed=True)
+        assert np.all(closed == sim.valid)
+        assert np.all(sim.pickable_doors() == sim.valid)
+
+    def test_actions_respect_mask(self):
+        game = [cg.InitDoorsEmpty(self.doors), cg.PlaceCar(), cg.Pick(),
+                cg.Reveal(), cg.Switch()]
+        sim = cg.play(game, n=4)
+        for a in (sim.cars, sim.picked, sim.revealed):
+            assert not np.any(np.logical_and(a, ~sim.valid))
+        assert np.all(sim.count_totals('revealed') == 1)
+        assert not np.any(sim.spoiled)
+
+    def test_padding_spoils(self):
+        sim = self.make_sim()
+        new = np.zeros(sim.shape, dtype=int)
+        new[:, 4] = 1
+        with pytest.raises(BadPick):
+            sim._set_array('picked', new)
+        sim._set_array('picked', new, allow_spoiled=True)
+        assert np.all(sim.spoiled == ~sim.valid[:, 4])
+
+    def test_padding_not_win(self):
+        sim = self.make_sim()
+        sim.cars[:, 5] = 1
+        sim.picked[:, 5] = 1
+        assert np.all(sim.is_win() == sim.valid[:, 5])
+        assert sim.get_results()['wins'] == 1
+
+    def test_select_copy_equal(self):
+        sim = self.make_sim()
+        assert np.all(sim.select(x=[1, 2]).valid == sim.valid[[1, 2]])
+        assert np.all(sim.select(y=[0, 5]).valid == sim.valid[:, [0, 5]])
+        copy = sim.copy()
+        assert copy == sim and copy.valid is not sim.valid
+        other = cg.MontyHallSim(4)
+        other.init_doors(6)
+        assert other != sim
+
+    def test_combine(self):
+        sim = self.make_sim()
+        other = cg.MontyHallSim(2)
+        other.init_doors(6)
+        combined = cg.combine_sims([sim, other])
+        assert np.all(combined.valid[:4] == sim.valid)
+        assert np.all(combined.valid[4:])
+
+    def test_logical(self):
+        p = np.array([0., 1., 0., 1.])
+        game = [cg.InitDoorsRandom(goats=self.doors - 1), cg.Pick(),
+                cg.Reveal(), cg.ChanceTo(p, cg.Switch())]
+        sim = cg.play(game, n=4)
+        assert np.all(sim.valid.sum(axis=1) == self.doors)
+
+    def test_remodeling(self):
+        sim = self.make_sim()
+        cg.AddDoors([0])(sim)
+        assert np.all(sim.valid.sum(axis=1) == self.doors + 1)
+        cg.RemoveDoors([6])(sim)
+        assert sim.shape == (4, 6) and sim.valid[2].all()
+
+    def test_unsupported_backend(self):
+        sim = cg.FusedMontyHallSim(4)
+        sim.init_doors(6)
+        with pytest.raises(NotImplementedError):
+            sim.valid = self.make_sim().valid
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the sparse (door index) simulation backend.
+"""
+
+import numpy as np
+import pytest
+
+import cargoat as cg
+from cargoat.backends import SparseMontyHallSim
+from cargoat.errors import BadPick, BadReveal
+
+main_arrays = ['cars', 'revealed', 'picked']
+
+def make_arrays(n=20, doors=7):
+    rng = np.random.default_rng(0)
+    return {a: rng.integers(0, 2, (n, doors)) for a in main_arrays}
+
+def make_sims():
+    arrays = make_arrays()
+    return (cg.MontyHallSim.from_arrays(**arrays),
+            SparseMontyHallSim.from_arrays(**arrays))
+
+class TestStorage:
+
+    @pytest.mark.parametrize('doors', [1, 3, 200, 1000])
+    def test_roundtrip(self, doors):
+        a = np.random.randint(0, 2, (5, doors))
+        sim = SparseMontyHallSim.from_arrays(picked=a)
+        assert np.all(sim.picked == a) and sim.shape == (5, doors)
+
+    def test_size_scales_with_marks(self):
+        sim = cg.play([cg.InitDoorsRandom(cars=1, goats=9999), cg.Pick()],
+                      n=100, sim_class=SparseMontyHallSim)
+        assert sim.shape == (100, 10000) and sim.nbytes == 100 * 2 * 2
+
+    def test_combine(self):
+        dense, sparse = make_sims()
+        index = np.arange(40) % 2
+        a = cg.combine_sims([dense, dense.select(x=slice(None, None, -1))], index=index)
+        b = cg.combine_sims([sparse, sparse.select(x=slice(None, None, -1))], index=index)
+        assert isinstance(b, SparseMontyHallSim) and a == b
+
+class TestRemodeling:
+
+    @pytest.mark.parametrize('positions', [0, -1, [0, 3, 7], [2, 2]])
+    def test_insert(self, positions):
+        dense, sparse = make_sims()
+        cg.AddDoors(positions)(dense)
+        cg.AddDoors(positions)(sparse)
+        assert dense == sparse
+
+    @pytest.mark.parametrize('positions', [0, -1, [0, 6], [1, 2, 3]])
+    def test_delete(self, positions):
+        dense, sparse = make_sims()
+        cg.RemoveDoors(positions)(dense)
+        cg.RemoveDoors(positions)(sparse)
+        assert dense == sparse
+
+    def test_rearrange(self):
+        dense, sparse = make_sims()
+        cg.RearrangeDoors([6, 0, 5, 1, 4, 2, 3])(dense)
+        cg.RearrangeDoors([6, 0, 5, 1, 4, 2, 3])(sparse)
+        assert dense == sparse
+
+    @pytest.mark.parametrize('action', [cg.AddDoors([0, 10]), cg.RemoveDoors([0, 10])])
+    def test_out_of_bounds(self, action):
+        _, sparse = make_sims()
+        with pytest.raises(IndexError):
+            action(sparse)
+
+class TestSelection:
+
+    def make_sim(self, n=3000):
+        sim = SparseMontyHallSim(n)
+        cg.InitDoorsFixed([0, 0, 0, 1, 0])(sim)
+        cg.Pick([1])(sim)
+        return sim
+
+    def test_uniform_excluded(self):
+        sim = self.make_sim()
+        cg.Reveal()(sim)
+        counts = sim.revealed.sum(axis=0)
+        assert counts[1] == counts[3] == 0
+        assert np.all(np.abs(counts[[0, 2, 4]] / sim.n - 1/3) < 0.05)
+
+    def test_uniform_required(self):
+        sim = self.make_sim()
+        cg.Pick([0, 2, 4], add=True)(sim)
+        cg.Unpick(2)(sim)
+        assert np.all(sim.count_totals('picked') == 2)
+        counts = sim.picked.sum(axis=0)
+        assert np.all(np.abs(counts[[0, 1, 2, 4]] / sim.n - 1/2) < 0.05)
+
+    def test_multiple_distinct(self):
+        sim = self.make_sim()
+        cg.Reveal(doors=3)(sim)
+        assert np.all(sim.revealed == [1, 0, 1, 0, 1])
+
+    def test_not_enough_doors(self):
+        sim = self.make_sim()
+        with pytest.raises(BadReveal):
+            cg.Reveal(doors=4)(sim)
+
+    def test_spoiled_pick(self):
+        sim = self.make_sim()
+        cg.Reveal([0])(sim)
+        with pytest.raises(BadPick):
+            cg.Pick([0])(sim)
+        cg.Pick([0], allow_spoiled=True)(sim)
+        assert np.all(sim.spoiled)
+
+    def test_redundant(self):
+        sim = self.make_sim()
+        with pytest.raises(BadPick):
+            cg.Pick([1], add=True, exclude_current=False,
+                    allow_redundant=False)(sim)
+
+    def test_dense_fallback(self):
+        sim = self.make_sim()
+        cg.Pick([1, 1, 1, 1], weighted=True)(sim)
+        assert np.all(sim.count_totals('picked') == 1) and sim.picked[:, 1].sum() == 0
+
+class TestGames:
+
+    def test_classic(self):
+        game = [cg.InitDoorsRandom(cars=1, goats=2),
+                cg.Pick(),
+                cg.Reveal(),
+                cg.Switch()]
+        sim = cg.play(game, n=10000, sim_class=SparseMontyHallSim)
+        assert abs(sim.get_results()['percent_wins'] - 200/3) < 2
+
+    def test_many_doors(self):
+        game = [cg.InitDoorsRandom(cars=1, goats=9999),
+                cg.Pick(),
+                cg.ChanceTo(0.5, cg.Reveal(doors=3)),
+                cg.AddDoors([0]),
+                cg.RemoveDoors([0])]
+        sim = cg.play(game, n=1000, sim_class=SparseMontyHallSim)
+        assert sim.shape == (1000, 10000)
+        assert np.all(sim.count_totals('cars') == 1)
+        assert set(np.unique(sim.count_totals('revealed'))) == {0, 3}
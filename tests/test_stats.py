@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the confidence intervals.
+"""
+
+import pytest
+
+from cargoat.stats import clopper_pearson_interval, wilson_interval
+
+class TestIntervals:
+
+    def test_clopper_pearson_known(self):
+        low, high = clopper_pearson_interval(3, 10)
+        assert low == pytest.approx(0.06674, abs=1e-5)
+        assert high == pytest.approx(0.65245, abs=1e-5)
+
+    def test_wilson_known(self):
+        low, high = wilson_interval(3, 10)
+        assert low == pytest.approx(0.10779, abs=1e-5)
+        assert high == pytest.approx(0.60322, abs=1e-5)
+
+    @pytest.mark.parametrize('interval', [wilson_interval, clopper_pearson_interval])
+    def test_extremes(self, interval):
+        assert interval(0, 20)[0] == 0
+        assert interval(20, 20)[1] == 1
+
+    def test_clopper_pearson_wider(self):
+        for wins in [1, 10, 50, 90, 99]:
+            w_low, w_high = wilson_interval(wins, 100)
+            cp_low, cp_high = clopper_pearson_interval(wins, 100)
+            assert cp_high - cp_low > w_high - w_low
+
+    def test_large_trials(self):
+        low, high = clopper_pearson_interval(2 * 10**8, 3 * 10**8)
+        w_low, w_high = wilson_interval(2 * 10**8, 3 * 10**8)
+        assert low == pytest.approx(w_low, abs=1e-7)
+        assert high == pytest.approx(w_high, abs=1e-7)
+
+    def test_confidence(self):
+        assert (wilson_interval(30, 100, confidence=0.99)[1] >
+                wilson_interval(30, 100, confidence=0.9)[1])
+
+    def test_bad_arguments(self):
+        with pytest.raises(ValueError):
+            wilson_interval(0, 0)
+        with pytest.raises(ValueError):
+            wilson_interval(11, 10)
+        with pytest.raises(ValueError):
+            clopper_pearson_interval(3, 10, confidence=1)
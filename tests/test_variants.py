@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for running variants of games together.
+"""
+
+import numpy as np
+import pytest
+
+import cargoat as cg
+from cargoat.errors import MontyHallError
+from cargoat.variants import _build_trie, _same_value, _shared_prefix
+
+base = [cg.InitDoorsRandom(), cg.Pick(), cg.Reveal()]
+
+class TestSharedPrefix:
+
+    def test_same_objects(self):
+        assert _shared_prefix([base + [cg.Stay()], base + [cg.Switch()]]) == 3
+
+    def test_equal_actions(self):
+        a = [cg.InitDoorsFixed([0, 1, 0]), cg.Pick(), cg.ChanceTo(0.5, cg.Switch())]
+        b = [cg.InitDoorsFixed([0, 1, 0]), cg.Pick(), cg.ChanceTo(0.4, cg.Switch())]
+        assert _shared_prefix([a, b]) == 2
+
+    def test_different_start(self):
+        assert _shared_prefix([base, [cg.InitDoorsRandom(goats=3)] + base[1:]]) == 0
+
+    def test_same_value(self):
+        assert _same_value(cg.Reveal(2), cg.Reveal(2))
+        assert not _same_value(cg.Reveal(2), cg.Reveal(1))
+        assert not _same_value(cg.IfElse(lambda s: s.idx > 0, cg.Pick(), cg.Stay()),
+                               cg.IfElse(lambda s: s.idx > 0, cg.Pick(), cg.Stay()))
+
+class CountCalls:
+    '''Action counting how many trials it is applied to.'''
+
+    def __init__(self):
+        self.trials = 0
+
+    def __call__(self, sim):
+        self.trials += sim.n
+        return sim
+
+class TestPlayMany:
+
+    def test_trie(self):
+        games = [base + [cg.Stay()], base + [cg.Switch()], base, base[:1]]
+        root = _build_trie(games)
+        assert len(root.children) == 1
+        node = root.children[0]
+        assert node.ends == [3]
+        node = node.children[0].children[0]
+        assert node.ends == [2] and len(node.children) == 2
+
+    def test_prefix_run_once(self):
+        counter = CountCalls()
+        prefix = [cg.InitDoorsRandom(), counter, cg.Pick(), cg.Reveal()]
+        games = [prefix + [cg.ChanceTo(p, cg.Switch())] for p in (0, 0.5, 1)]
+        sims = cg.play_many(games, n=100)
+        assert counter.trials == 100
+        assert [sim.n for sim in sims] == [100] * 3
+
+    def test_branch_copies(self):
+        games = [base + [cg.Stay()], base + [cg.Switch()], base]
+        stay, switch, unfinished = cg.play_many(games, n=300, rng=0)
+        assert stay is not switch and unfinished is not switch
+        assert np.all(stay.picked == unfinished.picked)
+        assert np.all(stay.is_win() != switch.is_win())
+
+    def test_matches_play(self):
+        game = base + [cg.Switch()]
+        sim, = cg.play_many([game], n=100, seed=5)
+        assert sim == cg.play(game, n=100, seed=5)
+
+    def test_func(self):
+        games = [base + [cg.Stay()], base + [cg.Switch()]]
+        results = cg.play_many(games, n=100, func=lambda sim: sim.get_results())
+        assert results[0]['wins'] + results[1]['wins'] == 100
+
+    def test_duplicate_games(self):
+        games = [base + [cg.Switch()]] * 3
+        sims = cg.play_many(games, n=50, sim_class=cg.SparseMontyHallSim)
+        assert sims[0] == sims[1] == sims[2] and sims[0] is not sims[1]
+
+    def test_no_shared_prefix(self):
+        games = [base, [cg.InitDoorsRandom(goats=4), cg.Pick()]]
+        sims = cg.play_many(games, n=20, sim_class=cg.FusedMontyHallSim)
+        assert [sim.shape for sim in sims] == [(20, 3), (20, 5)]
+        assert all(isinstance(sim, cg.FusedMontyHallSim) for sim in sims)
+
+    def test_error_step(self):
+        with pytest.raises(MontyHallError, match='step 4'):
+            cg.play_many([base + [cg.Stay()], base + [cg.Stay(), cg.Reveal(2)]], n=10)
+
+class TestCompare:
+
+    def test_results(self):
+        comparison = cg.compare([base + [cg.Stay()], base + [cg.Switch()]],
+                                n=1000, rng=0)
+        stay, switch = comparison['results']
+        assert stay['trials'] == switch['trials'] == 1000
+        # with 3 doors, switching wins exactly when staying loses
+        assert stay['wins'] == switch['losses']
+        assert comparison['difference'][1, 0] == pytest.approx(
+            (switch['wins'] - stay['wins']) / 1000)
+        assert comparison['shared_steps'] == 3
+
+    def test_paired_variance(self):
+        games = [base + [cg.Switch()], base + [cg.ChanceTo(0.9, cg.Switch())]]
+        comparison = cg.compare(games, n=20000, rng=1)
+        paired = comparison['std_error'][0, 1]
+        assert paired < comparison['independent_std_error'][0, 1] / 1.5
+        assert comparison['difference'][0, 1] == pytest.approx(0.1 / 3, abs=4 * paired)
+
+    def test_common_suffix_draws(self):
+        games = [base + [cg.ChanceTo(0.5, cg.Switch())]] * 2
+        comparison = cg.compare(games, n=500)
+        assert comparison['results'][0] == comparison['results'][1]
+        assert comparison['std_error'][0, 1] == 0
+
+    @pytest.mark.parametrize('kwargs', [{'seed': 2}, {'rng': 2}])
+    def test_reproducible(self, kwargs):
+        games = [base + [cg.Stay()], base + [cg.ChanceTo(0.3, cg.Switch())]]
+        a = cg.compare(games, n=200, **kwargs)
+        b = cg.compare(games, n=200, **kwargs)
+        assert a['results'] == b['results']
+
+    def test_sim_class(self):
+        games = [base + [cg.Stay()], base + [cg.Switch()]]
+        comparison = cg.compare(games, n=200, sim_class=cg.FusedMontyHallSim)
+        assert sum(r['wins'] for r in comparison['results']) == 200
+
+    def test_no_shared_prefix(self):
+        games = [base + [cg.Switch()], [cg.InitDoorsRandom(goats=3), cg.Pick()]]
+        comparison = cg.compare(games, n=100)
+        assert comparison['shared_steps'] == 0
+        assert np.all(np.isfinite(comparison['std_error']))
+
+    def test_error_step(self):
+        with pytest.raises(MontyHallError, match='step 3'):
+            cg.compare([base + [cg.Stay()], base + [cg.Reveal(2)]], n=10)
+
+    def test_too_few_games(self):
+        with pytest.raises(ValueError):
+            cg.compare([base], n=10)
+
+def switch_game(p):
+    return base + [cg.ChanceTo(p, cg.Switch())]
+
+class TestSweep:
+
+    def test_grid(self):
+        games = lambda p, goats: [cg.InitDoorsRandom(goats=goats), cg.Pick(),
+                                  cg.Reveal(), cg.ChanceTo(p, cg.Switch())]
+        table = cg.sweep(games, {'p': [0, 1], 'goats': [2, 3, 4]}, n=10)
+        assert [(row['p'], row['goats']) for row in table] == [
+            (0, 2), (0, 3), (0, 4), (1, 2), (1, 3), (1, 4)]
+        assert all(row['trials'] == 10 for row in table)
+
+    def test_switch_probability(self):
+        p = np.linspace(0, 1, 5)
+        table = cg.sweep(switch_game, {'p': p}, n=20000, rng=0)
+        for row in table:
+            expected = (1 + row['p']) / 3 * 100
+            assert row['percent_wins'] == pytest.approx(expected, abs=1.5)
+
+    def test_goats(self):
+        game = lambda goats: [cg.InitDoorsRandom(goats=goats), cg.Pick(),
+                              cg.Reveal(), cg.Switch()]
+        table = cg.sweep(game, {'goats': [2, 3]}, n=20000, rng=0)
+        assert table[0]['percent_wins'] == pytest.approx(200 / 3, abs=1.5)
+        assert table[1]['percent_wins'] == pytest.approx(37.5, abs=1.5)
+        assert not any(row['spoiled_games'] for row in table)
+
+    @pytest.mark.parametrize('kwargs', [{'seed': 2}, {'rng': 2}])
+    def test_reproducible(self, kwargs):
+        a = cg.sweep(switch_game, {'p': [0.2, 0.8]}, n=100, **kwargs)
+        b = cg.sweep(switch_game, {'p': [0.2, 0.8]}, n=100, **kwargs)
+        assert a == b
+
+    def test_error_step(self):
+        with pytest.raises(MontyHallError, match='step 3'):
+            cg.sweep(lambda p: base + [cg.Reveal(2)], {'p': [0]}, n=10)
+
+    @pytest.mark.parametrize('game', [
+        lambda k: base + [cg.Reveal(k)],
+        lambda k: base + [cg.ChanceTo(0.5, cg.Pick(doors=k))],
+        lambda k: base + [cg.IfElse(lambda s: s.idx < 5, cg.Stay(), cg.Reveal(k))]])
+    def test_unsupported_param(self, game):
+        with pytest.raises(ValueError, match='Swept parameter'):
+            cg.sweep(game, {'k': [0, 1]}, n=10)
+
+    def test_condition_param(self):
+        game = lambda flag: base + [cg.IfElse(flag == 1, cg.Switch(), cg.Stay(),
+                                              condition_call=False)]
+        table = cg.sweep(game, {'flag': [0, 1]}, n=20000, rng=0)
+        assert table[0]['percent_wins'] < 40 < 60 < table[1]['percent_wins']